@@ -0,0 +1,306 @@
+import time
+import bisect
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+import pytz
+from app import metrics
+from config.settings import (
+    CALENDAR_INDEX_ENABLED, CALENDAR_INDEX_PATH, CALENDAR_SYNC_INTERVAL, GOOGLE_CALENDAR_ID,
+    DEFAULT_EVENT_DURATION_HOURS, TIME_ZONE
+)
+
+logger = logging.getLogger("CalendarIndex")
+
+# Событий на страницу events.list (максимум Calendar API — 2500)
+SYNC_PAGE_SIZE = 250
+# Полная синхронизация берет события не старше этого срока: прошлое для проверки занятости не нужно
+SYNC_LOOKBACK = timedelta(days=7)
+# Дальше этого срока свободное время не ищется
+FREE_SLOT_HORIZON = timedelta(days=14)
+# Сколько ждать завершения текущей синхронизации при остановке, секунд
+STOP_TIMEOUT = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT PRIMARY KEY,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    summary TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _parse_time(value):
+    """Начало или конец события Calendar API в секундах эпохи; у событий на весь день — полночь TIME_ZONE"""
+    if "dateTime" in value:
+        return datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00")).timestamp()
+    day = datetime.strptime(value["date"], "%Y-%m-%d")
+    return pytz.timezone(value.get("timeZone") or TIME_ZONE).localize(day).timestamp()
+
+
+def busy_interval(event):
+    """(начало, конец) занятого времени события или None, если оно не занимает время"""
+    if event.get("status") == "cancelled" or event.get("transparency") == "transparent":
+        return None
+    try:
+        return _parse_time(event["start"]), _parse_time(event["end"])
+    except (KeyError, ValueError):
+        return None
+
+
+class CalendarIndex:
+    """Локальная копия занятого времени календаря GOOGLE_CALENDAR_ID.
+
+    События хранятся в SQLite, чтобы после перезапуска хватило инкрементальной
+    синхронизации, а в памяти — как список интервалов, отсортированный по
+    началу. Пересечения и свободное время ищутся двоичным поиском по этому
+    списку без обращения к API. Изменения применяет CalendarSync.
+    """
+
+    def __init__(self, path=CALENDAR_INDEX_PATH, calendar_id=GOOGLE_CALENDAR_ID):
+        self.path = path
+        self.calendar_id = calendar_id
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        if self._meta("calendar_id") != calendar_id:
+            # Другой календарь в настройках: старая копия не годится
+            self._reset()
+        self._events = {}
+        for event_id, start, end, summary in self._conn.execute("SELECT id, start, end, summary FROM events"):
+            self._events[event_id] = (start, end, summary)
+        self._rebuild()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def _meta(self, name):
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _reset(self):
+        with self._conn:
+            self._conn.execute("DELETE FROM events")
+            self._conn.execute("DELETE FROM meta")
+            self._conn.execute("INSERT INTO meta (name, value) VALUES ('calendar_id', ?)", (self.calendar_id,))
+
+    def _rebuild(self):
+        intervals = sorted((start, end, event_id, summary) for event_id, (start, end, summary) in self._events.items())
+        # Списки заменяются целиком: запросы из других потоков видят либо старую, либо новую копию
+        self._intervals = intervals
+        self._starts = [interval[0] for interval in intervals]
+        self._max_length = max((end - start for start, end, _, _ in intervals), default=0.0)
+
+    @property
+    def sync_token(self):
+        with self._lock:
+            return self._meta("sync_token")
+
+    def clear(self):
+        """Забывает все события и токен синхронизации (например, после ответа 410)"""
+        with self._lock:
+            self._reset()
+            self._events = {}
+            self._rebuild()
+
+    def apply(self, events, sync_token=None, full=False):
+        """Применяет события из events.list: новые и измененные сохраняет, отмененные удаляет.
+
+        full=True — результат полной синхронизации: всё, чего в нем нет, удаляется.
+        """
+        with self._lock:
+            current = {} if full else dict(self._events)
+            for event in events:
+                interval = busy_interval(event)
+                if interval is None:
+                    current.pop(event.get("id"), None)
+                else:
+                    current[event["id"]] = (interval[0], interval[1], event.get("summary"))
+            with self._conn:
+                if full:
+                    self._conn.execute("DELETE FROM events")
+                    rows = current.items()
+                else:
+                    changed = {event.get("id") for event in events}
+                    self._conn.executemany("DELETE FROM events WHERE id = ?", [(event_id,) for event_id in changed])
+                    rows = [(event_id, current[event_id]) for event_id in changed if event_id in current]
+                self._conn.executemany(
+                    "INSERT INTO events (id, start, end, summary) VALUES (?, ?, ?, ?)",
+                    [(event_id, start, end, summary) for event_id, (start, end, summary) in rows]
+                )
+                if sync_token is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO meta (name, value) VALUES ('sync_token', ?)", (sync_token,)
+                    )
+            self._events = current
+            self._rebuild()
+
+    def overlaps(self, start, end=None):
+        """События, пересекающиеся с [start, end); без end — с событием длиной DEFAULT_EVENT_DURATION_HOURS.
+
+        Возвращает список {"id", "summary", "start", "end"} с датами в часовом поясе start.
+        """
+        if end is None:
+            end = start + timedelta(hours=DEFAULT_EVENT_DURATION_HOURS)
+        intervals, starts, max_length = self._intervals, self._starts, self._max_length
+        low, high = start.timestamp(), end.timestamp()
+        # Пересекаться могут только события, начавшиеся не раньше, чем за самую длинную длительность
+        first = bisect.bisect_left(starts, low - max_length)
+        last = bisect.bisect_left(starts, high)
+        zone = start.tzinfo
+        return [
+            {"id": event_id, "summary": summary,
+             "start": datetime.fromtimestamp(event_start, zone), "end": datetime.fromtimestamp(event_end, zone)}
+            for event_start, event_end, event_id, summary in intervals[first:last]
+            if event_end > low
+        ]
+
+    def next_free_slot(self, after, duration=None, horizon=FREE_SLOT_HORIZON):
+        """Начало ближайшего свободного промежутка длиной duration не раньше after или None"""
+        duration = (duration or timedelta(hours=DEFAULT_EVENT_DURATION_HOURS)).total_seconds()
+        intervals, starts, max_length = self._intervals, self._starts, self._max_length
+        candidate = after.timestamp()
+        limit = candidate + horizon.total_seconds()
+        for event_start, event_end, _, _ in intervals[bisect.bisect_left(starts, candidate - max_length):]:
+            if event_start >= candidate + duration:
+                break
+            candidate = max(candidate, event_end)
+            if candidate > limit:
+                return None
+        return datetime.fromtimestamp(candidate, after.tzinfo)
+
+
+class CalendarSync:
+    """Фоновая инкрементальная синхронизация CalendarIndex через syncToken Calendar API.
+
+    Первая синхронизация загружает события за последние SYNC_LOOKBACK и
+    дальше постранично; затем раз в interval секунд (или сразу после
+    request()) запрашиваются только изменения. Если Google отвечает 410
+    (токен устарел), индекс очищается и загружается заново.
+    """
+
+    def __init__(self, index, interval=CALENDAR_SYNC_INTERVAL):
+        self.index = index
+        self.interval = interval
+        self.synced = threading.Event()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="calendar-sync", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Останавливает поток; зависший запрос к API не задерживает выход дольше timeout секунд"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning(f"Синхронизация календаря не завершилась за {timeout} с, поток оставлен")
+
+    def request(self):
+        """Просит синхронизировать индекс, не дожидаясь interval"""
+        self._wakeup.set()
+
+    def _list(self, service, http, **params):
+        """Все страницы events.list; возвращает (события, nextSyncToken)"""
+        events, page_token = [], None
+        while True:
+            response = service.events().list(
+                calendarId=self.index.calendar_id, maxResults=SYNC_PAGE_SIZE, singleEvents=True,
+                pageToken=page_token, **params
+            ).execute(http=http)
+            events += response.get("items", [])
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return events, response.get("nextSyncToken")
+
+    def sync_once(self):
+        """Одна синхронизация; возвращает число полученных событий или None, если календарь недоступен"""
+        from googleapiclient.errors import HttpError
+        from app.google_calendar import warm_up_calendar_service, _thread_http
+
+        # Авторизацию в браузере из фонового потока не запускаем: без действующего токена пропускаем
+        service = warm_up_calendar_service()
+        if service is None:
+            return None
+
+        started = time.perf_counter()
+        token = self.index.sync_token
+        try:
+            if token:
+                events, next_token = self._list(service, _thread_http(), syncToken=token)
+            else:
+                time_min = (datetime.now(pytz.utc) - SYNC_LOOKBACK).isoformat()
+                events, next_token = self._list(service, _thread_http(), timeMin=time_min)
+        except HttpError as e:
+            if token and e.resp.status == 410:
+                logger.info("Токен синхронизации календаря устарел, загружаю события заново")
+                self.index.clear()
+                return self.sync_once()
+            raise
+
+        self.index.apply(events, next_token, full=not token)
+        metrics.inc("calendar_sync_total")
+        logger.debug(f"Синхронизация календаря: {len(events)} изменений за {time.perf_counter() - started:.2f} с, "
+                     f"событий в индексе: {len(self.index)}")
+        return len(events)
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            try:
+                if self.sync_once() is not None:
+                    self.synced.set()
+            except Exception as e:
+                logger.warning(f"Синхронизация календаря не удалась: {e}")
+            self._wakeup.wait(self.interval)
+
+
+_index = None
+_sync = None
+
+
+def get_calendar_index():
+    """Индекс календаря, если синхронизация запущена, иначе None"""
+    return _index
+
+
+def start_calendar_sync():
+    """Открывает индекс и запускает фоновую синхронизацию (если CALENDAR_INDEX_ENABLED)"""
+    global _index, _sync
+    if not CALENDAR_INDEX_ENABLED:
+        return None
+    if _sync is None:
+        _index = CalendarIndex()
+        _sync = CalendarSync(_index).start()
+    return _sync
+
+
+def stop_calendar_sync():
+    global _index, _sync
+    if _sync is not None:
+        _sync.stop()
+        _index.close()
+    _index = _sync = None
+
+
+def record_created(events):
+    """Добавляет только что созданные события в индекс до следующей синхронизации"""
+    if _index is not None and events:
+        _index.apply(events)
+        _sync.request()
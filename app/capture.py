@@ -0,0 +1,516 @@
+import json
+import queue
+import collections
+import threading
+import time
+import logging
+from app import metrics
+from app.logs import NOISY
+
+logger = logging.getLogger("AudioCapture")
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # paInt16
+FRAMES_PER_BUFFER = 4096
+BUFFER_SECONDS = 30
+GAP_HISTORY = 1000
+# Больше стольких каналов устройства не открывается
+MAX_CAPTURE_CHANNELS = 8
+# Сколько лучших устройств проверяется пробной записью и ее длительность, секунд
+PROBE_DEVICES = 3
+PROBE_SECONDS = 0.2
+# Устройства, которые записывают звук системы, а не микрофон
+LOOPBACK_NAMES = ("monitor", "loopback", "stereo mix", "what u hear", "стерео микшер")
+
+
+class RingBuffer:
+    """Кольцевой буфер без блокировок для одного писателя и одного читателя.
+
+    Писатель (callback PyAudio) двигает только write_pos, читатель (поток
+    распознавания) — только read_pos. Оба счетчика растут монотонно, поэтому
+    их достаточно присваивать после копирования данных.
+    """
+
+    def __init__(self, capacity):
+        self._buf = bytearray(capacity)
+        self._capacity = capacity
+        self._write_pos = 0
+        self._read_pos = 0
+        self.dropped_bytes = 0
+
+    def available(self):
+        """Количество байт, готовых к чтению"""
+        return self._write_pos - self._read_pos
+
+    def write(self, data):
+        """Записывает блок целиком; при переполнении блок отбрасывается"""
+        size = len(data)
+        if size > self._capacity - self.available():
+            self.dropped_bytes += size
+            return False
+
+        start = self._write_pos % self._capacity
+        first = min(size, self._capacity - start)
+        self._buf[start:start + first] = data[:first]
+        if first < size:
+            self._buf[:size - first] = data[first:]
+        self._write_pos += size
+        return True
+
+    def read_into(self, buffer):
+        """Заполняет buffer (memoryview) целиком и возвращает его или None, если данных меньше.
+
+        В отличие от read() не создает новый объект bytes на каждый блок.
+        """
+        size = len(buffer)
+        if self.available() < size:
+            return None
+
+        start = self._read_pos % self._capacity
+        first = min(size, self._capacity - start)
+        buffer[:first] = self._buf[start:start + first]
+        if first < size:
+            buffer[first:] = self._buf[:size - first]
+        self._read_pos += size
+        return buffer
+
+    def read(self, size):
+        """Читает ровно size байт или возвращает None, если данных меньше"""
+        if self.available() < size:
+            return None
+
+        start = self._read_pos % self._capacity
+        first = min(size, self._capacity - start)
+        data = bytes(self._buf[start:start + first])
+        if first < size:
+            data += bytes(self._buf[:size - first])
+        self._read_pos += size
+        return data
+
+
+class Utterance:
+    """Законченная фраза, распознанная фоновым потоком"""
+
+    __slots__ = ("text", "speech_start", "speech_end", "position", "early")
+
+    def __init__(self, text, speech_start, speech_end, position=0.0, early=False):
+        self.text = text
+        self.speech_start = speech_start
+        self.speech_end = speech_end
+        # Секунды звука, переданные распознавателю к моменту завершения фразы
+        self.position = position
+        # Фраза завершена досрочно по частичному результату (EarlyIntent)
+        self.early = early
+
+    def __repr__(self):
+        return f"Utterance({self.text!r})"
+
+
+def waveform(data):
+    """Блок звука для AcceptWaveform: bytes как есть, буфер (memoryview) — без копирования.
+
+    cffi-обертка Vosk принимает для char * только bytes, поэтому буфер
+    передается через ffi.from_buffer; без него (другая версия vosk) — копией.
+    """
+    if isinstance(data, bytes):
+        return data
+    global _from_buffer
+    if _from_buffer is None:
+        import vosk
+        ffi = getattr(vosk, "_ffi", None)
+        _from_buffer = ffi.from_buffer if ffi is not None else bytes
+    return _from_buffer(data)
+
+
+_from_buffer = None
+
+
+def _score_device(p, index, info, default_index, device_name):
+    """Оценка устройства ввода и формат, в котором его открывать: (оценка, частота, каналы) или None"""
+    import pyaudio
+    name = info.get("name", "").lower()
+    native_rate = int(info.get("defaultSampleRate", SAMPLE_RATE))
+    max_channels = min(int(info.get("maxInputChannels", 0)), MAX_CAPTURE_CHANNELS)
+
+    choice = None
+    # Сначала родная частота устройства: иначе драйвер передискретизирует сам, медленнее и хуже
+    for rate in dict.fromkeys((native_rate, SAMPLE_RATE, 48000, 44100)):
+        for channels in dict.fromkeys((max_channels, 1)):
+            try:
+                if p.is_format_supported(rate, input_device=index, input_channels=channels,
+                                         input_format=pyaudio.paInt16):
+                    choice = (rate, channels)
+                    break
+            except ValueError:
+                continue
+        if choice is not None:
+            break
+    if choice is None:
+        return None
+
+    rate, channels = choice
+    score = 0
+    if device_name and device_name.lower() in name:
+        score += 100
+    if index == default_index:
+        score += 30
+    if any(word in name for word in LOOPBACK_NAMES):
+        score -= 50
+    if rate == native_rate:
+        score += 20
+    if rate % SAMPLE_RATE == 0:
+        # Целое отношение частот: фильтр с одной фазой
+        score += 10
+    # Несколько микрофонов массива — выбор и сложение каналов
+    score += 2 * min(channels - 1, 3)
+    return score, rate, channels
+
+
+def _probe_signal(p, device):
+    """Пробная запись PROBE_SECONDS: уровень сигнала или None, если устройство не открылось"""
+    import numpy as np
+    import pyaudio
+    frames = int(device["rate"] * PROBE_SECONDS)
+    try:
+        stream = p.open(format=pyaudio.paInt16, channels=device["channels"], rate=device["rate"], input=True,
+                        frames_per_buffer=frames, input_device_index=device["index"])
+        try:
+            data = stream.read(frames, exception_on_overflow=False)
+        finally:
+            stream.close()
+    except (OSError, ValueError):
+        return None
+    samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+    return float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+
+
+def probe_input_devices(p, device_name=None, probe=True):
+    """Устройства ввода по убыванию оценки: [{"index", "name", "rate", "channels", "score"}].
+
+    Оценка учитывает имя из настроек (device_name), устройство по умолчанию,
+    родную частоту и число каналов, а устройства записи звука системы
+    (monitor, loopback) отодвигаются назад. Лучшие PROBE_DEVICES устройств
+    проверяются пробной записью: не открывшиеся отбрасываются, а отдающие
+    только нули теряют в оценке.
+    """
+    try:
+        default_index = p.get_default_input_device_info()["index"]
+    except (IOError, OSError):
+        default_index = None
+
+    devices = []
+    for index in range(p.get_device_count()):
+        info = p.get_device_info_by_index(index)
+        if int(info.get("maxInputChannels", 0)) <= 0:
+            continue
+        scored = _score_device(p, index, info, default_index, device_name)
+        if scored is None:
+            continue
+        score, rate, channels = scored
+        devices.append({"index": index, "name": info.get("name", ""), "rate": rate, "channels": channels,
+                        "score": score})
+    devices.sort(key=lambda device: -device["score"])
+
+    if probe:
+        checked = []
+        for device in devices[:PROBE_DEVICES]:
+            level = _probe_signal(p, device)
+            if level is None:
+                continue
+            if level == 0.0:
+                device["score"] -= 40
+            checked.append(device)
+        devices = sorted(checked, key=lambda device: -device["score"]) + devices[PROBE_DEVICES:]
+    return devices
+
+
+def find_input_device(p, device_name=None):
+    """Возвращает индекс лучшего устройства ввода по probe_input_devices или None"""
+    devices = probe_input_devices(p, device_name)
+    return devices[0]["index"] if devices else None
+
+
+class AudioCapture:
+    """Постоянный захват звука с микрофона и фоновое распознавание Vosk.
+
+    Поток открывается один раз в режиме callback, аудио складывается в
+    RingBuffer, а отдельный поток кормит им KaldiRecognizer и кладет готовые
+    фразы в очередь utterances. Если задан vad, распознаватель получает
+    только участки речи. model может быть функцией, загружающей модель: тогда
+    она вызывается в потоке распознавания, а ready выставляется после загрузки.
+    Если задан intent (EarlyIntent), частичные результаты разбираются на лету и
+    полная команда завершается, не дожидаясь паузы в конце фразы. grammar —
+    список слов для распознавания по грамматике (GrammarRecognizer). Если задан
+    wake (WakeWordGate), полный распознаватель получает звук только после
+    слова-триггера.
+
+    С native_rate=True устройство открывается в родном формате (частота и
+    каналы из probe_input_devices), а AudioConverter сводит каналы по
+    channel_mode и передискретизирует звук в sample_rate прямо в callback:
+    в RingBuffer и дальше всегда 16-битное моно sample_rate.
+    """
+
+    def __init__(self, model, sample_rate=SAMPLE_RATE, frames_per_buffer=FRAMES_PER_BUFFER,
+                 buffer_seconds=BUFFER_SECONDS, device_index=None, on_partial=None, vad=None, intent=None, grammar=None,
+                 wake=None, device_name=None, native_rate=True, channel_mode="beam"):
+        self.model = model
+        self.sample_rate = sample_rate
+        self.frames_per_buffer = frames_per_buffer
+        self.device_index = device_index
+        self.device_name = device_name
+        self.native_rate = native_rate
+        self.channel_mode = channel_mode
+        # Формат устройства и преобразование в моно sample_rate (None — устройство уже в нем)
+        self.device_rate = sample_rate
+        self.device_channels = 1
+        self.converter = None
+        self.on_partial = on_partial
+        self.vad = vad
+        self.intent = intent
+        self.grammar = grammar
+        self.wake = wake
+        # Модель и грамматика, которые поток распознавания подхватит на границе фраз
+        self._pending_model = None
+        self.utterances = queue.Queue()
+        self.ready = threading.Event()
+        self.error = None
+
+        self._ring = RingBuffer(sample_rate * SAMPLE_WIDTH * buffer_seconds)
+        self._data_ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pa = None
+        self._stream = None
+        self._continue = None
+
+        # Метрики
+        self._speech_start = None
+        self._dropped_at_final = 0
+        self._gaps = collections.deque(maxlen=GAP_HISTORY)
+        self._utterance_count = 0
+        self._position = 0.0
+
+    def start(self):
+        """Открывает поток микрофона и запускает поток распознавания"""
+        # PyAudio нужен только для микрофона: feed() работает и без него
+        import pyaudio
+        self._continue = pyaudio.paContinue
+        self._pa = pyaudio.PyAudio()
+        device = self._choose_device()
+        if device is None:
+            self._pa.terminate()
+            self._pa = None
+            raise OSError("Не найдено устройство ввода")
+        self.device_index = device["index"]
+        if self.native_rate:
+            self.device_rate, self.device_channels = device["rate"], device["channels"]
+
+        # Блок устройства той же длительности, что и frames_per_buffer при sample_rate
+        device_frames = self.frames_per_buffer * self.device_rate // self.sample_rate
+        if (self.device_rate, self.device_channels) != (self.sample_rate, 1):
+            from app.resample import AudioConverter
+            mode = self.channel_mode
+            if isinstance(mode, int) and mode >= self.device_channels:
+                logger.warning(f"У устройства нет канала {mode}, каналы будут сложены")
+                mode = "beam"
+            self.converter = AudioConverter(self.device_rate, self.device_channels, self.sample_rate, mode,
+                                            max_frames=device_frames)
+
+        self._stream = self._pa.open(
+            format=pyaudio.paInt16,
+            channels=self.device_channels,
+            rate=self.device_rate,
+            input=True,
+            frames_per_buffer=device_frames,
+            input_device_index=self.device_index,
+            stream_callback=self._on_audio
+        )
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vosk-recognizer", daemon=True)
+        self._thread.start()
+        self._stream.start_stream()
+        logger.info(f"Захват звука запущен (устройство {self.device_index} «{device['name']}», "
+                    f"{self.device_rate} Гц, каналов: {self.device_channels} → {self.sample_rate} Гц моно)")
+        return self
+
+    def _choose_device(self):
+        """Устройство из probe_input_devices: заданное device_index или с лучшей оценкой"""
+        devices = probe_input_devices(self._pa, self.device_name, probe=self.device_index is None)
+        if self.device_index is not None:
+            return next((device for device in devices if device["index"] == self.device_index), None)
+        for device in devices:
+            logger.debug(f"Устройство ввода {device['index']} «{device['name']}»: {device['rate']} Гц, "
+                         f"каналов {device['channels']}, оценка {device['score']}")
+        return devices[0] if devices else None
+
+    def stop(self):
+        """Останавливает захват и освобождает устройство"""
+        self._stop.set()
+        self._data_ready.set()
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._pa is not None:
+            self._pa.terminate()
+            self._pa = None
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _on_audio(self, in_data, frame_count, time_info, status):
+        # Преобразование пишет в заранее выделенный буфер, RingBuffer копирует его к себе
+        self._ring.write(in_data if self.converter is None else self.converter.process(in_data))
+        self._data_ready.set()
+        return (None, self._continue)
+
+    def create_recognizer(self):
+        """Распознаватель для модели захвата (загружает модель, если model — функция)"""
+        model = self.model() if callable(self.model) else self.model
+        if self.wake is not None:
+            self.wake.bind(model)
+        if self.grammar:
+            from app.grammar import GrammarRecognizer
+            return GrammarRecognizer(model, self.sample_rate, self.grammar)
+        import vosk
+        return vosk.KaldiRecognizer(model, self.sample_rate)
+
+    def swap_model(self, model, grammar=None):
+        """Заменяет модель без остановки захвата; применяется, когда никто не говорит"""
+        self._pending_model = (model, grammar)
+
+    def _run(self):
+        try:
+            recognizer = self.create_recognizer()
+        except Exception as e:
+            logger.error(f"Не удалось загрузить модель распознавания: {e}", exc_info=True)
+            self.error = e
+            return
+        finally:
+            self.ready.set()
+        # Один буфер блока на всё время работы: распознаватель получает memoryview на него
+        chunk = memoryview(bytearray(self.frames_per_buffer * SAMPLE_WIDTH))
+        self._speech_start = None
+        self._dropped_at_final = self._ring.dropped_bytes
+
+        while not self._stop.is_set():
+            data = self._ring.read_into(chunk)
+            if data is None:
+                self._data_ready.wait(0.1)
+                self._data_ready.clear()
+                continue
+
+            if self._pending_model is not None and self._speech_start is None:
+                recognizer = self._swap_recognizer(recognizer)
+
+            try:
+                self.feed(recognizer, data)
+            except Exception as e:
+                logger.error(f"Ошибка распознавания речи: {e}", exc_info=True, extra=NOISY)
+
+    def _swap_recognizer(self, recognizer):
+        """Распознаватель новой модели; при ошибке загрузки остается прежний"""
+        (model, grammar), self._pending_model = self._pending_model, None
+        previous = self.model, self.grammar
+        self.model, self.grammar = model, grammar
+        try:
+            return self.create_recognizer()
+        except Exception as e:
+            logger.error(f"Не удалось переключить модель распознавания: {e}", exc_info=True)
+            self.model, self.grammar = previous
+            return recognizer
+
+    def feed(self, recognizer, data):
+        """Обрабатывает блок звука; готовые фразы попадают в utterances.
+
+        Вызывается из потока распознавания, а бенчмарки вызывают его напрямую,
+        подавая звук из файла без микрофона.
+        """
+        if self.vad is None:
+            self._gated_decode(recognizer, data)
+            return
+
+        # В распознаватель попадают только участки речи
+        for segment, ended in self.vad.process(data):
+            if segment:
+                self._gated_decode(recognizer, segment)
+            if ended:
+                if self.wake is None or self.wake.active:
+                    self._emit(recognizer.FinalResult())
+                else:
+                    self.wake.reset()
+
+    def _gated_decode(self, recognizer, data):
+        """Звук идет в полный распознаватель только после слова-триггера (если задан wake)"""
+        if self.wake is None:
+            self._timed_decode(recognizer, data)
+            return
+        data = self.wake.process(data)
+        if data:
+            self._timed_decode(recognizer, data)
+            if self.wake.expired():
+                self._emit(recognizer.FinalResult())
+
+    def _timed_decode(self, recognizer, data):
+        """_decode с учетом звука и времени декодирования для коэффициента реального времени"""
+        if not metrics.enabled():
+            self._decode(recognizer, data)
+            return
+        started = time.perf_counter()
+        self._decode(recognizer, data)
+        metrics.inc("asr_decode_seconds_total", time.perf_counter() - started)
+        metrics.inc("asr_audio_seconds_total", len(data) / (self.sample_rate * SAMPLE_WIDTH))
+
+    def _decode(self, recognizer, data):
+        self._position += len(data) / (self.sample_rate * SAMPLE_WIDTH)
+        # KaldiRecognizer принимает только bytes или cdata; обертки (GrammarRecognizer) — и буфер
+        if recognizer.AcceptWaveform(data if getattr(recognizer, "accepts_buffer", False) else waveform(data)):
+            self._emit(recognizer.Result())
+        elif self.on_partial is not None or self.intent is not None or self._speech_start is None:
+            partial = json.loads(recognizer.PartialResult()).get("partial", "")
+            if partial:
+                if self._speech_start is None:
+                    self._speech_start = time.monotonic()
+                if self.on_partial is not None:
+                    self.on_partial(partial)
+                if self.intent is not None and self.intent.update(partial, self._position):
+                    # FinalResult сбрасывает распознаватель: продолжение речи станет новой фразой
+                    self._emit(recognizer.FinalResult(), early=True)
+
+    def _emit(self, result_json, early=False):
+        text = json.loads(result_json).get("text", "")
+        now = time.monotonic()
+        self._speech_start, speech_start = None, self._speech_start
+        if self.intent is not None:
+            self.intent.reset()
+        if self.wake is not None:
+            self.wake.release()
+        if not text:
+            return
+
+        self._utterance_count += 1
+        # Этап listen: от первого частичного результата до окончательного
+        metrics.record("listen", now - (speech_start or now), early=early)
+        if early:
+            metrics.inc("early_intent_total")
+        self.utterances.put(Utterance(text, speech_start or now, now, self._position, early))
+
+        # Разрыв между фразами: звук, который не дошел до распознавателя
+        dropped = self._ring.dropped_bytes
+        self._gaps.append((dropped - self._dropped_at_final) / (self.sample_rate * SAMPLE_WIDTH))
+        self._dropped_at_final = dropped
+
+    def stats(self):
+        """Метрики захвата: разрывы между фразами (секунды потерянного звука) и отставание"""
+        gaps = list(self._gaps)
+        bytes_per_second = self.sample_rate * SAMPLE_WIDTH
+        stats = {
+            "utterances": self._utterance_count,
+            "gap_mean_ms": round(1000 * sum(gaps) / len(gaps), 3) if gaps else 0.0,
+            "gap_max_ms": round(1000 * max(gaps), 3) if gaps else 0.0,
+            "dropped_seconds": self._ring.dropped_bytes / bytes_per_second,
+            "backlog_seconds": self._ring.available() / bytes_per_second,
+        }
+        if self.wake is not None:
+            stats["wake"] = self.wake.stats()
+        return stats
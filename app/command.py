@@ -1,13 +1,16 @@
 import re
-import dateparser
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytz
 import logging
+from app.dates import resolve_date, WEEKDAYS
+from app.numerals import normalize_numerals
+from app import metrics
 
 logger = logging.getLogger("CommandParser")
 
-def parse_command(command):
-    """Парсит голосовую команду и извлекает название задачи и дату"""
+@metrics.timed("parse")
+def parse_command(command, now=None):
+    """Парсит голосовую команду и извлекает название задачи и дату (относительно now)"""
     if not command:
         return None
     
@@ -23,63 +26,252 @@ def parse_command(command):
         return None
     
     # Парсим дату
-    parsed_date = parse_date(date_part) if date_part else None
+    parsed_date = parse_date(date_part, now) if date_part else None
     
-    logger.info(f"Извлечено - Задача: '{task_name}', Дата: '{date_part}' -> {parsed_date}")
+    logger.info("Извлечено - Задача: '%s', Дата: '%s' -> %s", task_name, date_part, parsed_date)
     
     return {
         "task": task_name,
         "due": parsed_date
     }
 
+def parse_commands(command, now=None):
+    """Разбирает фразу с несколькими командами:
+    «создай задачу отчёт на завтра и задачу созвон в пятницу в 10».
+
+    Возвращает список словарей {"task", "due"} в порядке команд (пустой, если команд нет).
+    Глагол первой команды переносится на следующие, если в них его нет.
+    Фраза может начинаться с союза («и задачу созвон в пятницу») — это
+    продолжение предыдущей фразы, и глагол подставляется так же.
+    """
+    if not command:
+        return []
+
+    command = command.strip()
+    # «и задачу созвон …» — продолжение фразы, завершенной досрочно на паузе перед союзом
+    continued = _LEADING_CONNECTOR_RE.match(command)
+    if continued:
+        command = command[continued.end():]
+
+    commands = []
+    for index, part in enumerate(_COMMAND_SPLIT_RE.split(command)):
+        if (index or continued) and not _VERB_START_RE.match(part):
+            part = f"{COMMAND_VERBS[0]} {part}"
+        parsed = parse_command(part, now)
+        if parsed:
+            commands.append(parsed)
+    return commands
+
+# Грамматика команды: словари и префиксное дерево строятся один раз при импорте
+COMMAND_VERBS = ("создай", "запиши")
+OBJECT_WORDS = ("задачу", "событие", "запись")
+RANGE_OBJECT_WORDS = frozenset(("задачу", "событие"))
+TASK_OBJECT_WORDS = frozenset(OBJECT_WORDS)
+
+ORDINAL_WORDS = (
+    "первое", "второе", "третье", "четвертое", "пятое", "шестое", "седьмое", "восьмое",
+    "девятое", "десятое", "одиннадцатое", "двенадцатое", "тринадцатое", "четырнадцатое",
+    "пятнадцатое", "шестнадцатое", "семнадцатое", "восемнадцатое", "девятнадцатое",
+    "двадцатое", "двадцать первое", "двадцать второе", "двадцать третье", "двадцать четвертое",
+    "двадцать пятое", "двадцать шестое", "двадцать седьмое", "двадцать восьмое",
+    "двадцать девятое", "тридцатое", "тридцать первое"
+)
+MONTH_WORDS = (
+    "января", "февраля", "марта", "апреля", "мая", "июня", "июля", "августа",
+    "сентября", "октября", "ноября", "декабря"
+)
+
+# Разделители названия и даты в порядке приоритета
+DATE_SEPARATORS = (("на", "дату"), ("на",), ("к",), ("до",))
+# Слова, на которых заканчивается название в команде без глагола (совпадение по началу слова)
+TASK_STOP_PREFIXES = ("на", "к", "до")
+
+TASK_STOPWORDS = frozenset((
+    "на", "к", "в", "до", "с", "по", "для", "от", "из", "под", "над", "между", "перед", "после",
+    "через", "за", "при", "без", "против", "среди", "вокруг", "около", "вместо", "кроме", "сверх",
+    "внутри", "снаружи", "вдоль", "поперек", "напротив", "позади", "впереди", "слева", "справа",
+    "сверху", "снизу", "внизу", "вверху", "дату", "время"
+))
+DATE_STOPWORDS = ("создай", "задачу", "событие", "запись", "дату", "время")
+
+_TOKEN_RE = re.compile(r"\S+")
+_QUOTE_RE = re.compile(r"['\"]([^'\"]+)['\"]")
+_QUOTED_RE = re.compile(r"['\"][^'\"]*['\"]")
+_DATE_STOPWORDS_RE = re.compile(r"\b(?:" + "|".join(DATE_STOPWORDS) + r")\b")
+_DATE_STOPWORDS_SET = frozenset(DATE_STOPWORDS)
+_WORD_HEAD_RE = re.compile(r"\w*")
+_RANGE_SPLIT_RE = re.compile(r"\s*[-—]\s*")
+_MONTH_RE = re.compile(r"\b(?:" + "|".join(MONTH_WORDS) + r")\b")
+# Месяц с необязательным годом в конце диапазона и число в начале: «с 1 по 3 марта 2030»
+_MONTH_YEAR_RE = re.compile(r"\b(?:" + "|".join(MONTH_WORDS) + r")(?:\s+\d{4}\b)?")
+_LEADING_DAY_RE = re.compile(r"^\d{1,2}\b")
+_SCAN_WORDS = frozenset(("с", "по", "на", "к", "до", "дату"))
+_HEAD_SUFFIXES = COMMAND_VERBS + OBJECT_WORDS
+
+# Граница команд в одной фразе: запятая или союз перед «[глагол] задачу/событие/запись»
+CONNECTOR_WORDS = frozenset(("и", "а", "также", "потом", "затем"))
+_CONNECTORS = r"(?:и|а\s+также|потом|затем)"
+_NEXT_COMMAND = r"(?=(?:(?:" + "|".join(COMMAND_VERBS) + r")\s+)?(?:" + "|".join(OBJECT_WORDS) + r")\b)"
+_COMMAND_SPLIT_RE = re.compile(
+    r"(?:\s*,\s*(?:" + _CONNECTORS + r"\s+)?|\s+" + _CONNECTORS + r"\s+)" + _NEXT_COMMAND,
+    re.IGNORECASE
+)
+_LEADING_CONNECTOR_RE = re.compile(r",?\s*" + _CONNECTORS + r"\s+" + _NEXT_COMMAND, re.IGNORECASE)
+_VERB_START_RE = re.compile(r"(?:" + "|".join(COMMAND_VERBS) + r")\b", re.IGNORECASE)
+# Предлог перед днем недели без разделителя «на»: «созвон в пятницу в 10»
+_WEEKDAY_PREPOSITIONS = frozenset(("в", "во"))
+
+def _build_trie(phrases):
+    """Префиксное дерево по словам: {"двадцать": {"первое": {None: True}}, ...}"""
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for word in phrase.split(" "):
+            node = node.setdefault(word, {})
+        node[None] = True
+    return trie
+
+_DATE_TRIE = _build_trie(ORDINAL_WORDS + MONTH_WORDS)
+
+def _word_head(word):
+    """Начальная часть слова до первого символа, не являющегося буквой или цифрой"""
+    if word.isalnum():
+        return word
+    return _WORD_HEAD_RE.match(word).group()
+
+def _match_weekday(scan, index):
+    """Начинается ли со слова index день недели с предлогом «в»/«во»"""
+    words = scan.words
+    return (words[index] in _WEEKDAY_PREPOSITIONS and index + 1 < len(words)
+            and _word_head(words[index + 1]) in WEEKDAYS)
+
+def _match_date_keyword(scan, index):
+    """Начинается ли со слова index порядковое числительное или название месяца"""
+    node = _DATE_TRIE
+    words = scan.words
+    while True:
+        child = node.get(_word_head(words[index]))
+        if child is not None and None in child:
+            return True
+        # Составное числительное: первое слово целиком, дальше ровно один пробел
+        child = node.get(words[index])
+        if not child or index + 1 >= len(words) or scan.gap(index) != " ":
+            return False
+        node = child
+        index += 1
+
+class CommandScan:
+    """Один проход по словам команды: заголовки «глагол + объект» и позиции ключевых слов"""
+
+    __slots__ = ("text", "words", "header", "range_header", "object_index", "keywords", "_spans")
+
+    def __init__(self, text):
+        self.text = text
+        self.words = words = text.split()
+        self.header = None
+        self.range_header = None
+        self.object_index = None
+        # слово -> список индексов, где оно встречается
+        self.keywords = {}
+        # Позиции слов в тексте нужны, только если слова разделены не одним пробелом
+        self._spans = None if " ".join(words) == text else [m.span() for m in _TOKEN_RE.finditer(text)]
+
+        count = len(words)
+        for i, word in enumerate(words):
+            if word in _SCAN_WORDS:
+                self.keywords.setdefault(word, []).append(i)
+            elif word.endswith(_HEAD_SUFFIXES):
+                # Глагол может быть концом слова ("пересоздай"), объект — только целым словом
+                if word.endswith(COMMAND_VERBS):
+                    if i + 2 < count:
+                        obj = words[i + 1]
+                        if self.header is None and obj in TASK_OBJECT_WORDS:
+                            self.header = i + 2
+                        if self.range_header is None and obj in RANGE_OBJECT_WORDS:
+                            self.range_header = i + 2
+                elif self.object_index is None and i + 1 < count:
+                    self.object_index = i + 1
+
+    def span(self, start, end):
+        """Исходный текст слов с индексами [start, end)"""
+        if self._spans is None:
+            return " ".join(self.words[start:end])
+        return self.text[self._spans[start][0]:self._spans[end - 1][1]]
+
+    def rest(self, start):
+        """Исходный текст от слова start до конца"""
+        if self._spans is None:
+            return " ".join(self.words[start:])
+        return self.text[self._spans[start][0]:]
+
+    def gap(self, index):
+        """Пробельные символы между словами index и index + 1"""
+        if self._spans is None:
+            return " "
+        return self.text[self._spans[index][1]:self._spans[index + 1][0]]
+
+    def find(self, word, start, need_after=1):
+        """Первый индекс слова word не раньше start, за которым есть еще need_after слов"""
+        for i in self.keywords.get(word, ()):
+            if i >= start and i + need_after < len(self.words):
+                return i
+        return None
+
+    def find_phrase(self, phrase, start):
+        """Первое вхождение фразы (кортеж слов) не раньше start, за которым есть слово"""
+        words = self.words
+        size = len(phrase)
+        for i in self.keywords.get(phrase[0], ()):
+            if i >= start and i + size < len(words) and tuple(words[i:i + size]) == phrase:
+                return i
+        return None
+
 def extract_task_and_date(command):
     """Извлекает название задачи и дату из команды"""
     command_lower = command.lower().strip()
     
     # Сначала ищем задачу в кавычках
-    quote_match = re.search(r"['\"]([^'\"]+)['\"]", command)
+    quote_match = _QUOTE_RE.search(command)
     if quote_match:
         task_name = quote_match.group(1)
-        date_part = re.sub(r"['\"][^'\"]*['\"]", "", command_lower).strip()
+        date_part = _QUOTED_RE.sub("", command_lower).strip()
         return task_name, clean_date_part(date_part)
     
+    scan = CommandScan(command_lower)
+    
     # Поддержка диапазонов дат "с ... по ..."
-    range_match = re.search(r"(?:создай|запиши)\s+(?:задачу|событие)\s+(.+?)\s+с\s+(.+?)\s+по\s+(.+)", command_lower)
-    if range_match:
-        task_name = clean_task_name(range_match.group(1))
-        start_date = range_match.group(2)
-        end_date = range_match.group(3)
-        return task_name, f"{start_date} - {end_date}"
-    
-    # Используем разделители "на", "к", "до"
-    date_separators = [r"\s+на\s+дату\s+", r"\s+на\s+", r"\s+к\s+", r"\s+до\s+"]
-    for separator in date_separators:
-        # Ищем паттерн: команда + задача + разделитель + дата
-        pattern = rf"(?:создай|запиши)\s+(?:задачу|событие|запись)\s+(.+?){separator}(.+)"
-        match = re.search(pattern, command_lower)
-        if match:
-            task_name = clean_task_name(match.group(1))
-            date_part = match.group(2)
-            return task_name, clean_date_part(date_part)
-    
-    # Поиск даты в конце команды без разделителя
-    date_pattern = r"(?:создай|запиши)\s+(?:задачу|событие|запись)\s+(.+?)\s+(\b(?:первое|второе|третье|четвертое|пятое|шестое|седьмое|восьмое|девятое|десятое|одиннадцатое|двенадцатое|тринадцатое|четырнадцатое|пятнадцатое|шестнадцатое|семнадцатое|восемнадцатое|девятнадцатое|двадцатое|двадцать первое|двадцать второе|двадцать третье|двадцать четвертое|двадцать пятое|двадцать шестое|двадцать седьмое|двадцать восьмое|двадцать девятое|тридцатое|тридцать первое|января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)\b.*)"
-    match = re.search(date_pattern, command_lower, re.IGNORECASE)
-    if match:
-        task_name = clean_task_name(match.group(1))
-        date_part = match.group(2)
-        return task_name, clean_date_part(date_part)
+    if scan.range_header is not None:
+        start = scan.find("с", scan.range_header + 1)
+        if start is not None:
+            end = scan.find("по", start + 2)
+            if end is not None:
+                task_name = clean_task_name(scan.span(scan.range_header, start))
+                return task_name, f"{scan.span(start + 1, end)} - {scan.rest(end + 1)}"
+    
+    if scan.header is not None:
+        # Используем разделители "на дату", "на", "к", "до"
+        for separator in DATE_SEPARATORS:
+            index = scan.find_phrase(separator, scan.header + 1)
+            if index is not None:
+                task_name = clean_task_name(scan.span(scan.header, index))
+                return task_name, clean_date_part(scan.rest(index + len(separator)))
+        
+        # Поиск даты (числительное или месяц) без разделителя
+        for index in range(scan.header + 1, len(scan.words)):
+            if _match_date_keyword(scan, index) or _match_weekday(scan, index):
+                task_name = clean_task_name(scan.span(scan.header, index))
+                return task_name, clean_date_part(scan.rest(index))
+        
+        # Только задача без даты
+        return clean_task_name(scan.rest(scan.header)), None
     
-    # Извлечение только задачи без даты
-    task_only_patterns = [
-        r"(?:создай|запиши)\s+(?:задачу|событие|запись)\s+(.+)",
-        r"(?:задачу|событие|запись)\s+(.+?)(?:\s+(?:на|к|до)|$)"
-    ]
-    for pattern in task_only_patterns:
-        match = re.search(pattern, command_lower)
-        if match:
-            task_name = clean_task_name(match.group(1))
-            return task_name, None
+    # Команда без глагола: название до первого слова на "на", "к", "до"
+    if scan.object_index is not None:
+        start = scan.object_index
+        for index in range(start + 1, len(scan.words)):
+            if scan.words[index].startswith(TASK_STOP_PREFIXES):
+                return clean_task_name(scan.span(start, index)), None
+        return clean_task_name(scan.rest(start)), None
     
     return None, None
 
@@ -88,15 +280,26 @@ def clean_task_name(task_name):
     if not task_name:
         return None
     
-    # Убираем служебные слова из начала
-    task_name = re.sub(r'^\s*(задачу|событие|запись)\s+', '', task_name).strip()
+    words = task_name.split()
     
-    # Убираем предлоги и служебные слова
-    task_name = re.sub(r'\s+(на|к|в|до|с|по|для|от|из|под|над|между|перед|после|через|за|при|без|против|среди|вокруг|около|вместо|кроме|сверх|внутри|снаружи|вдоль|поперек|напротив|позади|впереди|слева|справа|сверху|снизу|внизу|вверху|дату|время)\s+', ' ', task_name).strip()
+    # Убираем служебные слова из начала
+    if len(words) > 1 and words[0] in TASK_OBJECT_WORDS:
+        words = words[1:]
     
-    # Убираем лишние пробелы
-    task_name = re.sub(r'\s+', ' ', task_name).strip()
+    # Убираем предлоги и служебные слова внутри названия. Как и при замене
+    # regex-ом, два предлога подряд не удаляются: пробел между ними общий
+    cleaned = words[:1]
+    removed = False
+    for i in range(1, len(words) - 1):
+        if not removed and words[i] in TASK_STOPWORDS:
+            removed = True
+            continue
+        removed = False
+        cleaned.append(words[i])
+    if len(words) > 1:
+        cleaned.append(words[-1])
     
+    task_name = " ".join(cleaned)
     return task_name if task_name else None
 
 def clean_date_part(date_part):
@@ -105,32 +308,43 @@ def clean_date_part(date_part):
         return None
     
     # Убираем команды создания и служебные слова
-    date_part = re.sub(r'\b(создай|задачу|событие|запись|дату|время)\b', '', date_part).strip()
-    
-    # Убираем лишние пробелы
-    date_part = re.sub(r'\s+', ' ', date_part).strip()
+    words = []
+    for word in date_part.split():
+        if word in _DATE_STOPWORDS_SET:
+            continue
+        if not word.isalnum():
+            word = _DATE_STOPWORDS_RE.sub("", word)
+            if not word:
+                continue
+        words.append(word)
     
+    date_part = " ".join(words)
     return date_part if date_part else None
 
-def parse_date(date_str):
+def parse_date(date_str, now=None):
     """Парсит дату или диапазон дат из строки"""
     if not date_str:
         return None
     
-    date_str = preprocess_date(date_str)
+    date_str = preprocess_date(date_str, now)
     
     try:
         # Обработка диапазонов дат
         if "-" in date_str or "—" in date_str:
-            parts = re.split(r"\s*[-—]\s*", date_str)
+            parts = _RANGE_SPLIT_RE.split(date_str)
             if len(parts) == 2:
-                start = dateparser.parse(parts[0], languages=["ru"], settings={"TIMEZONE": "Europe/Moscow", "RETURN_AS_TIMEZONE_AWARE": True})
-                end = dateparser.parse(parts[1], languages=["ru"], settings={"TIMEZONE": "Europe/Moscow", "RETURN_AS_TIMEZONE_AWARE": True})
+                start_part, end_part = _borrow_month(*parts)
+                start = resolve_date(start_part, now)
+                end = resolve_date(end_part, now)
                 if start and end:
+                    end = _after_start(start, end, end_part)
+                    if end < start:
+                        logger.warning("Конец диапазона '%s' раньше начала", date_str)
+                        return None
                     return (start, end)
         
         # Обработка одиночной даты
-        parsed = dateparser.parse(date_str, languages=["ru"], settings={"TIMEZONE": "Europe/Moscow", "RETURN_AS_TIMEZONE_AWARE": True})
+        parsed = resolve_date(date_str, now)
         if parsed:
             return parsed
         
@@ -140,29 +354,38 @@ def parse_date(date_str):
         logger.error(f"Ошибка парсинга даты '{date_str}': {e}")
         return None
 
-def preprocess_date(date_str):
+def _borrow_month(start, end):
+    """«1 - 3 марта 2030» -> («1 марта 2030», «3 марта 2030»): месяц и год начала берутся из конца"""
+    month = _MONTH_YEAR_RE.search(end)
+    day = _LEADING_DAY_RE.match(start)
+    if month is None or day is None or _MONTH_RE.search(start):
+        return start, end
+    return f"{day.group()} {month.group()}{start[day.end():]}", end
+
+def _after_start(start, end, end_part):
+    """Конец диапазона, который без уточнения оказался раньше начала, переносится вперед.
+
+    «с 30 декабря по 2 января» — на год, «с понедельника по пятницу» в среду — на неделю.
+    """
+    if end >= start:
+        return end
+    if _MONTH_RE.search(end_part):
+        if end.month < start.month:
+            return end.replace(year=end.year + 1)
+    elif any(word in WEEKDAYS for word in end_part.split()):
+        return end + timedelta(days=7 * -(-(start - end).days // 7))
+    return end
+
+def preprocess_date(date_str, now=None):
     """Добавляет текущий год для относительных дат и нормализует формат"""
     date_str = date_str.lower()
     
-    # Замена числительных на цифры
-    replacements = {
-        "первое": "1", "второе": "2", "третье": "3", "четвертое": "4", "пятое": "5",
-        "шестое": "6", "седьмое": "7", "восьмое": "8", "девятое": "9", "десятое": "10",
-        "одиннадцатое": "11", "двенадцатое": "12", "тринадцатое": "13", "четырнадцатое": "14",
-        "пятнадцатое": "15", "шестнадцатое": "16", "семнадцатое": "17", "восемнадцатое": "18",
-        "девятнадцатое": "19", "двадцатое": "20", "двадцать первое": "21", "двадцать второе": "22",
-        "двадцать третье": "23", "двадцать четвертое": "24", "двадцать пятое": "25", "двадцать шестое": "26",
-        "двадцать седьмое": "27", "двадцать восьмое": "28", "двадцать девятое": "29", "тридцатое": "30",
-        "тридцать первое": "31",
-        "двенадцатая": "12", "двенадцатое": "12", "двенадцатый": "12"
-    }
-    
-    for word, num in replacements.items():
-        date_str = date_str.replace(word, num)
+    # Замена числительных на цифры и времени на ЧЧ:ММ за один проход
+    date_str = normalize_numerals(date_str)
     
     # Добавление года для относительных дат
-    current_year = datetime.now().year
-    if re.search(r"\b(?:января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)\b", date_str):
+    current_year = (now or datetime.now()).year
+    if _MONTH_RE.search(date_str):
         if str(current_year) not in date_str and str(current_year % 100) not in date_str:
             date_str += f" {current_year}"
     
@@ -0,0 +1,158 @@
+import re
+import logging
+from datetime import datetime, timedelta
+from functools import lru_cache
+import pytz
+
+logger = logging.getLogger("DateResolver")
+
+DATE_TIMEZONE = "Europe/Moscow"
+DATE_CACHE_SIZE = 1024
+
+# Настройки dateparser собираются один раз; RELATIVE_BASE подставляется при вызове
+DATEPARSER_SETTINGS = {"TIMEZONE": DATE_TIMEZONE, "RETURN_AS_TIMEZONE_AWARE": True}
+
+MONTHS = {
+    "января": 1, "февраля": 2, "марта": 3, "апреля": 4, "мая": 5, "июня": 6,
+    "июля": 7, "августа": 8, "сентября": 9, "октября": 10, "ноября": 11, "декабря": 12
+}
+WEEKDAYS = {
+    "понедельник": 0, "понедельнику": 0, "понедельника": 0,
+    "вторник": 1, "вторнику": 1, "вторника": 1,
+    "среду": 2, "среда": 2, "среде": 2, "среды": 2,
+    "четверг": 3, "четвергу": 3, "четверга": 3,
+    "пятницу": 4, "пятница": 4, "пятнице": 4, "пятницы": 4,
+    "субботу": 5, "суббота": 5, "субботе": 5, "субботы": 5,
+    "воскресенье": 6, "воскресенью": 6, "воскресенья": 6
+}
+RELATIVE_DAYS = {"сегодня": 0, "завтра": 1, "послезавтра": 2}
+DAY_PERIODS = {"утра": 0, "дня": 12, "вечера": 12, "ночи": 0}
+UNITS = {
+    "минуту": "minutes", "минуты": "minutes", "минут": "minutes",
+    "час": "hours", "часа": "hours", "часов": "hours",
+    "день": "days", "дня": "days", "дней": "days",
+    "неделю": "weeks", "недели": "weeks", "недель": "weeks"
+}
+
+_CLOCK = r"в\s+(?P<hour>\d{1,2})(?:[:.](?P<minute>\d{2}))?(?:\s+(?P<period>утра|дня|вечера|ночи))?"
+_TIME = r"(?:\s+" + _CLOCK + r")?"
+_RELATIVE_DAY_RE = re.compile(r"(?:на\s+)?(?P<day>" + "|".join(RELATIVE_DAYS) + r")" + _TIME)
+_WEEKDAY_RE = re.compile(r"(?:(?:в|во|на|к|до)\s+)?(?P<weekday>" + "|".join(WEEKDAYS) + r")" + _TIME)
+_DATE_RE = re.compile(
+    r"(?P<day>\d{1,2})\s+(?P<month>" + "|".join(MONTHS) + r")(?:\s+(?P<year>\d{4})(?:\s+года)?)?" + _TIME
+    + r"(?:\s+(?P<year2>\d{4}))?"
+)
+_TIME_ONLY_RE = re.compile(_CLOCK)
+_IN_RE = re.compile(r"через\s+(?:(?P<count>\d+)\s+)?(?P<unit>" + "|".join(UNITS) + r")")
+_SPACES_RE = re.compile(r"\s+")
+
+_stats = {"fast": 0, "fallback": 0, "failed": 0}
+
+def _apply_time(date, match):
+    """Подставляет время из групп hour/minute/period; без времени — полночь.
+
+    «12 ночи» — 00:00 следующего дня: «завтра в 12 ночи» — полночь после завтрашнего дня.
+    """
+    hour = match.group("hour")
+    if hour is None:
+        return date.replace(hour=0, minute=0)
+    hour = int(hour)
+    minute = int(match.group("minute") or 0)
+    period = match.group("period")
+    if period == "ночи" and hour == 12:
+        # «В 12 ночи» — полночь в конце названного дня, а не полдень
+        if minute > 59:
+            return None
+        return date.replace(hour=0, minute=minute) + timedelta(days=1)
+    if period and hour < 12:
+        hour += DAY_PERIODS[period]
+    if hour > 23 or minute > 59:
+        return None
+    return date.replace(hour=hour, minute=minute)
+
+def _resolve_fast(text, reference):
+    """Разбирает частые разговорные формы; возвращает None, если форма не распознана"""
+    match = _RELATIVE_DAY_RE.fullmatch(text)
+    if match:
+        date = reference + timedelta(days=RELATIVE_DAYS[match.group("day")])
+        # Как и dateparser, без указания времени сохраняем текущее время суток
+        return date if match.group("hour") is None else _apply_time(date, match)
+
+    match = _WEEKDAY_RE.fullmatch(text)
+    if match:
+        days_ahead = (WEEKDAYS[match.group("weekday")] - reference.weekday()) % 7 or 7
+        return _apply_time(reference + timedelta(days=days_ahead), match)
+
+    match = _DATE_RE.fullmatch(text)
+    if match:
+        year = int(match.group("year") or match.group("year2") or reference.year)
+        try:
+            date = reference.replace(year=year, month=MONTHS[match.group("month")], day=int(match.group("day")))
+        except ValueError:
+            return None
+        return _apply_time(date, match)
+
+    match = _TIME_ONLY_RE.fullmatch(text)
+    if match:
+        # Только время: сегодня, а если оно уже прошло — завтра
+        date = _apply_time(reference, match)
+        if date is not None and date <= reference:
+            date += timedelta(days=1)
+        return date
+
+    match = _IN_RE.fullmatch(text)
+    if match:
+        count = int(match.group("count") or 1)
+        return reference + timedelta(**{UNITS[match.group("unit")]: count})
+
+    return None
+
+def _parse_with_dateparser(text, reference):
+    import dateparser
+    settings = dict(DATEPARSER_SETTINGS, RELATIVE_BASE=reference)
+    return dateparser.parse(text, languages=["ru"], settings=settings)
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _resolve_cached(text, reference):
+    result = _resolve_fast(text, reference)
+    if result is not None:
+        _stats["fast"] += 1
+        return pytz.timezone(DATE_TIMEZONE).localize(result)
+
+    result = _parse_with_dateparser(text, reference)
+    _stats["fallback" if result is not None else "failed"] += 1
+    return result
+
+def resolve_date(text, now=None):
+    """Переводит строку с датой в datetime с часовым поясом DATE_TIMEZONE.
+
+    Кэш учитывает нормализованную строку и момент отсчета с точностью до
+    минуты, поэтому относительные даты («завтра», «через 2 часа») остаются верными.
+    Наивный now считается местным временем DATE_TIMEZONE.
+    """
+    if not text:
+        return None
+    if now is None:
+        now = datetime.now(pytz.timezone(DATE_TIMEZONE))
+    if now.tzinfo is not None:
+        now = now.astimezone(pytz.timezone(DATE_TIMEZONE)).replace(tzinfo=None)
+
+    normalized = _SPACES_RE.sub(" ", text.lower()).strip()
+    # Быстрый путь считает в местном времени без пояса, пояс ставится в конце
+    reference = now.replace(second=0, microsecond=0)
+    return _resolve_cached(normalized, reference)
+
+def warm_up_dateparser():
+    """Импортирует dateparser и загружает русские словари заранее (первый разбор — самый долгий)"""
+    _parse_with_dateparser("в следующую среду", datetime.now())
+
+def date_cache_stats():
+    """Счетчики кэша и путей разбора: попадания, промахи, быстрый путь, dateparser"""
+    info = _resolve_cached.cache_info()
+    return dict(_stats, hits=info.hits, misses=info.misses, size=info.currsize)
+
+def clear_date_cache():
+    """Очищает кэш и счетчики"""
+    _resolve_cached.cache_clear()
+    for key in _stats:
+        _stats[key] = 0
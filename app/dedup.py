@@ -0,0 +1,292 @@
+import re
+import time
+import heapq
+import functools
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from app import metrics
+from config.settings import DEDUP_ENABLED, DEDUP_PATH, DEDUP_TTL, DEDUP_SIMILARITY, DEDUP_BUCKET_MINUTES
+
+logger = logging.getLogger("Dedup")
+
+# Корзина записи без даты (и задачи Notion, созданной не ботом: дата в Notion не хранится)
+NO_DATE = ""
+# Больше стольких похожих названий на трехграммы не сравнивается
+MAX_CANDIDATES = 32
+# Окончания, которые отбрасываются перед сравнением: «клиент» и «клиента», «продажи» и «продаж»
+# совпадают, а слова с разными корнями («молоко» и «молоток») — нет. Длинные проверяются первыми
+ENDINGS = (
+    "ами", "ями", "ого", "его", "ому", "ему", "ыми", "ими",
+    "ой", "ей", "ом", "ем", "ов", "ев", "ах", "ях", "ам", "ям", "ую", "юю", "ая", "яя", "ое", "ее",
+    "ые", "ие", "ых", "их", "ым", "им",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+)
+# Короче этого основа не укорачивается: «дом» и «дома» совпадают, «лес» и «леса» тоже
+MIN_STEM = 3
+# Ответ claim(), когда такая же запись еще отправляется: повторить позже, а не считать повтором
+PENDING_ERROR = "Такая же запись еще отправляется, повтор позже"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recent (
+    sink TEXT NOT NULL,
+    name TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (sink, name, bucket)
+);
+"""
+
+_SPACE_RE = re.compile(r"\s+")
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def normalize(task_name):
+    """Название без регистра, ё, знаков препинания и лишних пробелов"""
+    name = _PUNCTUATION_RE.sub(" ", task_name.lower().replace("ё", "е"))
+    return _SPACE_RE.sub(" ", name).strip()
+
+
+def stem(word):
+    """Слово без окончания из ENDINGS (основа не короче MIN_STEM букв)"""
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+@functools.lru_cache(maxsize=4096)
+def trigrams(name):
+    """Трехграммы названия, слова которого взяты целиком без окончаний"""
+    padded = "  " + " ".join(stem(word) for word in name.split()) + " "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class DedupIndex:
+    """Недавно созданные записи получателей для подавления повторов.
+
+    Ключ — (получатель, нормализованное название, корзина даты): дата
+    команды, округленная до DEDUP_BUCKET_MINUTES. Точный повтор находится
+    одним поиском в словаре, похожее название (Vosk расслышал слово иначе) —
+    по общим трехграммам с порогом сходства Жаккара DEDUP_SIMILARITY. Записи
+    живут DEDUP_TTL секунд и хранятся в SQLite, чтобы повтор после
+    перезапуска тоже распознавался.
+
+    claim() резервирует ключ до ответа API: два одинаковых запроса,
+    пришедшие одновременно, не уйдут в сеть оба. После ответа вызывается
+    confirm() или release(). Повтором считается только подтвержденная
+    запись: совпадение с резервом (первый запрос еще в сети или отправка
+    прервана по таймауту) возвращается с pending=True, и вызывающий
+    сообщает об ошибке, чтобы outbox повторил команду позже.
+    """
+
+    def __init__(self, path=DEDUP_PATH, ttl=DEDUP_TTL, similarity=DEDUP_SIMILARITY,
+                 bucket_minutes=DEDUP_BUCKET_MINUTES):
+        self.path = path
+        self.ttl = ttl
+        self.similarity = similarity
+        self.bucket_seconds = bucket_minutes * 60
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Ключи, зарезервированные claim() и еще не подтвержденные
+        self._pending = set()
+        self._postings = {}
+        self._expiry = []
+        self.checks = 0
+        self.hits = 0
+        self.near_hits = 0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        now = time.time()
+        with self._conn:
+            self._conn.execute("DELETE FROM recent WHERE expires_at <= ?", (now,))
+        for sink, name, bucket, expires_at in self._conn.execute("SELECT sink, name, bucket, expires_at FROM recent"):
+            self._add(sink, name, bucket, expires_at)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def bucket(self, due_date):
+        """Корзина даты: начало периода или дата, округленная вниз до bucket_seconds"""
+        if isinstance(due_date, tuple):
+            due_date = due_date[0]
+        if due_date is None:
+            return NO_DATE
+        return str(int(due_date.timestamp() // self.bucket_seconds))
+
+    def _add(self, sink, name, bucket, expires_at):
+        key = (sink, name, bucket)
+        if key not in self._entries:
+            for gram in trigrams(name):
+                self._postings.setdefault((sink, bucket, gram), set()).add(name)
+        self._entries[key] = expires_at
+        heapq.heappush(self._expiry, (expires_at, key))
+
+    def _remove(self, key):
+        sink, name, bucket = key
+        del self._entries[key]
+        self._pending.discard(key)
+        for gram in trigrams(name):
+            names = self._postings[(sink, bucket, gram)]
+            names.discard(name)
+            if not names:
+                del self._postings[(sink, bucket, gram)]
+
+    def _evict(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry)
+            # В куче остаются устаревшие копии ключей, продленных или снятых раньше срока
+            if self._entries.get(key) == expires_at:
+                self._remove(key)
+
+    def _find(self, sink, name, bucket):
+        """Совпадающая запись: (название, сходство) или None.
+
+        Похожие названия ищутся только среди записей той же корзины даты, поэтому
+        кандидатов немного, сколько бы записей ни было в индексе.
+        """
+        if (sink, name, bucket) in self._entries:
+            return name, 1.0
+
+        grams = trigrams(name)
+        shared = {}
+        for gram in grams:
+            for other in self._postings.get((sink, bucket, gram), ()):
+                shared[other] = shared.get(other, 0) + 1
+        best = None
+        for other, count in sorted(shared.items(), key=lambda item: -item[1])[:MAX_CANDIDATES]:
+            score = count / (len(grams) + len(trigrams(other)) - count)
+            if score >= self.similarity and (best is None or score > best[1]):
+                best = other, score
+        return best
+
+    def claim(self, sink, task_name, due_date=None):
+        """Ищет повтор; если его нет, резервирует ключ и возвращает None.
+
+        Совпадение возвращается как {"name", "similarity", "pending"}; pending=True —
+        запись только зарезервирована, и создана ли она, еще неизвестно.
+        """
+        name, bucket = normalize(task_name), self.bucket(due_date)
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            self.checks += 1
+            found = self._find(sink, name, bucket)
+            if found is None:
+                self._add(sink, name, bucket, now + self.ttl)
+                self._pending.add((sink, name, bucket))
+                return None
+            other, similarity = found
+            pending = (sink, other, bucket) in self._pending
+            if not pending:
+                self.hits += 1
+                self.near_hits += other != name
+        if pending:
+            logger.info(f"'{task_name}' для {sink}: такая же запись '{other}' еще отправляется, повтор позже")
+        else:
+            metrics.inc("dedup_hits_total", sink=sink)
+            logger.info(f"Повтор для {sink}: '{task_name}' ≈ '{other}' (сходство {similarity:.2f}), "
+                        f"запрос не отправлен; {self.report()}")
+        return {"name": other, "similarity": similarity, "pending": pending}
+
+    def confirm(self, sink, task_name, due_date=None):
+        """Запись создана: ключ сохраняется на диск на ttl секунд"""
+        key = (sink, normalize(task_name), self.bucket(due_date))
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._add(*key, expires_at)
+            self._pending.discard(key)
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO recent (sink, name, bucket, expires_at) VALUES (?, ?, ?, ?)",
+                                   key + (expires_at,))
+
+    def release(self, sink, task_name, due_date=None):
+        """Запись не создана: резерв снимается, следующая попытка уйдет в сеть"""
+        key = (sink, normalize(task_name), self.bucket(due_date))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def warm(self, sink, items):
+        """Добавляет уже созданные записи [(название, время создания)], о которых индекс не знает.
+
+        Записи, созданные ботом, уже сохранены confirm() со своей корзиной даты.
+        Остальные (созданные вручную) даты не хранят и попадают в корзину NO_DATE:
+        они совпадут только с командой без даты, а не с той же задачей на любой день.
+        """
+        rows = []
+        with self._lock:
+            known = {(entry_sink, name) for entry_sink, name, _ in self._entries}
+            for task_name, created_at in items:
+                expires_at = created_at.timestamp() + self.ttl
+                name = normalize(task_name)
+                if expires_at > time.time() and (sink, name) not in known:
+                    key = (sink, name, NO_DATE)
+                    self._add(*key, expires_at)
+                    rows.append(key + (expires_at,))
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO recent (sink, name, bucket, expires_at) VALUES (?, ?, ?, ?)", rows
+                )
+        return len(rows)
+
+    def report(self):
+        rate = self.hits / self.checks if self.checks else 0.0
+        return f"проверок {self.checks}, повторов {self.hits} ({rate:.1%}), из них похожих {self.near_hits}"
+
+
+_index = None
+
+
+def get_dedup_index():
+    """Индекс повторов, если он открыт, иначе None"""
+    return _index
+
+
+def open_dedup_index():
+    """Открывает индекс повторов (если DEDUP_ENABLED); без него проверки пропускаются"""
+    global _index
+    if DEDUP_ENABLED and _index is None:
+        _index = DedupIndex()
+    return _index
+
+
+def close_dedup_index():
+    global _index
+    if _index is not None:
+        logger.info(f"Повторы: {_index.report()}")
+        _index.close()
+    _index = None
+
+
+def warm_from_notion():
+    """Заполняет индекс задачами Notion, созданными за последние DEDUP_TTL секунд"""
+    if _index is None:
+        return 0
+    from app.notion import get_notion_client
+    since = datetime.fromtimestamp(time.time() - _index.ttl).astimezone()
+    count = _index.warm("notion", get_notion_client().recent_tasks(since))
+    logger.info(f"Индекс повторов: загружено задач из Notion: {count}, всего записей: {len(_index)}")
+    return count
+
+
+def claim(sink, task_name, due_date=None):
+    """Совпадение с недавней записью (см. DedupIndex.claim) или None (тогда ключ зарезервирован); без индекса — всегда None"""
+    return _index.claim(sink, task_name, due_date) if _index is not None else None
+
+
+def settle(sink, task_name, due_date, success):
+    """Подтверждает или снимает резерв claim() по результату запроса"""
+    if _index is None:
+        return
+    if success:
+        _index.confirm(sink, task_name, due_date)
+    else:
+        _index.release(sink, task_name, due_date)
@@ -0,0 +1,226 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from app.logs import command_context, batch_command_id
+from config.settings import SINK_TIMEOUT, PREWARM_INTERVAL
+
+logger = logging.getLogger("Dispatcher")
+
+
+class Sink:
+    """Получатель команды: имя, обработчик, таймаут, условие, когда он нужен, прогрев
+    и пакетный обработчик"""
+
+    __slots__ = ("name", "handler", "timeout", "applies", "prewarm", "batch")
+
+    def __init__(self, name, handler, timeout=SINK_TIMEOUT, applies=None, prewarm=None, batch=None):
+        self.name = name
+        self.handler = handler
+        self.timeout = timeout
+        self.applies = applies
+        self.prewarm = prewarm
+        self.batch = batch
+
+
+class Dispatcher:
+    """Рассылает разобранную команду всем получателям одновременно.
+
+    Команда — словарь {"task", "due", "start"} из run.main. Обработчик получателя
+    принимает команду и возвращает True/False. Общее время ожидания определяется
+    самым медленным получателем, а не суммой всех.
+    """
+
+    def __init__(self, max_workers=8, prewarm_interval=PREWARM_INTERVAL):
+        self.sinks = []
+        self.prewarm_interval = prewarm_interval
+        self._prewarmed_at = None
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sink")
+        # Отдельный пул для сбора результатов, чтобы ожидание не занимало потоки получателей
+        self._collectors = ThreadPoolExecutor(max_workers=2, thread_name_prefix="dispatch")
+
+    def register(self, name, handler, timeout=SINK_TIMEOUT, applies=None, prewarm=None, batch=None):
+        """Добавляет получателя; applies(command) решает, нужен ли он для этой команды,
+        prewarm() готовит соединение заранее, batch(commands) отправляет несколько команд
+        за раз и возвращает список {"success", "error"} в том же порядке"""
+        self.sinks.append(Sink(name, handler, timeout, applies, prewarm, batch))
+        return self
+
+    def _prewarm(self, sink):
+        try:
+            sink.prewarm()
+        except Exception as e:
+            logger.warning(f"Прогрев получателя {sink.name} не удался: {e}")
+
+    def prewarm(self):
+        """Прогревает получателей в фоне (не чаще раза в prewarm_interval секунд).
+
+        Вызывается, когда пользователь только начал диктовать команду: к моменту
+        отправки соединения уже открыты, а токены обновлены.
+        """
+        now = time.monotonic()
+        if self._prewarmed_at is not None and now - self._prewarmed_at < self.prewarm_interval:
+            return False
+        self._prewarmed_at = now
+        for sink in self.sinks:
+            if sink.prewarm is not None:
+                self._pool.submit(self._prewarm, sink)
+        return True
+
+    def _run(self, sink, command):
+        started = time.perf_counter()
+        # Поток пула не наследует контекст вызывающего: command_id для лога задается здесь
+        with command_context(command.get("key")):
+            success = bool(sink.handler(command))
+        return success, time.perf_counter() - started
+
+    def _collect(self, started, jobs):
+        results = {}
+        for sink, future in jobs:
+            result = {"success": False, "error": None, "elapsed": None}
+            remaining = max(0.0, started + sink.timeout - time.monotonic())
+            try:
+                result["success"], result["elapsed"] = future.result(timeout=remaining)
+            except TimeoutError:
+                # Остановить поток нельзя: запись продолжится, но ответа мы больше не ждем
+                result["error"] = f"нет ответа за {sink.timeout:g} с"
+                logger.warning(f"Получатель {sink.name}: {result['error']}")
+            except Exception as e:
+                result["error"] = str(e)
+                logger.error(f"Получатель {sink.name}: ошибка {e}", exc_info=True)
+            results[sink.name] = result
+        return results
+
+    def _run_batch(self, sink, commands):
+        started = time.perf_counter()
+        with command_context(batch_command_id([command.get("key") for command in commands])):
+            if sink.batch is not None and len(commands) > 1:
+                outcomes = [(bool(outcome["success"]), outcome.get("error")) for outcome in sink.batch(commands)]
+            else:
+                outcomes = [(bool(sink.handler(commands[0])), None)]
+        return outcomes, time.perf_counter() - started
+
+    def _collect_batch(self, started, jobs, count):
+        results = [{} for _ in range(count)]
+        for sink, indexes, future in jobs:
+            remaining = max(0.0, started + sink.timeout - time.monotonic())
+            try:
+                outcomes, elapsed = future.result(timeout=remaining)
+                for index, (success, error) in zip(indexes, outcomes):
+                    results[index][sink.name] = {"success": success, "error": error, "elapsed": elapsed}
+                continue
+            except TimeoutError:
+                error = f"нет ответа за {sink.timeout:g} с"
+                logger.warning(f"Получатель {sink.name}: {error} (команд: {len(indexes)})")
+            except Exception as e:
+                error = str(e)
+                logger.error(f"Получатель {sink.name}: ошибка {e}", exc_info=True)
+            for index in indexes:
+                results[index][sink.name] = {"success": False, "error": error, "elapsed": None}
+        return results
+
+    def applicable(self, command):
+        """Имена получателей, которым подходит команда"""
+        return [sink.name for sink in self.sinks if sink.applies is None or sink.applies(command)]
+
+    def dispatch(self, command, callback=None, only=None):
+        """Запускает всех подходящих получателей и сразу возвращает Future.
+
+        Future завершается словарем {имя: {"success", "error", "elapsed"}};
+        получатели, которым команда не подходит, в него не попадают.
+        only — необязательный набор имен, которыми ограничить рассылку.
+        callback(results), если указан, вызывается из фонового потока.
+        """
+        started = time.monotonic()
+        names = set(self.applicable(command))
+        if only is not None:
+            names &= set(only)
+        jobs = [(sink, self._pool.submit(self._run, sink, command)) for sink in self.sinks if sink.name in names]
+        future = self._collectors.submit(self._collect, started, jobs)
+        if callback is not None:
+            future.add_done_callback(lambda done: callback(done.result()))
+        return future
+
+    def dispatch_batch(self, commands, callback=None, only=None):
+        """Отправляет несколько команд одним пакетом и сразу возвращает Future.
+
+        Получатель с пакетным обработчиком получает все свои команды одним
+        вызовом, остальные — по команде в отдельном потоке; общее время
+        определяется самым медленным запросом, а не числом команд. Future
+        завершается списком словарей, как у dispatch, в порядке commands.
+        only — необязательный список наборов имен, по набору на команду.
+        """
+        started = time.monotonic()
+        selected = []
+        for index, command in enumerate(commands):
+            names = set(self.applicable(command))
+            if only is not None:
+                names &= set(only[index])
+            selected.append(names)
+
+        jobs = []
+        for sink in self.sinks:
+            indexes = [index for index, names in enumerate(selected) if sink.name in names]
+            if not indexes:
+                continue
+            if sink.batch is not None:
+                groups = [indexes]
+            else:
+                groups = [[index] for index in indexes]
+            for group in groups:
+                future = self._pool.submit(self._run_batch, sink, [commands[index] for index in group])
+                jobs.append((sink, group, future))
+        future = self._collectors.submit(self._collect_batch, started, jobs, len(commands))
+        if callback is not None:
+            future.add_done_callback(lambda done: callback(done.result()))
+        return future
+
+    def shutdown(self, wait=True):
+        """Останавливает пулы; с wait=True дожидается незавершенных записей"""
+        self._collectors.shutdown(wait=wait)
+        self._pool.shutdown(wait=wait)
+
+
+def _notion_sink(command):
+    from app.notion import create_notion_task
+    # При повторе из outbox проверяем, не создала ли задачу предыдущая попытка
+    since = command.get("created_at") if "notion" in command.get("retry", ()) else None
+    return create_notion_task(command["task"], command.get("due"), dedupe_since=since)
+
+def _notion_batch(commands):
+    from app.notion import create_notion_tasks
+    since = [command.get("created_at") if "notion" in command.get("retry", ()) else None for command in commands]
+    return create_notion_tasks([command["task"] for command in commands], dedupe_since=since,
+                               due_dates=[command.get("due") for command in commands])
+
+def _notion_prewarm():
+    from app.notion import get_notion_client
+    get_notion_client().warm_connection()
+
+def _calendar_sink(command):
+    from app.google_calendar import create_calendar_event, calendar_event_id
+    event_id = calendar_event_id(command["key"]) if command.get("key") else None
+    return create_calendar_event(command["task"], command["start"], event_id=event_id)
+
+def _calendar_batch(commands):
+    from app.google_calendar import create_calendar_events_bulk, calendar_event_id
+    # Все события уходят одним пакетным запросом; id делают повтор безопасным
+    return create_calendar_events_bulk([
+        (command["task"], command["start"], calendar_event_id(command["key"]) if command.get("key") else None)
+        for command in commands
+    ])
+
+def _calendar_prewarm():
+    from app.google_calendar import warm_up_calendar_service
+    warm_up_calendar_service()
+
+def create_dispatcher():
+    """Диспетчер с получателями по умолчанию: Notion и Google Calendar (если есть дата).
+
+    Необязательные поля команды из outbox: key — ключ идемпотентности,
+    created_at — время постановки в очередь, retry — получатели, которым команда уже отправлялась.
+    """
+    dispatcher = Dispatcher()
+    dispatcher.register("notion", _notion_sink, prewarm=_notion_prewarm, batch=_notion_batch)
+    dispatcher.register("calendar", _calendar_sink, applies=lambda command: command.get("start") is not None,
+                        prewarm=_calendar_prewarm, batch=_calendar_batch)
+    return dispatcher
@@ -1,89 +1,289 @@
 from googleapiclient.discovery import build
+from googleapiclient.http import BatchHttpRequest
+from googleapiclient.errors import HttpError
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+import httplib2
 from datetime import datetime, timedelta
+import threading
+import hashlib
 import pickle
 import os
 import pytz
 import logging
-from config.settings import GOOGLE_CALENDAR_CREDENTIALS, GOOGLE_CALENDAR_TOKEN, DEFAULT_EVENT_DURATION_HOURS, TIME_ZONE, GOOGLE_CALENDAR_ID
+from app import metrics, calendar_index, dedup
+from config.settings import (
+    GOOGLE_CALENDAR_CREDENTIALS, GOOGLE_CALENDAR_TOKEN, DEFAULT_EVENT_DURATION_HOURS, TIME_ZONE,
+    GOOGLE_CALENDAR_ID, GOOGLE_CALENDAR_API_ENDPOINT, GOOGLE_TOKEN_REFRESH_MARGIN
+)
 
 logger = logging.getLogger("GoogleCalendar")
 
-def get_calendar_service():
-    """Получает сервис Google Calendar"""
+SCOPES = ['https://www.googleapis.com/auth/calendar.events']
+
+# Google рекомендует не больше 50 запросов в одном пакете Calendar API
+BATCH_SIZE = 50
+
+# Сервис и учетные данные живут всё время работы процесса
+_service = None
+_credentials = None
+_service_lock = threading.Lock()
+# httplib2 не потокобезопасен: у каждого потока свое соединение с общими учетными данными
+_local = threading.local()
+
+def _save_credentials(creds):
+    with open(GOOGLE_CALENDAR_TOKEN, 'wb') as token:
+        pickle.dump(creds, token)
+
+def _load_credentials(interactive=True):
+    """Читает токен с диска, при необходимости обновляет его или запускает авторизацию.
+
+    interactive=False — для фоновых потоков: вместо авторизации в браузере
+    возвращает None, авторизация остается на первый запрос из главного цикла.
+    """
     creds = None
-    
+    if os.path.exists(GOOGLE_CALENDAR_TOKEN):
+        with open(GOOGLE_CALENDAR_TOKEN, 'rb') as token:
+            creds = pickle.load(token)
+
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            logger.info("Обновление токена Google Calendar...")
+            creds.refresh(Request())
+        elif not interactive:
+            logger.warning("Токен Google Calendar недействителен, авторизация отложена до первого запроса")
+            return None
+        else:
+            logger.info("Требуется авторизация Google Calendar...")
+            flow = InstalledAppFlow.from_client_secrets_file(GOOGLE_CALENDAR_CREDENTIALS, SCOPES)
+            creds = flow.run_local_server(port=0)
+
+        _save_credentials(creds)
+    return creds
+
+def _expires_soon(creds):
+    """Истекает ли токен в ближайшие GOOGLE_TOKEN_REFRESH_MARGIN секунд"""
+    expiry = getattr(creds, "expiry", None)
+    if expiry is None:
+        return False
+    return expiry - datetime.utcnow() < timedelta(seconds=GOOGLE_TOKEN_REFRESH_MARGIN)
+
+def _build_service(creds):
+    client_options = {"api_endpoint": GOOGLE_CALENDAR_API_ENDPOINT} if GOOGLE_CALENDAR_API_ENDPOINT else None
+    return build('calendar', 'v3', credentials=creds, cache_discovery=False, client_options=client_options)
+
+def get_calendar_service(interactive=True):
+    """Получает сервис Google Calendar (создается один раз, токен обновляется заранее).
+
+    interactive=False — не запускать авторизацию в браузере (None, если без нее не обойтись).
+    """
+    global _service, _credentials
+
     try:
-        if os.path.exists(GOOGLE_CALENDAR_TOKEN):
-            with open(GOOGLE_CALENDAR_TOKEN, 'rb') as token:
-                creds = pickle.load(token)
-        
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                logger.info("Обновление токена Google Calendar...")
-                creds.refresh(Request())
-            else:
-                logger.info("Требуется авторизация Google Calendar...")
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    GOOGLE_CALENDAR_CREDENTIALS, 
-                    ['https://www.googleapis.com/auth/calendar.events']
-                )
-                creds = flow.run_local_server(port=0)
-            
-            with open(GOOGLE_CALENDAR_TOKEN, 'wb') as token:
-                pickle.dump(creds, token)
-        
-        service = build('calendar', 'v3', credentials=creds, cache_discovery=False)
-        logger.info("✅ Сервис Google Calendar успешно инициализирован")
-        return service
-        
+        with _service_lock:
+            if _service is None:
+                credentials = _load_credentials(interactive)
+                if credentials is None:
+                    return None
+                _credentials = credentials
+                _service = _build_service(_credentials)
+                logger.info("✅ Сервис Google Calendar успешно инициализирован")
+            elif _expires_soon(_credentials) and getattr(_credentials, "refresh_token", None):
+                # Сервис держит ссылку на тот же объект, поэтому пересоздавать его не нужно
+                logger.info("Заблаговременное обновление токена Google Calendar...")
+                _credentials.refresh(Request())
+                _save_credentials(_credentials)
+            return _service
+
     except Exception as e:
         logger.error(f"❌ Ошибка при инициализации сервиса Google Calendar: {e}", exc_info=True)
         return None
 
-def create_calendar_event(task_name, due_date):
-    """Создает событие в Google Calendar"""
+def _thread_http():
+    """HTTP-клиент текущего потока для service.execute(http=...)"""
+    http = getattr(_local, "http", None)
+    if http is None or http.credentials is not _credentials:
+        http = _local.http = AuthorizedHttp(_credentials, http=httplib2.Http())
+    return http
+
+def warm_up_calendar_service():
+    """Создает сервис заранее, если токен уже сохранен; без действующего токена авторизация остается на первый запрос.
+
+    Вызывается из фоновых потоков (прогрев, синхронизация индекса), поэтому
+    авторизацию в браузере никогда не запускает.
+    """
+    if _service is None and not os.path.exists(GOOGLE_CALENDAR_TOKEN):
+        logger.info("Токен Google Calendar не найден, прогрев сервиса пропущен")
+        return None
+    return get_calendar_service(interactive=False)
+
+def reset_calendar_service():
+    """Сбрасывает кэшированный сервис (например, после отзыва токена)"""
+    global _service, _credentials
+    with _service_lock:
+        _service = None
+        _credentials = None
+
+def build_event(task_name, due_date):
+    """Формирует тело события; дата без часового пояса считается временем TIME_ZONE"""
+    tz = pytz.timezone(TIME_ZONE)
+
+    # Если дата не имеет часового пояса, назначаем TIME_ZONE
+    if due_date.tzinfo is None:
+        start_time = tz.localize(due_date)
+    else:
+        start_time = due_date
+
+    end_time = start_time + timedelta(hours=DEFAULT_EVENT_DURATION_HOURS)
+
+    return {
+        'summary': task_name,
+        'description': f'Задача: {task_name}',
+        'start': {
+            'dateTime': start_time.isoformat(),
+            'timeZone': TIME_ZONE,
+        },
+        'end': {
+            'dateTime': end_time.isoformat(),
+            'timeZone': TIME_ZONE,
+        },
+    }
+
+def calendar_event_id(key):
+    """Постоянный id события по ключу идемпотентности (допустимы символы base32hex)"""
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def create_calendar_event(task_name, due_date, event_id=None):
+    """Создает событие в Google Calendar.
+
+    С event_id повторная вставка того же события (ответ 409) считается успехом.
+    Повтор недавно созданного события (см. app.dedup) в API не отправляется; пока такое же
+    событие еще отправляется, возвращается False, чтобы outbox повторил команду позже.
+    """
     if not due_date:
         logger.error("❌ Не указана дата для события")
         return False
-        
+
+    duplicate = dedup.claim("calendar", task_name, due_date)
+    if duplicate is not None:
+        return not duplicate["pending"]
+    success = _insert_event(task_name, due_date, event_id)
+    dedup.settle("calendar", task_name, due_date, success)
+    return success
+
+@metrics.timed("calendar")
+def _insert_event(task_name, due_date, event_id):
     try:
         service = get_calendar_service()
         if not service:
             logger.error("❌ Не удалось получить сервис Google Calendar")
             return False
-            
-        tz = pytz.timezone(TIME_ZONE)
-        
-        # Если дата не имеет часового пояса, назначаем TIME_ZONE
-        if due_date.tzinfo is None:
-            start_time = tz.localize(due_date)
-        else:
-            start_time = due_date
-        
-        end_time = start_time + timedelta(hours=DEFAULT_EVENT_DURATION_HOURS)
-        
-        event = {
-            'summary': task_name,
-            'description': f'Задача: {task_name}',
-            'start': {
-                'dateTime': start_time.isoformat(),
-                'timeZone': TIME_ZONE,
-            },
-            'end': {
-                'dateTime': end_time.isoformat(),
-                'timeZone': TIME_ZONE,
-            },
-        }
-        
-        logger.info(f"Создаю событие в Google Calendar: '{task_name}' на {start_time}")
-        
-        created_event = service.events().insert(calendarId=GOOGLE_CALENDAR_ID, body=event).execute()
-        
-        logger.info(f'✅ Событие создано: {created_event.get("htmlLink", "без ссылки")}')
+
+        event = build_event(task_name, due_date)
+        if event_id:
+            event['id'] = event_id
+
+        logger.info("Создаю событие в Google Calendar: '%s' на %s", task_name, event['start']['dateTime'])
+
+        request = service.events().insert(calendarId=GOOGLE_CALENDAR_ID, body=event)
+        created_event = request.execute(http=_thread_http())
+
+        logger.info("✅ Событие создано: %s", created_event.get("htmlLink", "без ссылки"))
+        calendar_index.record_created([created_event])
         return True
-            
+
+    except HttpError as e:
+        if event_id and e.resp.status == 409:
+            logger.info("Событие '%s' уже есть в календаре, повторно не создаю", task_name)
+            return True
+        logger.error(f"❌ Ошибка при создании события: {e}", exc_info=True)
+        return False
+
     except Exception as e:
         logger.error(f"❌ Ошибка при создании события: {e}", exc_info=True)
         return False
+
+def _new_batch(service, callback):
+    if GOOGLE_CALENDAR_API_ENDPOINT:
+        # new_batch_http_request() всегда берет адрес из документа discovery
+        batch_uri = GOOGLE_CALENDAR_API_ENDPOINT.rstrip("/") + "/batch/calendar/v3"
+        return BatchHttpRequest(callback=callback, batch_uri=batch_uri)
+    return service.new_batch_http_request(callback=callback)
+
+def create_calendar_events_bulk(items):
+    """Создает несколько событий пакетными запросами (BatchHttpRequest).
+
+    items — список пар (название, дата) или троек (название, дата, id события).
+    С id повторная вставка (ответ 409) считается успехом, как в create_calendar_event.
+    Возвращает список словарей {"success": bool, "error": str | None, "link": str | None}
+    в том же порядке.
+    """
+    results = [{"success": False, "error": None, "link": None} for _ in items]
+    new_events = []
+
+    service = get_calendar_service()
+    if not service:
+        for result in results:
+            result["error"] = "Не удалось получить сервис Google Calendar"
+        return results
+
+    # Недавно созданные события не отправляются, как и такие же, как еще отправляемые (их повторит outbox)
+    duplicates = set()
+    for index, item in enumerate(items):
+        duplicate = dedup.claim("calendar", item[0], item[1]) if item[1] else None
+        if duplicate is not None:
+            if duplicate["pending"]:
+                results[index]["error"] = dedup.PENDING_ERROR
+            else:
+                results[index]["success"] = True
+            duplicates.add(index)
+
+    def event_id_of(index):
+        return items[index][2] if len(items[index]) > 2 else None
+
+    def on_response(request_id, response, exception):
+        result = results[int(request_id)]
+        if isinstance(exception, HttpError) and exception.resp.status == 409 and event_id_of(int(request_id)):
+            result["success"] = True
+        elif exception is not None:
+            result["error"] = str(exception)
+        else:
+            result["success"] = True
+            result["link"] = response.get("htmlLink")
+            new_events.append(response)
+
+    for offset in range(0, len(items), BATCH_SIZE):
+        batch = _new_batch(service, on_response)
+        for index in range(offset, min(offset + BATCH_SIZE, len(items))):
+            if index in duplicates:
+                continue
+            task_name, due_date = items[index][:2]
+            event_id = event_id_of(index)
+            if not due_date:
+                results[index]["error"] = "Не указана дата для события"
+                continue
+            try:
+                event = build_event(task_name, due_date)
+            except Exception as e:
+                results[index]["error"] = str(e)
+                continue
+            if event_id:
+                event['id'] = event_id
+            batch.add(service.events().insert(calendarId=GOOGLE_CALENDAR_ID, body=event), request_id=str(index))
+
+        try:
+            batch.execute(http=_thread_http())
+        except Exception as e:
+            logger.error(f"❌ Ошибка пакетного запроса к Google Calendar: {e}", exc_info=True)
+            for index in range(offset, min(offset + BATCH_SIZE, len(items))):
+                if not results[index]["success"] and results[index]["error"] is None:
+                    results[index]["error"] = str(e)
+
+    calendar_index.record_created(new_events)
+    for index, (task_name, due_date) in enumerate(item[:2] for item in items):
+        if due_date and index not in duplicates:
+            dedup.settle("calendar", task_name, due_date, results[index]["success"])
+    created = sum(1 for result in results if result["success"])
+    logger.info("✅ Пакетно создано событий: %d из %d", created, len(items))
+    return results
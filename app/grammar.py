@@ -0,0 +1,150 @@
+import os
+import json
+import difflib
+import logging
+from app.command import COMMAND_VERBS, CONNECTOR_WORDS, OBJECT_WORDS, ORDINAL_WORDS, MONTH_WORDS, TASK_STOPWORDS
+from app.dates import WEEKDAYS, RELATIVE_DAYS, DAY_PERIODS, UNITS
+from app.numerals import numeral_words
+from app.capture import waveform
+
+logger = logging.getLogger("Grammar")
+
+# Слово вне грамматики в результатах Vosk
+UNK = "[unk]"
+# Слова команды, которых нет в словарях разбора
+EXTRA_WORDS = ("стоп", "через", "года", "во")
+# Больше этого звук фразы для повторного декодирования не хранится, секунд
+MAX_UTTERANCE_SECONDS = 30
+
+
+def command_vocabulary():
+    """Слова каркаса команды: глаголы, объекты, предлоги, союзы, даты и числительные"""
+    words = set(COMMAND_VERBS) | set(OBJECT_WORDS) | set(TASK_STOPWORDS) | set(EXTRA_WORDS) | CONNECTOR_WORDS
+    for phrase in ORDINAL_WORDS + MONTH_WORDS:
+        words.update(phrase.split())
+    for table in (WEEKDAYS, RELATIVE_DAYS, DAY_PERIODS, UNITS):
+        words.update(table)
+    return words | numeral_words()
+
+
+def load_lexicon(path):
+    """Названия задач из словаря пользователя: по одному на строку, # — комментарий"""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = (line.split("#", 1)[0].strip().lower() for line in f)
+        return [line for line in lines if line]
+
+
+def model_words(model_path):
+    """Словарь модели (graph/words.txt) или None, если его нет"""
+    path = os.path.join(model_path, "graph", "words.txt")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return {line.split(" ", 1)[0] for line in f}
+
+
+def supports_grammar(model_path):
+    """Грамматику во время работы поддерживают только модели с динамическим графом (малые)"""
+    return os.path.exists(os.path.join(model_path, "graph", "Gr.fst"))
+
+
+def build_grammar(lexicon=(), vocabulary=None):
+    """Список слов для KaldiRecognizer: каркас команды, слова словаря задач и [unk].
+
+    Слова передаются по одному, а не фразами, чтобы порядок слов в названии
+    был любым. Слова, которых нет в словаре модели (vocabulary), отбрасываются.
+    """
+    words = command_vocabulary()
+    for phrase in lexicon:
+        words.update(phrase.split())
+    if vocabulary is not None:
+        missing = words - vocabulary
+        if missing:
+            logger.debug(f"Нет в словаре модели: {len(missing)} слов")
+        words &= vocabulary
+    return sorted(words) + [UNK]
+
+
+def build_model_grammar(model_path, lexicon_path):
+    """Грамматика для модели или None, если модель ее не поддерживает"""
+    if not supports_grammar(model_path):
+        logger.warning(f"Модель {model_path} не поддерживает грамматику, распознавание без ограничений")
+        return None
+    grammar = build_grammar(load_lexicon(lexicon_path), model_words(model_path))
+    logger.info(f"Грамматика распознавания: {len(grammar)} слов")
+    return grammar
+
+
+def splice(constrained, fallback):
+    """Заменяет [unk] в результате по грамматике словами открытого словаря с того же места.
+
+    Слова выравниваются по совпадающим словам каркаса; там, где результаты
+    расходятся без [unk], остается результат по грамматике — на словах команды
+    он точнее.
+    """
+    if UNK not in constrained:
+        return list(constrained)
+    matcher = difflib.SequenceMatcher(a=constrained, b=fallback, autojunk=False)
+    words = []
+    for op, a1, a2, b1, b2 in matcher.get_opcodes():
+        if op != "equal" and UNK in constrained[a1:a2]:
+            words += fallback[b1:b2]
+        else:
+            words += constrained[a1:a2]
+    return [word for word in words if word != UNK]
+
+
+class GrammarRecognizer:
+    """KaldiRecognizer с грамматикой команды и добором названия открытым словарем.
+
+    Звук декодируется по ограниченной грамматике: это дешевле и точнее на
+    словах команды. Если в окончательном результате есть [unk] — обычно это
+    слова названия задачи вне словаря, — звук фразы декодируется повторно без
+    грамматики, и [unk] заменяются словами с того же места. Методы повторяют
+    ту часть интерфейса KaldiRecognizer, которую использует AudioCapture.
+    В отличие от KaldiRecognizer, AcceptWaveform принимает и буфер
+    (memoryview): звук копируется для повторного декодирования, а в Vosk
+    передается через waveform().
+    """
+
+    # AudioCapture передает такому распознавателю буфер как есть, без waveform()
+    accepts_buffer = True
+
+    def __init__(self, model, sample_rate, grammar):
+        import vosk
+        self.model = model
+        self.sample_rate = sample_rate
+        self._recognizer = vosk.KaldiRecognizer(model, sample_rate, json.dumps(grammar, ensure_ascii=False))
+        self._audio = bytearray()
+        self._max_bytes = MAX_UTTERANCE_SECONDS * sample_rate * 2
+        self.fallbacks = 0
+
+    def AcceptWaveform(self, data):
+        self._audio += data
+        if len(self._audio) > self._max_bytes:
+            del self._audio[:len(self._audio) - self._max_bytes]
+        return self._recognizer.AcceptWaveform(waveform(data))
+
+    def PartialResult(self):
+        return self._recognizer.PartialResult()
+
+    def Result(self):
+        return self._resolve(self._recognizer.Result())
+
+    def FinalResult(self):
+        return self._resolve(self._recognizer.FinalResult())
+
+    def _resolve(self, result_json):
+        audio, self._audio = bytes(self._audio), bytearray()
+        words = json.loads(result_json).get("text", "").split()
+        if UNK not in words:
+            return result_json
+
+        import vosk
+        recognizer = vosk.KaldiRecognizer(self.model, self.sample_rate)
+        recognizer.AcceptWaveform(audio)
+        fallback = json.loads(recognizer.FinalResult()).get("text", "").split()
+        self.fallbacks += 1
+        return json.dumps({"text": " ".join(splice(words, fallback)), "fallback": True}, ensure_ascii=False)
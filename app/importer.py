@@ -0,0 +1,296 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import logging
+import itertools
+import collections
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from app.outbox import encode_command
+from config.settings import NOTION_RATE_LIMIT, SINK_TIMEOUT
+
+logger = logging.getLogger("Import")
+
+# Строк в одном задании для процесса разбора
+PARSE_CHUNK = 500
+# Сколько заданий разбора может ждать записи на каждый процесс
+CHUNKS_PER_WORKER = 2
+# Команд в одной пакетной отправке: не больше BATCH_SIZE Calendar API и столько, чтобы
+# Notion успевал создать их за половину SINK_TIMEOUT при ограничении частоты
+WRITE_BATCH = max(1, min(50, int(NOTION_RATE_LIMIT * SINK_TIMEOUT / 2))) if NOTION_RATE_LIMIT > 0 else 50
+SINKS = ("notion", "calendar")
+
+
+def read_lines(path, start=0):
+    """Построчно читает файл команд: (номер строки с 1, текст, now или None).
+
+    Строка JSONL — объект с полем text (или command) и необязательным now
+    (ISO-дата, относительно которой разбираются «завтра» и «в пятницу»);
+    остальные строки считаются текстом команды. Строки до start пропускаются.
+    """
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if number <= start:
+                continue
+            line = line.strip()
+            if line.startswith("{"):
+                try:
+                    data = json.loads(line)
+                    yield number, data.get("text") or data.get("command") or "", data.get("now")
+                    continue
+                except json.JSONDecodeError:
+                    pass
+            yield number, line, None
+
+
+def init_parser():
+    """Инициализатор процесса разбора: словари dateparser загружаются один раз"""
+    from app.dates import warm_up_dateparser
+    logging.getLogger().setLevel(logging.WARNING)
+    warm_up_dateparser()
+
+
+def parse_chunk(lines, default_now=None):
+    """Разбирает блок строк в процессе пула: [(номер, текст, [команды], ошибка)]"""
+    from app.command import parse_commands
+    results = []
+    for number, text, now in lines:
+        try:
+            moment = datetime.fromisoformat(now or default_now) if now or default_now else None
+            results.append((number, text, parse_commands(text, moment), None))
+        except Exception as e:
+            results.append((number, text, [], str(e)))
+    return results
+
+
+def _chunks(lines, size):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parsed_lines(lines, workers=None, default_now=None, chunk_size=PARSE_CHUNK):
+    """Разбирает строки пулом процессов и отдает результаты в исходном порядке.
+
+    В работе одновременно не больше CHUNKS_PER_WORKER блоков на процесс, поэтому
+    память не зависит от длины файла: чтение ждет, пока запись не заберет результаты.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_parser) as pool:
+        pending = collections.deque()
+        for chunk in _chunks(lines, chunk_size):
+            pending.append(pool.submit(parse_chunk, chunk, default_now))
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _command_data(parsed):
+    """Разобранная команда в виде {"task", "due", "start"}, как в run.prepare_command"""
+    due = parsed.get("due")
+    start = due
+    if isinstance(due, tuple):
+        start = due[0] if all(due) else None
+        due = due if all(due) else None
+    return {"task": parsed["task"], "due": due, "start": start}
+
+
+class Checkpoint:
+    """Номер последней строки, результаты которой записаны в отчет, и длина отчета в этот момент
+    (JSON рядом с отчетом)"""
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        return data if data.get("source") == self.source else None
+
+    def save(self, line, offset, started_at, inflight=None):
+        """inflight — последняя строка пакета, который отправляется прямо сейчас"""
+        # Запись через временный файл: после сбоя остается либо старая, либо новая отметка
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"source": self.source, "line": line, "offset": offset, "started_at": started_at,
+                       "inflight": inflight, "inflight_at": time.time() if inflight else None}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Importer:
+    """Массовый импорт текстовых команд: разбор пулом процессов и пакетная отправка.
+
+    Команды отправляются через Dispatcher.dispatch_batch по WRITE_BATCH штук:
+    Notion — параллельно в пределах NOTION_RATE_LIMIT, Calendar — пакетным
+    запросом. Ключ идемпотентности команды строится из пути файла и номера
+    строки, поэтому после продолжения с отметки события календаря не
+    дублируются. Перед отправкой пакета в отметке запоминаются его последняя
+    строка и время: если импорт прервался посреди отправки, задачи Notion из
+    этого пакета при продолжении сначала ищутся по названию среди созданных
+    после начала его отправки.
+    """
+
+    def __init__(self, dispatcher, report, checkpoint, batch_size=WRITE_BATCH, dry_run=False):
+        self.dispatcher = dispatcher
+        self.report = report
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.source_key = hashlib.sha1(checkpoint.source.encode("utf-8")).hexdigest()[:12]
+        self.counts = collections.Counter()
+        self.line = 0
+        self.offset = 0
+        self.started_at = time.time()
+        self.retry_until = None
+        self.retry_since = None
+
+    def run(self, lines):
+        """Отправляет разобранные строки [(номер, текст, команды, ошибка)] и пишет отчет"""
+        batch, commands = [], []
+        last = None
+        for number, text, parsed, error in lines:
+            items = []
+            for index, command in enumerate(parsed):
+                if "task" not in command:
+                    continue
+                data = _command_data(command)
+                data["key"] = f"import:{self.source_key}:{number}:{index}"
+                if self.retry_until is not None and number <= self.retry_until:
+                    # Пакет, прерванный посреди отправки, мог частично дойти до Notion
+                    data["retry"] = {"notion"}
+                    data["created_at"] = datetime.fromtimestamp(self.retry_since).astimezone()
+                items.append(data)
+                commands.append(data)
+            batch.append((number, text, items, error))
+            last = number
+            if len(commands) >= self.batch_size:
+                self._flush(batch, commands)
+                batch, commands = [], []
+        if batch:
+            self._flush(batch, commands)
+        return last
+
+    def _flush(self, batch, commands):
+        results = {}
+        if commands and not self.dry_run:
+            self.checkpoint.save(self.line, self.offset, self.started_at, inflight=batch[-1][0])
+            outcomes = self.dispatcher.dispatch_batch(commands).result()
+            results = {command["key"]: outcome for command, outcome in zip(commands, outcomes)}
+
+        for number, text, items, error in batch:
+            entry = {"line": number, "text": text, "commands": []}
+            for command in items:
+                sinks = results.get(command["key"], {})
+                entry["commands"].append(dict(
+                    json.loads(encode_command(command)),
+                    **{name: {"success": result["success"], "error": result["error"]} for name, result in sinks.items()}
+                ))
+            failed = sum(1 for command in entry["commands"]
+                         for name in SINKS if name in command and not command[name]["success"])
+            if error:
+                entry["status"], entry["error"] = "error", error
+            elif not items:
+                entry["status"] = "skipped"
+            elif failed:
+                entry["status"] = "failed"
+            else:
+                entry["status"] = "parsed" if self.dry_run else "ok"
+            self.counts[entry["status"]] += 1
+            self.counts["commands"] += len(items)
+            self.report.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.report.flush()
+        self.line, self.offset = batch[-1][0], self.report.tell()
+        self.checkpoint.save(self.line, self.offset, self.started_at)
+
+
+def import_file(path, report_path, workers=None, batch_size=WRITE_BATCH, resume=False, dry_run=False,
+                now=None, limit=None, dispatcher=None):
+    """Импортирует команды из файла; возвращает сводку {"lines", "commands", статусы, "seconds"}"""
+    checkpoint = Checkpoint(report_path + ".checkpoint", path)
+    state = checkpoint.load() if resume else None
+    start = state["line"] if state else 0
+    if state:
+        logger.info(f"Продолжаю импорт {path} со строки {start + 1}")
+
+    own_dispatcher = dispatcher is None and not dry_run
+    if own_dispatcher:
+        from app.dispatch import create_dispatcher
+        dispatcher = create_dispatcher()
+
+    started = time.perf_counter()
+    with open(report_path, "r+" if state else "w", encoding="utf-8") as report:
+        if state:
+            # Строки отчета, записанные после отметки, будут записаны заново
+            report.seek(state["offset"])
+            report.truncate()
+        importer = Importer(dispatcher, report, checkpoint, batch_size, dry_run)
+        if state:
+            importer.line, importer.offset = state["line"], state["offset"]
+            importer.started_at = state["started_at"]
+            importer.retry_until = state.get("inflight")
+            importer.retry_since = state.get("inflight_at") or state["started_at"]
+        lines = read_lines(path, start)
+        if limit is not None:
+            lines = itertools.takewhile(lambda line: line[0] <= start + limit, lines)
+        try:
+            last = importer.run(parsed_lines(lines, workers, now))
+        finally:
+            if own_dispatcher:
+                dispatcher.shutdown()
+
+    if limit is None or last is None:
+        checkpoint.remove()
+    seconds = time.perf_counter() - started
+    lines_done = sum(importer.counts[status] for status in ("ok", "parsed", "failed", "skipped", "error"))
+    return dict(importer.counts, lines=lines_done, seconds=round(seconds, 3),
+                lines_per_second=round(lines_done / seconds, 1) if seconds else 0.0)
+
+
+def main(argv=None):
+    """CLI: python run.py import <файл> [-o report.jsonl] [-j N] [--batch N] [--resume] [--dry-run] [--now ISO]"""
+    parser = argparse.ArgumentParser(prog="run.py import", description="Массовый импорт текстовых команд")
+    parser.add_argument("path", help="текстовый файл (команда на строку) или JSONL с полями text и now")
+    parser.add_argument("-o", "--output", default="import_report.jsonl", help="отчет по строкам (JSONL)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="процессов разбора (по умолчанию — число ядер)")
+    parser.add_argument("--batch", type=int, default=WRITE_BATCH, help="команд в одной пакетной отправке")
+    parser.add_argument("--resume", action="store_true", help="продолжить с отметки прерванного импорта")
+    parser.add_argument("--dry-run", action="store_true", help="только разобрать, ничего не отправлять")
+    parser.add_argument("--now", help="дата, относительно которой разбираются относительные даты (ISO)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        print(f"❌ Файл не найден: {args.path}")
+        return 1
+    if not args.dry_run:
+        from config.settings import check_settings
+        check_settings()
+
+    summary = import_file(args.path, args.output, args.workers, args.batch, args.resume, args.dry_run, args.now)
+    print(f"✅ Строк: {summary['lines']}, команд: {summary.get('commands', 0)}; "
+          f"успешно: {summary.get('ok', 0) + summary.get('parsed', 0)}, с ошибками: {summary.get('failed', 0)}, "
+          f"без команды: {summary.get('skipped', 0)}, ошибок разбора: {summary.get('error', 0)}")
+    print(f"📊 {summary['seconds']:.1f} с, строк/с: {summary['lines_per_second']:.1f}")
+    print(f"📝 Отчет: {args.output}")
+    return 0 if not summary.get("failed") and not summary.get("error") else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
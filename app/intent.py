@@ -0,0 +1,81 @@
+import re
+import logging
+from app.logs import NOISY
+from app.numerals import normalize_numerals
+from app.command import COMMAND_VERBS, CONNECTOR_WORDS, TASK_STOPWORDS, extract_task_and_date, parse_date
+
+logger = logging.getLogger("EarlyIntent")
+
+# Время в дате после нормализации числительных: «в 10», «10:30», «через 2 часа»
+_CLOCK_RE = re.compile(r"\d:\d\d|\b(?:в|во|к)\s+\d|\bчерез\b")
+
+
+class EarlyIntent:
+    """Разбор частичных результатов Vosk до конца фразы.
+
+    update() получает каждую частичную гипотезу и позицию звука в секундах.
+    Как только в ней появляется глагол команды, один раз на фразу вызывается
+    on_verb — например, прогрев соединений с получателями. Если гипотеза
+    содержит полную команду «создай задачу … на <дата>» и не меняется
+    stable_ms миллисекунд звука, update() возвращает True: фразу можно
+    завершить, не дожидаясь паузы, по которой Vosk ставит конец фразы.
+    Пока гипотеза кончается союзом или запятой («… на завтра и»), за ней
+    идет следующая команда, и фраза не завершается. Дата без времени («… на
+    завтра», «… в пятницу») тоже ждет обычного конца фразы: за паузой часто
+    следует «в 10», которое иначе пришло бы отдельной фразой. Если пауза пришлась
+    перед союзом, остаток («и задачу созвон …») придет отдельной фразой,
+    и parse_commands разберет его как продолжение.
+    """
+
+    def __init__(self, stable_ms=300, on_verb=None):
+        self.stable = stable_ms / 1000
+        self.on_verb = on_verb
+        self.reset()
+
+    def reset(self):
+        """Начало новой фразы"""
+        self._text = None
+        self._since = None
+        self._complete = False
+        self._verb_seen = False
+
+    def _check(self, text):
+        """Есть ли в гипотезе название задачи и распознаваемая дата"""
+        # «… на завтра и» — за союзом идет следующая команда
+        if text.endswith(",") or text.split()[-1] in CONNECTOR_WORDS:
+            return False
+        task, date_part = extract_task_and_date(text)
+        if not task or not date_part:
+            return False
+        # «на завтра в …» — после предлога фраза явно продолжается
+        if date_part.split()[-1] in TASK_STOPWORDS:
+            return False
+        # «на завтра» — время, скорее всего, еще прозвучит
+        if not _CLOCK_RE.search(normalize_numerals(date_part)):
+            return False
+        try:
+            return parse_date(date_part) is not None
+        except Exception:
+            return False
+
+    def update(self, partial, position):
+        """True, если полная команда держится в гипотезе не меньше stable_ms"""
+        text = partial.lower().strip()
+        if not text:
+            return False
+
+        if text != self._text:
+            self._text = text
+            self._since = position
+            if not self._verb_seen and any(verb in text for verb in COMMAND_VERBS):
+                self._verb_seen = True
+                if self.on_verb is not None:
+                    try:
+                        self.on_verb()
+                    except Exception as e:
+                        logger.warning(f"Прогрев по глаголу команды не удался: {e}", extra=NOISY)
+            # Полноту проверяем только при изменении гипотезы: разбор даты дороже сравнения строк
+            self._complete = self._verb_seen and self._check(text)
+            return False
+
+        return self._complete and position - self._since >= self.stable
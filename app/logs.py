@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+import contextlib
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from config.settings import (
+    LOG_PATH, LOG_LEVEL, LOG_FORMAT, LOG_MAX_BYTES, LOG_ROTATE_WHEN, LOG_BACKUP_COUNT,
+    LOG_RATE_LIMIT, LOG_RATE_WINDOW
+)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Аргументы этих типов не меняются после вызова: сообщение можно собрать позже, в потоке записи
+_IMMUTABLE = (str, int, float, bool, type(None), datetime)
+
+_command_id = contextvars.ContextVar("command_id", default=None)
+
+# extra для частых однотипных сообщений (на каждый блок звука, частичный результат, сессию):
+# их число ограничивает RateLimitFilter
+NOISY = {"noisy": True}
+
+
+def current_command_id():
+    """Идентификатор команды, которую обрабатывает текущий поток, или None"""
+    return _command_id.get()
+
+
+@contextlib.contextmanager
+def command_context(command_id):
+    """Помечает записи лога внутри блока идентификатором команды (для JSON-поля command_id)"""
+    token = _command_id.set(command_id)
+    try:
+        yield command_id
+    finally:
+        _command_id.reset(token)
+
+
+def batch_command_id(keys):
+    """Идентификатор пакета команд: ключи через запятую, у длинного пакета — первый и последний"""
+    keys = [key for key in keys if key]
+    if len(keys) > 4:
+        return f"{keys[0]}..{keys[-1]}"
+    return ",".join(keys) or None
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON: время, уровень, логгер, поток, сообщение, command_id"""
+
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        command_id = getattr(record, "command_id", None)
+        if command_id:
+            data["command_id"] = command_id
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            data["suppressed"] = suppressed
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Прежний текстовый формат; command_id и число подавленных сообщений — в конце строки"""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record):
+        text = super().format(record)
+        command_id = getattr(record, "command_id", None)
+        if command_id:
+            text += f" [{command_id}]"
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            text += f" (подавлено похожих: {suppressed})"
+        return text
+
+
+class RateLimitFilter(logging.Filter):
+    """Не больше rate записей с extra=NOISY за window секунд из одного места вызова.
+
+    Место вызова — файл и строка, поэтому сообщения с f-строкой, разные по
+    тексту, считаются вместе. Первая запись следующего окна получает поле
+    suppressed — сколько записей было отброшено. Остальные записи фильтр
+    пропускает. Он стоит на QueueHandler: отброшенная запись не попадает
+    даже в очередь.
+    """
+
+    def __init__(self, rate=LOG_RATE_LIMIT, window=LOG_RATE_WINDOW):
+        super().__init__()
+        self.rate = rate
+        self.window = window
+        self._lock = threading.Lock()
+        self._sites = {}
+
+    def filter(self, record):
+        if self.rate <= 0 or not getattr(record, "noisy", False):
+            return True
+        site = (record.pathname, record.lineno)
+        now = record.created
+        with self._lock:
+            state = self._sites.get(site)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state is not None else 0
+                self._sites[site] = [now, 1, 0]
+            elif state[1] < self.rate:
+                state[1] += 1
+                suppressed = 0
+            else:
+                state[2] += 1
+                return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class CommandQueueHandler(QueueHandler):
+    """QueueHandler, который не форматирует сообщение в вызывающем потоке.
+
+    Стандартный prepare() собирает текст сообщения до постановки в очередь;
+    здесь это делает поток записи, если аргументы неизменяемы. В запись
+    добавляется command_id текущей команды.
+    """
+
+    def prepare(self, record):
+        record.command_id = _command_id.get()
+        if record.args and not all(isinstance(arg, _IMMUTABLE) for arg in
+                                   (record.args.values() if isinstance(record.args, dict) else record.args)):
+            record.msg, record.args = record.getMessage(), None
+        return record
+
+
+class RotatingLogHandler(TimedRotatingFileHandler):
+    """Файл лога, который ротируется и по времени (when), и по размеру (max_bytes).
+
+    Архивы получают суффикс даты, а при нескольких ротациях по размеру в один
+    период — еще и номер; хранится backup_count последних. Ротацию выполняет
+    поток QueueListener, поэтому переименование файлов не задерживает бота.
+    """
+
+    def __init__(self, path, when=LOG_ROTATE_WHEN, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
+        super().__init__(path, when=when, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes
+
+    def rotation_filename(self, default_name):
+        name, number = default_name, 0
+        while os.path.exists(name):
+            number += 1
+            # Номер с нулями: архивы одного дня сортируются по порядку создания
+            name = f"{default_name}.{number:03d}"
+        return name
+
+
+_listener = None
+_handlers = []
+
+
+def _after_fork_in_child():
+    # Поток записи в дочерний процесс не переходит: пишем напрямую, как до очереди
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, CommandQueueHandler):
+            root.removeHandler(handler)
+    for handler in _handlers:
+        root.addHandler(handler)
+
+
+def setup_logging(path=LOG_PATH, level=LOG_LEVEL, console=True, stream=None, file_handler=None):
+    """Настраивает корневой логгер: запись в файл и на консоль в отдельном потоке.
+
+    Потоки приложения только кладут запись в очередь, а форматирование, запись
+    на диск и ротацию выполняет QueueListener. Файл пишется в формате
+    LOG_FORMAT (json или text), консоль — текстом. file_handler заменяет
+    файловый обработчик (например, в бенчмарке). Повторный вызов
+    перенастраивает логирование.
+    """
+    global _listener, _handlers
+    stop_logging()
+
+    handlers = []
+    if file_handler is None and path:
+        file_handler = RotatingLogHandler(path)
+    if file_handler is not None:
+        file_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+        handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler(stream or sys.stderr)
+        console_handler.setFormatter(TextFormatter())
+        handlers.append(console_handler)
+
+    records = queue.SimpleQueue()
+    queue_handler = CommandQueueHandler(records)
+    queue_handler.addFilter(RateLimitFilter())
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _handlers = handlers
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    return queue_handler
+
+
+def stop_logging():
+    """Дописывает записи из очереди и закрывает файлы"""
+    global _listener, _handlers
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, CommandQueueHandler):
+            root.removeHandler(handler)
+    for handler in _handlers:
+        handler.close()
+    _listener, _handlers = None, []
+
+
+atexit.register(stop_logging)
+os.register_at_fork(after_in_child=_after_fork_in_child)
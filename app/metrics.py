@@ -0,0 +1,258 @@
+import json
+import time
+import logging
+import threading
+import functools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("Metrics")
+
+# Границы корзин гистограмм длительностей, секунд
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIX = "voice_"
+
+# Пока метрики не включены, все функции модуля сразу возвращаются
+_enabled = False
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_help = {}
+_trace = None
+_server = None
+
+
+def enabled():
+    return _enabled
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def describe(name, text):
+    """Описание метрики для строки # HELP"""
+    _help[name] = text
+
+
+def inc(name, value=1, **labels):
+    """Увеличивает счетчик name{labels} на value"""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    """Добавляет значение в гистограмму name{labels}"""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[0][i] += 1
+                break
+        histogram[1] += seconds
+        histogram[2] += 1
+
+
+def record(stage, seconds, ok=True, **fields):
+    """Длительность этапа: гистограмма, счетчик ошибок и строка трассировки"""
+    if not _enabled:
+        return
+    observe("stage_seconds", seconds, stage=stage)
+    if not ok:
+        inc("stage_errors_total", stage=stage)
+    if _trace is not None:
+        line = json.dumps(dict(ts=round(time.time(), 6), stage=stage, seconds=round(seconds, 6), ok=ok, **fields),
+                          ensure_ascii=False, default=str)
+        with _lock:
+            if _trace is not None:
+                _trace.write(line + "\n")
+
+
+class _Span:
+    __slots__ = ("stage", "fields", "ok", "started")
+
+    def __init__(self, stage, fields):
+        self.stage = stage
+        self.fields = fields
+        self.ok = True
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.stage, time.perf_counter() - self.started, self.ok and exc_type is None, **self.fields)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+    ok = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage, **fields):
+    """Контекстный менеджер замера этапа; span.ok = False отмечает неудачу без исключения"""
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(stage, fields)
+
+
+def timed(stage):
+    """Декоратор: замеряет вызов как этап stage; ложный результат или исключение — ошибка этапа"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = bool(result)
+                return result
+            finally:
+                record(stage, time.perf_counter() - started, ok)
+        return wrapper
+    return decorator
+
+
+def _labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in items) + "}"
+
+
+def render():
+    """Текущие метрики в текстовом формате Prometheus"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: (list(value[0]), value[1], value[2]) for key, value in _histograms.items()}
+
+    lines = []
+    seen = set()
+    for (name, labels), value in sorted(counters.items()):
+        full = PREFIX + name
+        if full not in seen:
+            seen.add(full)
+            if name in _help:
+                lines.append(f"# HELP {full} {_help[name]}")
+            lines.append(f"# TYPE {full} counter")
+        lines.append(f"{full}{_labels(labels)} {value:g}")
+
+    for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+        full = PREFIX + name
+        if full not in seen:
+            seen.add(full)
+            if name in _help:
+                lines.append(f"# HELP {full} {_help[name]}")
+            lines.append(f"# TYPE {full} histogram")
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS, buckets):
+            cumulative += bucket
+            lines.append(f"{full}_bucket{_labels(labels, [('le', f'{bound:g}')])} {cumulative}")
+        lines.append(f"{full}_bucket{_labels(labels, [('le', '+Inf')])} {count}")
+        lines.append(f"{full}_sum{_labels(labels)} {total:.6f}")
+        lines.append(f"{full}_count{_labels(labels)} {count}")
+
+    # Коэффициент реального времени распознавания: время декодирования / длительность звука
+    audio = counters.get(("asr_audio_seconds_total", ()), 0)
+    if audio:
+        decode = counters.get(("asr_decode_seconds_total", ()), 0)
+        lines.append(f"# TYPE {PREFIX}asr_real_time_factor gauge")
+        lines.append(f"{PREFIX}asr_real_time_factor {decode / audio:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def configure(port=0, trace_path=None, host="127.0.0.1"):
+    """Включает сбор метрик; port > 0 — HTTP /metrics, trace_path — файл трассировки JSONL"""
+    global _enabled, _trace, _server
+    if not port and not trace_path:
+        return False
+
+    if trace_path:
+        _trace = open(trace_path, "a", encoding="utf-8", buffering=1)
+    if port:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        logger.info(f"Метрики доступны на http://{host}:{_server.server_address[1]}/metrics")
+    _enabled = True
+    return True
+
+
+def configure_from_settings():
+    """Включает метрики по METRICS_PORT и METRICS_TRACE_PATH"""
+    from config.settings import METRICS_PORT, METRICS_TRACE_PATH
+    return configure(METRICS_PORT, METRICS_TRACE_PATH)
+
+
+def shutdown():
+    """Выключает сбор, останавливает HTTP-сервер и закрывает файл трассировки"""
+    global _enabled, _trace, _server
+    _enabled = False
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+    with _lock:
+        if _trace is not None:
+            _trace.close()
+            _trace = None
+
+
+def reset():
+    """Очищает накопленные значения"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+describe("commands_total", "Распознанные фразы, переданные в разбор")
+describe("stage_seconds", "Длительность этапов: listen, parse, notion, calendar")
+describe("stage_errors_total", "Неудачи этапов: нераспознанные команды, ошибки получателей")
+describe("asr_audio_seconds_total", "Секунды звука, переданные распознавателю")
+describe("asr_decode_seconds_total", "Время декодирования Vosk")
+describe("server_sessions_total", "Сессии сервера распознавания")
+describe("server_rejected_total", "Сессии, отклоненные из-за лимита SERVER_MAX_SESSIONS")
+describe("wake_triggers_total", "Срабатывания слова-триггера")
+describe("wake_decode_seconds_total", "Время распознавателя слов-триггеров")
+describe("calendar_sync_total", "Синхронизации локальной копии календаря")
+describe("calendar_conflicts_total", "Команды, время которых пересекается с событиями календаря")
+describe("dedup_hits_total", "Повторные команды, не отправленные получателю")
+describe("early_intent_total", "Фразы, завершенные досрочно по частичному результату")
@@ -1,25 +1,137 @@
 import requests
-import json
+import time
+import random
+import threading
+import contextvars
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import logging
-from config.settings import DATABASE_ID, NOTION_API_KEY
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from app import metrics, dedup
+from config.settings import DATABASE_ID, NOTION_API_KEY, NOTION_API_URL, NOTION_RATE_LIMIT
 
 logger = logging.getLogger("NotionClient")
 
-def create_notion_task(task_name, due_date=None):
-    """Создает задачу в Notion через REST API (только по названию, без даты)"""
-    try:
-        url = "https://api.notion.com/v1/pages"
-        
-        headers = {
-            "Authorization": f"Bearer {NOTION_API_KEY}",
+NOTION_VERSION = "2022-06-28"
+
+# Таймауты (подключение, чтение), секунд
+TIMEOUT = (3.05, 10)
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+POOL_SIZE = 10
+# Методы, которые можно повторять после неясной ошибки; POST к /query — тоже (только чтение)
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "PUT", "DELETE", "OPTIONS"))
+
+
+def _not_sent(error):
+    """Сетевая ошибка случилась до отправки запроса (соединение не установлено)"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+class RateLimiter:
+    """Потокобезопасное ограничение частоты запросов (равномерные интервалы)"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Ждет, пока не освободится слот для следующего запроса"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds):
+        """Откладывает все следующие запросы (ответ 429 с Retry-After)"""
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+class NotionClient:
+    """Клиент Notion API с пулом соединений, таймаутами, повторами и ограничением частоты"""
+
+    def __init__(self, api_key=NOTION_API_KEY, database_id=DATABASE_ID, base_url=NOTION_API_URL,
+                 rate_limit=NOTION_RATE_LIMIT, timeout=TIMEOUT, max_retries=MAX_RETRIES, pool_size=POOL_SIZE):
+        self.database_id = database_id
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.limiter = RateLimiter(rate_limit)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
-            "Notion-Version": "2022-06-28"
-        }
-        
-        # Формируем данные для создания страницы (только название задачи)
-        data = {
-            "parent": {"database_id": DATABASE_ID},
+            "Notion-Version": NOTION_VERSION
+        })
+
+    def close(self):
+        self.session.close()
+
+    def warm_connection(self):
+        """Открывает соединение с API заранее (TLS-рукопожатие до первой записи).
+
+        Запрос идет мимо RateLimiter: иначе он занял бы очередь прямо перед
+        созданием задачи, ради которого и делается прогрев.
+        """
+        response = self.session.get(f"{self.base_url}/users/me", timeout=self.timeout)
+        return response.status_code < 500
+
+    def _backoff(self, attempt):
+        return BACKOFF_BASE * (2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def request(self, method, path, idempotent=None, **kwargs):
+        """Выполняет запрос с повторами при 429, 5xx и сетевых ошибках.
+
+        Неидемпотентный запрос (по умолчанию POST) мог дойти до сервера, даже если
+        ответ не получен, поэтому он повторяется только при 429 и при ошибке
+        подключения: 5xx и таймаут чтения возвращаются вызывающему.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries or not (idempotent or _not_sent(e)):
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"Сетевая ошибка Notion ({e}), повтор через {delay:.1f} с")
+                time.sleep(delay)
+                continue
+
+            if response.status_code != 429 and (response.status_code < 500 or not idempotent) \
+                    or attempt == self.max_retries:
+                return response
+
+            retry_after = response.headers.get("Retry-After")
+            try:
+                delay = float(retry_after) if retry_after else self._backoff(attempt)
+            except ValueError:
+                delay = self._backoff(attempt)
+            if response.status_code == 429:
+                self.limiter.pause(delay)
+            logger.warning(f"Notion ответил {response.status_code}, повтор через {delay:.1f} с")
+            time.sleep(delay)
+
+    def build_page(self, task_name):
+        """Формирует данные для создания страницы (только название задачи)"""
+        return {
+            "parent": {"database_id": self.database_id},
             "properties": {
                 "Name": {
                     "title": [
@@ -37,19 +149,168 @@ def create_notion_task(task_name, due_date=None):
                 }
             }
         }
-        
+
+    def create_page(self, task_name):
+        """Создает страницу; возвращает (успех, текст ошибки)"""
+        try:
+            response = self.request("POST", "pages", json=self.build_page(task_name))
+            if response.status_code == 200:
+                return True, None
+            return False, f"{response.status_code} - {response.text}"
+        except Exception as e:
+            return False, str(e)
+
+    def find_task(self, task_name, since):
+        """Ищет задачу с таким названием, созданную не раньше since; возвращает id страницы или None"""
+        # created_time в Notion округляется до минуты
+        since = since.replace(second=0, microsecond=0)
+        query = {
+            "filter": {
+                "and": [
+                    {"property": "Name", "title": {"equals": task_name}},
+                    {"timestamp": "created_time", "created_time": {"on_or_after": since.isoformat()}}
+                ]
+            },
+            "page_size": 1
+        }
+        response = self.request("POST", f"databases/{self.database_id}/query", idempotent=True, json=query)
+        response.raise_for_status()
+        results = response.json().get("results", [])
+        return results[0]["id"] if results else None
+
+    def recent_tasks(self, since):
+        """Названия и время создания задач базы, созданных не раньше since (все страницы ответа)"""
+        query = {
+            "filter": {"timestamp": "created_time", "created_time": {"on_or_after": since.isoformat()}},
+            "page_size": 100
+        }
+        tasks = []
+        while True:
+            response = self.request("POST", f"databases/{self.database_id}/query", idempotent=True, json=query)
+            response.raise_for_status()
+            data = response.json()
+            for page in data.get("results", []):
+                title = page.get("properties", {}).get("Name", {}).get("title", [])
+                if title:
+                    name = "".join(part.get("plain_text") or part.get("text", {}).get("content", "") for part in title)
+                    created = datetime.fromisoformat(page["created_time"].replace("Z", "+00:00"))
+                    tasks.append((name, created))
+            if not data.get("has_more"):
+                return tasks
+            query["start_cursor"] = data["next_cursor"]
+
+    def _create(self, task_name, dedupe_since=None):
+        """Создает страницу, если ее еще нет (при dedupe_since); возвращает (успех, текст ошибки)"""
+        if dedupe_since is not None:
+            try:
+                if self.find_task(task_name, dedupe_since):
+                    logger.info("Задача '%s' уже есть в Notion, повторно не создаю", task_name)
+                    return True, None
+            except Exception as e:
+                logger.error(f"❌ Ошибка API Notion при поиске задачи: {e}")
+                return False, str(e)
+        return self.create_page(task_name)
+
+    def create_task(self, task_name, due_date=None, dedupe_since=None):
+        """Создает задачу в Notion (только по названию, без даты).
+
+        Если указан dedupe_since (повтор после неясной ошибки), сначала проверяет,
+        не была ли задача уже создана предыдущей попыткой.
+        """
         # НЕ добавляем дату в Notion - только в календарь
-        logger.info(f"Создаю задачу в Notion: '{task_name}'")
-        
-        response = requests.post(url, headers=headers, json=data)
-        
-        if response.status_code == 200:
+        logger.info("Создаю задачу в Notion: '%s'", task_name)
+
+        success, error = self._create(task_name, dedupe_since)
+        if success:
             logger.info("✅ Задача успешно создана в Notion")
-            return True
         else:
-            logger.error(f"❌ Ошибка API Notion: {response.status_code} - {response.text}")
-            return False
-            
+            logger.error(f"❌ Ошибка API Notion: {error}")
+        return success
+
+    def create_tasks_bulk(self, task_names, max_workers=None, dedupe_since=None):
+        """Создает несколько задач параллельно в пределах ограничения частоты.
+
+        dedupe_since — необязательный список того же размера (см. create_task).
+        Возвращает список словарей {"success": bool, "error": str | None} в порядке task_names.
+        """
+        if not task_names:
+            return []
+        workers = min(max_workers or self.pool_size, len(task_names))
+        since = dedupe_since or [None] * len(task_names)
+        # У каждой задачи своя копия контекста: записи лога из потоков пула сохраняют command_id
+        contexts = [contextvars.copy_context() for _ in task_names]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notion") as pool:
+            outcomes = list(pool.map(lambda context, *args: context.run(self._create, *args),
+                                     contexts, task_names, since))
+
+        results = [{"success": success, "error": error} for success, error in outcomes]
+        created = sum(1 for result in results if result["success"])
+        logger.info("✅ Создано задач в Notion: %d из %d", created, len(task_names))
+        return results
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_notion_client():
+    """Общий клиент Notion на весь процесс"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = NotionClient()
+    return _client
+
+def create_notion_tasks(task_names, dedupe_since=None, due_dates=None):
+    """Создает несколько задач одновременно; список {"success", "error"} в порядке task_names.
+
+    Недавно созданные задачи (см. app.dedup) в Notion не отправляются и считаются успешными;
+    задачи, такие же как еще отправляемые, не отправляются и возвращаются с ошибкой для повтора.
+    """
+    due_dates = due_dates or [None] * len(task_names)
+    since = dedupe_since or [None] * len(task_names)
+    results = [{"success": True, "error": None} for _ in task_names]
+    pending = []
+    for index, (task_name, due_date) in enumerate(zip(task_names, due_dates)):
+        duplicate = dedup.claim("notion", task_name, due_date)
+        if duplicate is None:
+            pending.append(index)
+        elif duplicate["pending"]:
+            results[index] = {"success": False, "error": dedup.PENDING_ERROR}
+    if not pending:
+        return results
+
+    with metrics.span("notion", batch=len(pending)) as span:
+        try:
+            created = get_notion_client().create_tasks_bulk(
+                [task_names[index] for index in pending], dedupe_since=[since[index] for index in pending]
+            )
+        except Exception as e:
+            logger.error(f"❌ Ошибка при создании задач в Notion: {e}", exc_info=True)
+            created = [{"success": False, "error": str(e)} for _ in pending]
+        for index, result in zip(pending, created):
+            results[index] = result
+            dedup.settle("notion", task_names[index], due_dates[index], result["success"])
+        span.ok = all(result["success"] for result in created)
+    return results
+
+def create_notion_task(task_name, due_date=None, dedupe_since=None):
+    """Создает задачу в Notion через REST API (только по названию, без даты).
+
+    Повтор недавно созданной задачи (см. app.dedup) в Notion не отправляется; пока такая же
+    задача еще отправляется, возвращается False, чтобы outbox повторил команду позже.
+    """
+    duplicate = dedup.claim("notion", task_name, due_date)
+    if duplicate is not None:
+        return not duplicate["pending"]
+    success = _create_notion_task(task_name, due_date, dedupe_since)
+    dedup.settle("notion", task_name, due_date, success)
+    return success
+
+@metrics.timed("notion")
+def _create_notion_task(task_name, due_date, dedupe_since):
+    try:
+        return get_notion_client().create_task(task_name, due_date, dedupe_since)
     except Exception as e:
         logger.error(f"❌ Ошибка при создании задачи в Notion: {e}", exc_info=True)
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,259 @@
+import re
+
+# Окончания порядковых числительных во всех родах, падежах и числах
+_HARD_ENDINGS = ("ый", "ая", "ое", "ые", "ого", "ой", "ых", "ому", "ым", "ую", "ыми", "ом")
+_STRESSED_ENDINGS = ("ой", "ая", "ое", "ые", "ого", "ых", "ому", "ым", "ую", "ыми", "ом")
+_THIRD_FORMS = ("третий", "третья", "третье", "третьи", "третьего", "третьей", "третьих",
+                "третьему", "третьим", "третью", "третьими", "третьем")
+
+ORDINAL_STEMS = {
+    0: ("нулев", _STRESSED_ENDINGS),
+    1: ("перв", _HARD_ENDINGS),
+    2: ("втор", _STRESSED_ENDINGS),
+    4: ("четверт", _HARD_ENDINGS),
+    5: ("пят", _HARD_ENDINGS),
+    6: ("шест", _STRESSED_ENDINGS),
+    7: ("седьм", _STRESSED_ENDINGS),
+    8: ("восьм", _STRESSED_ENDINGS),
+    9: ("девят", _HARD_ENDINGS),
+    10: ("десят", _HARD_ENDINGS),
+    11: ("одиннадцат", _HARD_ENDINGS),
+    12: ("двенадцат", _HARD_ENDINGS),
+    13: ("тринадцат", _HARD_ENDINGS),
+    14: ("четырнадцат", _HARD_ENDINGS),
+    15: ("пятнадцат", _HARD_ENDINGS),
+    16: ("шестнадцат", _HARD_ENDINGS),
+    17: ("семнадцат", _HARD_ENDINGS),
+    18: ("восемнадцат", _HARD_ENDINGS),
+    19: ("девятнадцат", _HARD_ENDINGS),
+    20: ("двадцат", _HARD_ENDINGS),
+    30: ("тридцат", _HARD_ENDINGS),
+    40: ("сороков", _STRESSED_ENDINGS),
+    50: ("пятидесят", _HARD_ENDINGS),
+    60: ("шестидесят", _HARD_ENDINGS),
+    70: ("семидесят", _HARD_ENDINGS),
+    80: ("восьмидесят", _HARD_ENDINGS),
+    90: ("девяност", _HARD_ENDINGS),
+    2000: ("двухтысячн", _HARD_ENDINGS),
+}
+
+CARDINAL_FORMS = {
+    0: ("ноль", "нуль", "нуля", "нолю", "нулю", "нулем", "нулём", "нолем", "нолём", "нуле", "ноле"),
+    1: ("один", "одна", "одно", "одни", "одного", "одной", "одних", "одному", "одним", "одну", "одними", "одном"),
+    2: ("два", "две", "двух", "двум", "двумя"),
+    3: ("три", "трех", "трёх", "трем", "трём", "тремя"),
+    4: ("четыре", "четырех", "четырёх", "четырем", "четырём", "четырьмя"),
+    40: ("сорок", "сорока"),
+    50: ("пятьдесят", "пятидесяти", "пятьюдесятью"),
+    60: ("шестьдесят", "шестидесяти", "шестьюдесятью"),
+    70: ("семьдесят", "семидесяти", "семьюдесятью"),
+    80: ("восемьдесят", "восьмидесяти", "восемьюдесятью"),
+    90: ("девяносто", "девяноста"),
+}
+# Числительные на -ь склоняются одинаково: пять, пяти, пятью
+_SOFT_CARDINALS = {
+    5: "пят", 6: "шест", 7: "сем", 8: "восем", 9: "девят", 10: "десят",
+    11: "одиннадцат", 12: "двенадцат", 13: "тринадцат", 14: "четырнадцат", 15: "пятнадцат",
+    16: "шестнадцат", 17: "семнадцат", 18: "восемнадцат", 19: "девятнадцат",
+    20: "двадцат", 30: "тридцат",
+}
+for _value, _stem in _SOFT_CARDINALS.items():
+    CARDINAL_FORMS[_value] = (_stem + "ь", _stem + "и", _stem + "ью")
+CARDINAL_FORMS[8] += ("восьми", "восьмью")
+
+HOUR_WORDS = frozenset(("час", "часа", "часов"))
+# «В час дня» — час без числительного значит 1
+ONE_HOUR = "час"
+MINUTE_WORDS = frozenset(("минута", "минуту", "минуты", "минут"))
+HALF_WORDS = frozenset(("половине", "половина", "пол"))
+NAMED_TIMES = {"полдень": "12:00", "полночь": "0:00"}
+
+_TOKEN_RE = re.compile(r"\w+|\W+")
+_END = None
+
+
+class Number:
+    """Распознанное числительное: значение, текст для подстановки и вид"""
+
+    __slots__ = ("value", "text", "ordinal")
+
+    def __init__(self, value, text, ordinal):
+        self.value = value
+        self.text = text
+        self.ordinal = ordinal
+
+
+def _ordinal_forms(value):
+    stem, endings = ORDINAL_STEMS[value]
+    return tuple(stem + ending for ending in endings)
+
+
+def _numeral_phrases():
+    """Все фразы числительных: (слова, значение, порядковое ли)"""
+    cardinals = CARDINAL_FORMS
+    ordinals = {value: _ordinal_forms(value) for value in ORDINAL_STEMS}
+    ordinals[3] = _THIRD_FORMS
+    ordinals[4] += tuple(form.replace("четверт", "четвёрт") for form in ordinals[4])
+
+    phrases = []
+    for value, forms in cardinals.items():
+        phrases += [((form,), value, False) for form in forms]
+    for value, forms in ordinals.items():
+        phrases += [((form,), value, True) for form in forms]
+
+    # Составные: «двадцать первое», «тридцати двух»; порядковым склоняется только последнее слово
+    for tens in (20, 30, 40, 50, 60, 70, 80, 90):
+        for unit in range(1, 10):
+            for tens_form in cardinals[tens]:
+                phrases += [((tens_form, form), tens + unit, False) for form in cardinals[unit]]
+            phrases += [((cardinals[tens][0], form), tens + unit, True) for form in ordinals[unit]]
+
+    # Годы: «две тысячи двадцать шестого»
+    small = [(words, value, ordinal) for words, value, ordinal in phrases if 0 < value < 100]
+    phrases += [(("две", "тысячи"), 2000, False)]
+    phrases += [(("две", "тысячи") + words, 2000 + value, ordinal) for words, value, ordinal in small]
+    return phrases
+
+
+def _build_trie():
+    trie = {}
+    for words, value, ordinal in _numeral_phrases():
+        node = trie
+        for word in words:
+            node = node.setdefault(word, {})
+        node[_END] = Number(value, str(value), ordinal)
+
+    # Минуты вида «ноль пять» -> 05 и «ноль ноль» -> 00
+    for zero in ("ноль", "нуль"):
+        for unit in range(1, 10):
+            for form in CARDINAL_FORMS[unit]:
+                trie[zero].setdefault(form, {})[_END] = Number(unit, f"0{unit}", False)
+        for second in ("ноль", "нуль"):
+            trie[zero].setdefault(second, {})[_END] = Number(0, "00", False)
+    return trie
+
+
+# Автомат строится один раз: скорость разбора не зависит от размера словаря
+NUMERAL_TRIE = _build_trie()
+
+
+def numeral_words():
+    """Все слова, из которых складываются числительные и время (для грамматики распознавания)"""
+    words = {word for phrase, _, _ in _numeral_phrases() for word in phrase}
+    return frozenset(words) | HOUR_WORDS | MINUTE_WORDS | HALF_WORDS | frozenset(NAMED_TIMES)
+
+
+def _scan(tokens):
+    """Заменяет самые длинные совпадения числительных объектами Number за один проход"""
+    out = []
+    i = 0
+    count = len(tokens)
+    while i < count:
+        node = NUMERAL_TRIE.get(tokens[i])
+        if node is None:
+            out.append(tokens[i])
+            i += 1
+            continue
+
+        best = None
+        j = i
+        while True:
+            if _END in node:
+                best = (j, node[_END])
+            if j + 2 >= count or not tokens[j + 1].isspace():
+                break
+            node = node.get(tokens[j + 2])
+            if node is None:
+                break
+            j += 2
+
+        if best is None:
+            out.append(tokens[i])
+            i += 1
+        else:
+            out.append(best[1])
+            i = best[0] + 1
+    return out
+
+
+def _is_space(item):
+    return isinstance(item, str) and item.isspace()
+
+
+def _is_word(item, words):
+    return isinstance(item, str) and item in words
+
+
+def _is_cardinal(item, low, high):
+    return isinstance(item, Number) and not item.ordinal and low <= item.value <= high
+
+
+def _clock(items, i, after_preposition):
+    """Распознает время, начинающееся с items[i]; возвращает (текст, индекс после) или None.
+
+    Голые числа («десять тридцать») считаются временем только после «в».
+    """
+    count = len(items)
+    item = items[i]
+    if _is_word(item, NAMED_TIMES):
+        return NAMED_TIMES[item], i + 1
+
+    # «половине третьего» -> 2:30
+    if _is_word(item, HALF_WORDS) and i + 2 < count and _is_space(items[i + 1]):
+        hour = items[i + 2]
+        if isinstance(hour, Number) and hour.ordinal and 1 <= hour.value <= 12:
+            return f"{hour.value - 1 or 12}:30", i + 3
+        return None
+
+    # «без четверти три» -> 2:45
+    if item == "без" and i + 4 < count and items[i + 2] == "четверти" and _is_cardinal(items[i + 4], 1, 12):
+        return f"{items[i + 4].value - 1 or 12}:45", i + 5
+
+    # «десять тридцать», «семь часов пятнадцать минут», «час дня» (1 дня)
+    if not after_preposition:
+        return None
+    if item == ONE_HOUR:
+        hour, end = 1, i + 1
+    elif _is_cardinal(item, 0, 23):
+        hour, end = item.value, i + 1
+        if end + 1 < count and _is_space(items[end]) and _is_word(items[end + 1], HOUR_WORDS):
+            end += 2
+    else:
+        return None
+    if end + 1 < count and _is_space(items[end]) and _is_cardinal(items[end + 1], 0, 59):
+        minute = items[end + 1]
+        if minute.value >= 10 or minute.text.startswith("0"):
+            end += 2
+            if end + 1 < count and _is_space(items[end]) and _is_word(items[end + 1], MINUTE_WORDS):
+                end += 2
+            return f"{hour}:{minute.value:02d}", end
+    if end > i + 1 or item == ONE_HOUR:
+        return str(hour), end
+    return None
+
+
+def normalize_numerals(text):
+    """Заменяет русские числительные цифрами, а время — видом ЧЧ:ММ.
+
+    «двадцать первого мая в десять тридцать» -> «21 мая в 10:30»,
+    «в половине третьего» -> «в 2:30». Текст ожидается в нижнем регистре.
+    """
+    items = _scan(_TOKEN_RE.findall(text))
+
+    out = []
+    i = 0
+    count = len(items)
+    while i < count:
+        item = items[i]
+        after_preposition = item == "в" and i + 2 < count and _is_space(items[i + 1])
+        clock = _clock(items, i + 2, True) if after_preposition else _clock(items, i, False)
+        if clock is not None:
+            out.append("в " + clock[0] if after_preposition else clock[0])
+            i = clock[1]
+        elif isinstance(item, Number):
+            out.append(item.text)
+            i += 1
+        else:
+            out.append(item)
+            i += 1
+    return "".join(out)
@@ -0,0 +1,398 @@
+import sys
+import json
+import time
+import uuid
+import random
+import sqlite3
+import argparse
+import logging
+import threading
+from datetime import datetime
+from app.logs import command_context
+from config.settings import OUTBOX_PATH, OUTBOX_MAX_ATTEMPTS, OUTBOX_BACKOFF_MAX, OUTBOX_LEASE
+
+logger = logging.getLogger("Outbox")
+
+# Первая пауза перед повтором, секунд; дальше удваивается до OUTBOX_BACKOFF_MAX
+BACKOFF_BASE = 2.0
+# Как часто проверять очередь, если не было новых команд, секунд
+POLL_SECONDS = 5.0
+# Сколько доставок может выполняться одновременно
+MAX_INFLIGHT = 8
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    sink TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (key, sink)
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+def _encode_date(value):
+    if isinstance(value, tuple):
+        return [_encode_date(item) for item in value]
+    return value.isoformat() if value is not None else None
+
+
+def _decode_date(value):
+    if isinstance(value, list):
+        return tuple(_decode_date(item) for item in value)
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+def encode_command(command):
+    """Команда {"task", "due", "start"} в JSON; due может быть парой дат (период)"""
+    return json.dumps({
+        "task": command["task"],
+        "due": _encode_date(command.get("due")),
+        "start": _encode_date(command.get("start")),
+    }, ensure_ascii=False)
+
+
+def decode_command(payload):
+    data = json.loads(payload)
+    return {"task": data["task"], "due": _decode_date(data["due"]), "start": _decode_date(data["start"])}
+
+
+class Outbox:
+    """Очередь доставок в SQLite (WAL): по строке на пару (команда, получатель).
+
+    Команда сначала надежно записывается на диск, а затем доставляется в фоне
+    OutboxWorker; после сбоя незавершенные доставки восстанавливает recover().
+    """
+
+    def __init__(self, path=OUTBOX_PATH):
+        self.path = path
+        self.wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # В режиме WAL FULL синхронизирует журнал при каждой фиксации: команда переживет и сбой питания
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, command, sinks):
+        """Сохраняет команду для каждого получателя из sinks; возвращает ключ идемпотентности"""
+        return self.enqueue_many([(command, sinks)])[0]
+
+    def enqueue_many(self, items, keys=None):
+        """Сохраняет несколько команд [(команда, получатели)] одной транзакцией; возвращает ключи.
+
+        Фраза с несколькими командами записывается целиком или не записывается
+        вовсе, а OutboxWorker забирает ее одним claim и отправляет пакетом.
+        keys — необязательные ключи команд (по умолчанию случайные); они же
+        command_id в логе доставки.
+        """
+        now = time.time()
+        keys = keys or [uuid.uuid4().hex for _ in items]
+        rows = [
+            (key, sink, encode_command(command), now, now, now)
+            for key, (command, sinks) in zip(keys, items) for sink in sinks
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO outbox (key, sink, payload, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        self.wakeup.set()
+        return keys
+
+    def recover(self, older_than=None):
+        """Возвращает в очередь доставки, прерванные падением процесса.
+
+        Такая доставка могла дойти до получателя, поэтому она помечается ошибкой
+        и при следующей попытке получатель проверит, нет ли уже созданной записи.
+        older_than — только доставки, взятые в работу больше older_than секунд
+        назад: более свежие может прямо сейчас отправлять работающий бот.
+        """
+        now = time.time()
+        cutoff = now - older_than if older_than is not None else now
+        with self._lock, self._conn:
+            count = self._conn.execute(
+                "UPDATE outbox SET status = ?, last_error = COALESCE(last_error, ?), updated_at = ? "
+                "WHERE status = ? AND updated_at <= ?",
+                (PENDING, "прервано завершением процесса", now, IN_PROGRESS, cutoff)
+            ).rowcount
+        if count:
+            logger.info(f"Восстановлено незавершенных доставок: {count}")
+        return count
+
+    def claim(self, limit):
+        """Забирает до limit доставок, срок которых подошел, и группирует их по командам.
+
+        Возвращает список (ключ, команда, [(id, получатель, попыток)]); в command["retry"] —
+        получатели, которым команда уже отправлялась (в том числе до replay).
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id, key, sink, payload, attempts, last_error, created_at FROM outbox "
+                "WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?",
+                (PENDING, now, limit)
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE outbox SET status = ?, updated_at = ? WHERE id = ?",
+                [(IN_PROGRESS, now, row["id"]) for row in rows]
+            )
+
+        groups = {}
+        for row in rows:
+            if row["key"] not in groups:
+                command = decode_command(row["payload"])
+                command["key"] = row["key"]
+                command["created_at"] = datetime.fromtimestamp(row["created_at"]).astimezone()
+                command["retry"] = set()
+                groups[row["key"]] = (row["key"], command, [])
+            groups[row["key"]][2].append((row["id"], row["sink"], row["attempts"]))
+            if row["attempts"] or row["last_error"]:
+                groups[row["key"]][1]["retry"].add(row["sink"])
+        return list(groups.values())
+
+    def complete(self, row_id, success, error=None, retry_at=None):
+        """Отмечает результат доставки: успех, повтор в retry_at или окончательную ошибку"""
+        if success:
+            status = DONE
+        elif retry_at is not None:
+            status = PENDING
+        else:
+            status = FAILED
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, last_error = ?, "
+                "next_attempt_at = COALESCE(?, next_attempt_at), updated_at = ? WHERE id = ?",
+                (status, error, retry_at, time.time(), row_id)
+            )
+
+    def next_due(self):
+        """Время ближайшей доставки в очереди или None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?", (PENDING,)
+            ).fetchone()
+        return row[0]
+
+    def counts(self):
+        """Число доставок в каждом статусе"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def items(self, statuses=(PENDING, IN_PROGRESS, FAILED)):
+        """Доставки в указанных статусах (по умолчанию все незавершенные)"""
+        marks = ", ".join("?" for _ in statuses)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM outbox WHERE status IN ({marks}) ORDER BY created_at, id", tuple(statuses)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def replay(self, key=None):
+        """Ставит в очередь немедленно все неудачные и ожидающие доставки (или доставки одного ключа)"""
+        query = "UPDATE outbox SET status = ?, attempts = 0, next_attempt_at = ?, updated_at = ? WHERE status IN (?, ?)"
+        now = time.time()
+        params = [PENDING, now, now, PENDING, FAILED]
+        if key:
+            query += " AND key LIKE ?"
+            params.append(key + "%")
+        with self._lock, self._conn:
+            count = self._conn.execute(query, params).rowcount
+        self.wakeup.set()
+        return count
+
+
+class OutboxWorker:
+    """Фоновая доставка команд из Outbox через Dispatcher с экспоненциальной паузой между повторами.
+
+    on_result(command, results, retrying) вызывается после каждой попытки; retrying —
+    получатели, которым доставка будет повторена позже.
+    """
+
+    def __init__(self, outbox, dispatcher, on_result=None, max_attempts=OUTBOX_MAX_ATTEMPTS,
+                 backoff_base=BACKOFF_BASE, backoff_max=OUTBOX_BACKOFF_MAX, max_inflight=MAX_INFLIGHT):
+        self.outbox = outbox
+        self.dispatcher = dispatcher
+        self.on_result = on_result
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_inflight = max_inflight
+        self._inflight = 0
+        self._idle = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.outbox.recover()
+        self._thread = threading.Thread(target=self._loop, name="outbox", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Останавливает цикл и ждет доставок, уже отправленных получателям"""
+        self._stopped.set()
+        self.outbox.wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.wait_idle(timeout)
+
+    def wait_idle(self, timeout=None):
+        with self._idle:
+            return self._idle.wait_for(lambda: self._inflight == 0, timeout)
+
+    def backoff(self, attempts):
+        """Пауза перед повтором после attempts неудачных попыток (со случайным разбросом)"""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    def run_once(self):
+        """Отправляет получателям доставки, срок которых подошел; возвращает число команд"""
+        with self._idle:
+            free = self.max_inflight - self._inflight
+        if free <= 0:
+            return 0
+
+        groups = self.outbox.claim(free)
+        with self._idle:
+            self._inflight += sum(len(rows) for _, _, rows in groups)
+        if len(groups) > 1:
+            # Несколько команд сразу: Notion — параллельно, календарь — одним пакетным запросом
+            self.dispatcher.dispatch_batch(
+                [command for _, command, _ in groups],
+                callback=lambda results, groups=groups: self._finish_batch(groups, results),
+                only=[{sink for _, sink, _ in rows} for _, _, rows in groups]
+            )
+        elif groups:
+            key, command, rows = groups[0]
+            self.dispatcher.dispatch(
+                command,
+                callback=lambda results: self._finish(command, rows, results),
+                only={sink for _, sink, _ in rows}
+            )
+        return len(groups)
+
+    def drain(self, timeout=None):
+        """Доставляет всё, что можно доставить сейчас; повторы с паузой остаются в очереди"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.run_once()
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            self.wait_idle(remaining)
+            next_due = self.outbox.next_due()
+            if next_due is None or next_due > time.time() or remaining == 0.0:
+                return
+
+    def _finish(self, command, rows, results):
+        retrying = set()
+        # Записи лога о доставке помечаются ключом команды
+        with command_context(command["key"]):
+            try:
+                for row_id, sink, attempts in rows:
+                    result = results.get(sink, {"success": False, "error": "получатель не зарегистрирован"})
+                    if result["success"]:
+                        self.outbox.complete(row_id, True)
+                    elif attempts + 1 < self.max_attempts and sink in self.dispatcher.applicable(command):
+                        self.outbox.complete(row_id, False, result["error"], time.time() + self.backoff(attempts + 1))
+                        retrying.add(sink)
+                    else:
+                        self.outbox.complete(row_id, False, result["error"])
+                        logger.error(f"Доставка {command['key'][:8]}/{sink} не удалась окончательно: {result['error']}")
+                if self.on_result is not None:
+                    self.on_result(command, results, retrying)
+            except Exception as e:
+                logger.error(f"Ошибка при обработке результата доставки: {e}", exc_info=True)
+            finally:
+                with self._idle:
+                    self._inflight -= len(rows)
+                    self._idle.notify_all()
+                self.outbox.wakeup.set()
+
+    def _finish_batch(self, groups, results):
+        for (key, command, rows), result in zip(groups, results):
+            self._finish(command, rows, result)
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            self.outbox.wakeup.clear()
+            try:
+                self.run_once()
+                next_due = self.outbox.next_due()
+            except Exception as e:
+                logger.error(f"Ошибка очереди outbox: {e}", exc_info=True)
+                next_due = None
+
+            wait = POLL_SECONDS if next_due is None else min(POLL_SECONDS, max(0.0, next_due - time.time()))
+            self.outbox.wakeup.wait(wait)
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def main(argv=None):
+    """CLI: python run.py outbox list [--all] | replay [ключ]"""
+    parser = argparse.ArgumentParser(prog="run.py outbox", description="Просмотр и повтор очереди отправки")
+    parser.add_argument("--db", default=OUTBOX_PATH, help="файл очереди SQLite")
+    commands = parser.add_subparsers(dest="action", required=True)
+    list_parser = commands.add_parser("list", help="показать неотправленные команды")
+    list_parser.add_argument("--all", action="store_true", help="включая доставленные")
+    replay_parser = commands.add_parser("replay", help="отправить ожидающие и неудачные команды сейчас")
+    replay_parser.add_argument("key", nargs="?", help="начало ключа команды (по умолчанию — все)")
+    args = parser.parse_args(argv)
+
+    outbox = Outbox(args.db)
+    try:
+        if args.action == "list":
+            statuses = (PENDING, IN_PROGRESS, FAILED, DONE) if args.all else (PENDING, IN_PROGRESS, FAILED)
+            items = outbox.items(statuses)
+            for item in items:
+                task = json.loads(item["payload"])["task"]
+                print(f"{item['key'][:8]} {item['sink']:<9} {item['status']:<11} попыток: {item['attempts']:<2} "
+                      f"след.: {_format_time(item['next_attempt_at'])} '{task}'"
+                      + (f" — {item['last_error']}" if item["last_error"] else ""))
+            print(f"Всего: {len(items)}; по статусам: {outbox.counts()}")
+            return 0
+
+        from config.settings import check_settings
+        from app.dispatch import create_dispatcher
+        check_settings()
+        # Свежие доставки в работе принадлежат запущенному боту: их повтор создал бы дубли
+        outbox.recover(older_than=OUTBOX_LEASE)
+        count = outbox.replay(args.key)
+        print(f"Поставлено в очередь: {count}")
+        busy = outbox.counts().get(IN_PROGRESS)
+        if busy:
+            print(f"Сейчас отправляются другим процессом (не тронуты): {busy}")
+        dispatcher = create_dispatcher()
+        worker = OutboxWorker(outbox, dispatcher)
+        worker.drain()
+        dispatcher.shutdown()
+        counts = outbox.counts()
+        print(f"По статусам: {counts}")
+        return 0 if not counts.get(PENDING) and not counts.get(FAILED) else 2
+    finally:
+        outbox.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
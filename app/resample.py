@@ -0,0 +1,260 @@
+import math
+import numpy as np
+
+# Нулей sinc по каждую сторону от центра фильтра: длина фильтра и подавление наложения спектра
+ZERO_CROSSINGS = 16
+# Полоса пропускания как доля частоты Найквиста выходного сигнала
+ROLLOFF = 0.9
+KAISER_BETA = 8.0
+# Самая большая задержка между микрофонами массива, секунд (~10 см между капсюлями)
+MAX_CHANNEL_DELAY = 0.0003
+# Как часто пересчитывать задержки каналов, блоков
+DELAY_UPDATE_BLOCKS = 8
+# Сглаживание оценок энергии каналов между блоками
+LEVEL_SMOOTHING = 0.9
+
+
+def design_filter(up, down, zero_crossings=ZERO_CROSSINGS, rolloff=ROLLOFF, beta=KAISER_BETA):
+    """ФНЧ для передискретизации up/down: sinc с окном Кайзера на частоте up * вход.
+
+    Возвращает коэффициенты по фазам — матрицу (up, taps): строка p — отсчеты
+    фильтра p, p + up, p + 2 * up, ...; усиление up компенсирует вставку нулей.
+    """
+    factor = max(up, down)
+    length = 2 * zero_crossings * factor + 1
+    cutoff = 0.5 * rolloff / factor
+    n = np.arange(length) - (length - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta) * up
+    taps = math.ceil(length / up)
+    padded = np.zeros(up * taps)
+    padded[:length] = h
+    return padded.reshape(taps, up).T.astype(np.float32)
+
+
+class Resampler:
+    """Потоковая полифазная передискретизация моно float32 с in_rate на out_rate.
+
+    Частоты сокращаются до up/down (48000 → 16000 — 1/3, 44100 → 16000 —
+    160/441). Вход обрабатывается группами по down отсчетов, каждая дает up
+    выходных; индексы отсчетов для всех групп блока рассчитаны заранее, поэтому
+    блок — это один np.take и один np.einsum без циклов Python. Хвост входа
+    (история фильтра и неполная группа) переносится в начало буфера. Все
+    рабочие массивы выделяются один раз на max_frames входных отсчетов.
+    """
+
+    def __init__(self, in_rate, out_rate, max_frames=4096):
+        divisor = math.gcd(in_rate, out_rate)
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.up = out_rate // divisor
+        self.down = in_rate // divisor
+        # Выход u группы берет фазу фильтра (u * down) % up и отсчет со смещением (u * down) // up
+        positions = np.arange(self.up) * self.down
+        self.phases = design_filter(self.up, self.down)[positions % self.up]
+        self.taps = self.phases.shape[1]
+        self.history = self.taps - 1
+        self._offsets = positions // self.up
+        self._pending = 0
+        self._allocate(max_frames)
+
+    def _allocate(self, max_frames):
+        self.max_frames = max_frames
+        groups = (max_frames + self.down) // self.down
+        self._input = np.zeros(self.history + self.down + max_frames, dtype=np.float32)
+        # Индекс входа для выхода u группы j и отвода k: history + j * down + offset[u] - k
+        self._index = (self.history + np.arange(groups)[:, None, None] * self.down
+                       + self._offsets[None, :, None] - np.arange(self.taps)[None, None, :])
+        self._gathered = np.empty(self._index.shape, dtype=np.float32)
+        self._output = np.empty((groups, self.up), dtype=np.float32)
+
+    def max_output(self, frames):
+        """Наибольшее число выходных отсчетов для блока из frames входных"""
+        return (frames + self.down) // self.down * self.up
+
+    def staging(self, frames):
+        """Место в буфере для следующих frames входных отсчетов (заполняет вызывающий)"""
+        if frames > self.max_frames:
+            keep = self._input[:self.history + self._pending].copy()
+            self._allocate(frames)
+            self._input[:len(keep)] = keep
+        start = self.history + self._pending
+        return self._input[start:start + frames]
+
+    def commit(self, frames):
+        """Передискретизирует записанные в staging() отсчеты; возвращает view выходного буфера"""
+        available = self._pending + frames
+        groups = available // self.down
+        if groups:
+            gathered = self._gathered[:groups]
+            # mode="clip": индексы всегда в пределах буфера, а с "raise" NumPy копирует out
+            np.take(self._input, self._index[:groups], out=gathered, mode="clip")
+            np.einsum("juk,uk->ju", gathered, self.phases, out=self._output[:groups])
+        consumed = groups * self.down
+        self._pending = available - consumed
+        # История фильтра и неполная группа переезжают в начало буфера
+        tail = self.history + self._pending
+        self._input[:tail] = self._input[consumed:consumed + tail]
+        return self._output[:groups].reshape(-1)
+
+    def process(self, samples):
+        """Передискретизирует массив отсчетов (копия результата — для тестов и бенчмарков)"""
+        self.staging(len(samples))[:] = samples
+        return self.commit(len(samples)).copy()
+
+    def reset(self):
+        self._input[:] = 0
+        self._pending = 0
+
+
+class ChannelMixer:
+    """Сведение многоканального звука в моно с выбором каналов («beamforming-lite»).
+
+    mode="beam": раз в DELAY_UPDATE_BLOCKS блоков для каждого канала ищется
+    сдвиг относительно канала с лучшим отношением сигнал/шум (максимум
+    взаимной корреляции в пределах MAX_CHANNEL_DELAY), затем каналы
+    выравниваются и складываются с весами по отношению сигнал/шум: речь
+    складывается синфазно, а некоррелированный шум усредняется. Выход
+    задержан на max_lag отсчетов, чтобы сдвиг мог быть в обе стороны, и
+    привязан по времени к каналу 0.
+    mode="mix" — простое среднее каналов, число — только этот канал.
+    """
+
+    def __init__(self, channels, rate, mode="beam", max_frames=4096):
+        self.channels = channels
+        self.mode = mode
+        self.max_lag = max(1, int(rate * MAX_CHANNEL_DELAY))
+        self.lags = np.zeros(channels, dtype=np.int64)
+        self.weights = np.full(channels, 1.0 / channels, dtype=np.float32)
+        self.reference = 0
+        self._levels = None
+        self._noise = None
+        self._blocks = 0
+        self._allocate(max_frames)
+
+    def _allocate(self, max_frames):
+        self.max_frames = max_frames
+        history = getattr(self, "_extended", None)
+        # Впереди блока — 2 * max_lag отсчетов предыдущего: выравнивание без разрывов на границе
+        self._extended = np.zeros((2 * self.max_lag + max_frames, self.channels), dtype=np.float32)
+        self._weighted = np.empty(max_frames, dtype=np.float32)
+        # Накопленная энергия канала для нормировки корреляции; _energy[0] = 0
+        self._energy = np.zeros(2 * self.max_lag + max_frames + 1)
+        if history is not None:
+            self._extended[:2 * self.max_lag] = history[:2 * self.max_lag]
+
+    def process(self, frames, out):
+        """Сводит блок frames (отсчеты × каналы, float32) в out (моно, той же длины)"""
+        if isinstance(self.mode, int):
+            np.copyto(out, frames[:, self.mode])
+            return out
+        if self.mode == "mix" or self.channels == 1:
+            # np.mean с out все равно выделяет промежуточный массив
+            np.sum(frames, axis=1, out=out)
+            out *= 1.0 / self.channels
+            return out
+
+        count, lag = len(frames), self.max_lag
+        if count > self.max_frames:
+            self._allocate(count)
+        extended = self._extended[:2 * lag + count]
+        extended[2 * lag:] = frames
+
+        self._update_levels(frames)
+        if self._blocks % DELAY_UPDATE_BLOCKS == 0:
+            self._update_lags(extended, count)
+        self._blocks += 1
+
+        out[:] = 0
+        weighted = self._weighted[:count]
+        for channel in range(self.channels):
+            start = lag + self.lags[channel]
+            np.multiply(extended[start:start + count, channel], self.weights[channel], out=weighted)
+            out += weighted
+        # Конец блока становится историей следующего
+        extended[:2 * lag] = extended[count:count + 2 * lag]
+        return out
+
+    def _update_levels(self, frames):
+        energy = np.einsum("ij,ij->j", frames, frames) / max(len(frames), 1)
+        if self._levels is None:
+            self._levels = energy.copy()
+            self._noise = energy.copy()
+        else:
+            self._levels = LEVEL_SMOOTHING * self._levels + (1 - LEVEL_SMOOTHING) * energy
+            # Шум — нижняя огибающая энергии: быстро вниз, медленно вверх
+            self._noise = np.where(energy < self._noise, energy, self._noise + 0.01 * (energy - self._noise))
+        snr = self._levels / np.maximum(self._noise, 1.0)
+        self.reference = int(np.argmax(snr))
+        self.weights = (snr / snr.sum()).astype(np.float32)
+
+    def _update_lags(self, extended, count):
+        """Сдвиг каждого канала относительно опорного по максимуму корреляции"""
+        lag = self.max_lag
+        reference = extended[lag:lag + count, self.reference]
+        for channel in range(self.channels):
+            if channel == self.reference:
+                self.lags[channel] = 0
+                continue
+            # Окна канала со сдвигом от -lag до +lag против опорного; корреляция нормируется
+            # на энергию окна, иначе максимум смещается к громкой части слога
+            signal = extended[:, channel]
+            windows = np.lib.stride_tricks.sliding_window_view(signal, count)
+            cumulative = self._energy[1:len(signal) + 1]
+            np.square(signal, out=cumulative, dtype=np.float64)
+            np.cumsum(cumulative, out=cumulative)
+            energy = self._energy[count:len(signal) + 1] - self._energy[:len(signal) + 1 - count]
+            scores = (windows @ reference) / np.sqrt(np.maximum(energy, 1.0))
+            self.lags[channel] = int(np.argmax(scores)) - lag
+        # Выход привязан к каналу 0: смена опорного канала не сдвигает его во времени
+        self.lags -= self.lags[0]
+        np.clip(self.lags, -lag, lag, out=self.lags)
+
+
+class AudioConverter:
+    """Звук устройства (int16, native rate, channels каналов) → 16-битное моно out_rate.
+
+    Все промежуточные массивы выделены заранее; process() возвращает
+    memoryview на внутренний буфер, действительный до следующего вызова.
+    """
+
+    def __init__(self, in_rate, channels, out_rate=16000, mode="beam", max_frames=4096):
+        self.in_rate = in_rate
+        self.channels = channels
+        self.out_rate = out_rate
+        self.mixer = ChannelMixer(channels, in_rate, mode, max_frames) if channels > 1 else None
+        self.resampler = Resampler(in_rate, out_rate, max_frames) if in_rate != out_rate else None
+        self._allocate(max_frames)
+
+    def _allocate(self, max_frames):
+        self.max_frames = max_frames
+        self._frames = np.empty((max_frames, self.channels), dtype=np.float32)
+        self._mono = np.empty(max_frames, dtype=np.float32)
+        size = self.resampler.max_output(max_frames) if self.resampler is not None else max_frames
+        self._pcm = np.empty(size, dtype=np.int16)
+        self._bytes = memoryview(self._pcm).cast("B")
+
+    def process(self, data):
+        """Блок PCM int16 устройства → memoryview на блок 16-битного моно out_rate"""
+        samples = np.frombuffer(data, dtype=np.int16)
+        count = len(samples) // self.channels
+        if count > self.max_frames:
+            self._allocate(count)
+        frames = self._frames[:count]
+        np.copyto(frames, samples[:count * self.channels].reshape(count, self.channels), casting="unsafe")
+
+        if self.resampler is not None:
+            # Моно пишется сразу в буфер передискретизации
+            mono = self.resampler.staging(count)
+        else:
+            mono = self._mono[:count]
+        if self.mixer is not None:
+            self.mixer.process(frames, mono)
+        else:
+            np.copyto(mono, frames[:, 0])
+
+        result = self.resampler.commit(count) if self.resampler is not None else mono
+        size = len(result)
+        np.rint(result, out=result)
+        np.clip(result, -32768, 32767, out=result)
+        np.copyto(self._pcm[:size], result, casting="unsafe")
+        return self._bytes[:2 * size]
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from app import metrics
+from app.logs import NOISY
+
+logger = logging.getLogger("RecognitionServer")
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+# Блок, который декодируется за один вызов: 0,25 с звука
+CHUNK_BYTES = SAMPLE_RATE * SAMPLE_WIDTH // 4
+# Сколько блоков может ждать в очереди на каждый поток декодирования
+QUEUE_PER_WORKER = 2
+
+
+class Session:
+    """Поток одного клиента: свой KaldiRecognizer поверх общей модели.
+
+    Методы вызываются из потоков декодирования, но для одной сессии строго
+    по очереди, поэтому распознавателю блокировка не нужна.
+    """
+
+    def __init__(self, model, sample_rate=SAMPLE_RATE):
+        import vosk
+        self.recognizer = vosk.KaldiRecognizer(model, sample_rate)
+        self.sample_rate = sample_rate
+        self.last_partial = ""
+
+    def accept(self, data):
+        """Декодирует блок; возвращает сообщения для клиента"""
+        started = time.perf_counter()
+        if self.recognizer.AcceptWaveform(data):
+            messages = self._final(self.recognizer.Result())
+        else:
+            messages = []
+            partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+            if partial and partial != self.last_partial:
+                self.last_partial = partial
+                messages.append({"type": "partial", "text": partial})
+        metrics.inc("asr_decode_seconds_total", time.perf_counter() - started)
+        metrics.inc("asr_audio_seconds_total", len(data) / (self.sample_rate * SAMPLE_WIDTH))
+        return messages
+
+    def finish(self):
+        """Окончательный результат после конца потока"""
+        return self._final(self.recognizer.FinalResult())
+
+    def _final(self, result_json):
+        from app.command import parse_command
+        from app.outbox import encode_command
+
+        self.last_partial = ""
+        text = json.loads(result_json).get("text", "")
+        if not text:
+            return []
+        message = {"type": "final", "text": text}
+        parsed = parse_command(text)
+        if parsed:
+            message["command"] = json.loads(encode_command(parsed))
+        return [message]
+
+
+class RecognitionServer:
+    """TCP-сервер потокового распознавания для многих клиентов с одной моделью.
+
+    Клиент присылает сырой PCM 16 кГц, моно, 16 бит и закрывает свою сторону
+    соединения (shutdown(SHUT_WR)), когда звук закончился. В ответ идут строки
+    JSON: {"type": "partial", "text"}, {"type": "final", "text", "command"},
+    {"type": "error", "error"} и последней {"type": "end"}.
+
+    Декодирование идет в ограниченном пуле потоков. Пока блок сессии в
+    очереди, ее сокет не читается: при перегрузке клиенты упираются в окно
+    TCP, а не копят звук в памяти сервера.
+    """
+
+    def __init__(self, model, workers=None, max_sessions=64, sample_rate=SAMPLE_RATE):
+        self.model = model
+        self.workers = workers or os.cpu_count() or 1
+        self.max_sessions = max_sessions
+        self.sample_rate = sample_rate
+        self.sessions = 0
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="decode")
+        self._slots = None
+        self._server = None
+
+    async def start(self, host, port):
+        self._slots = asyncio.Semaphore(self.workers * QUEUE_PER_WORKER)
+        self._server = await asyncio.start_server(self._handle, host, port)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        logger.info(f"Сервер распознавания на {host}:{port}, потоков декодирования: {self.workers}")
+        return host, port
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._pool.shutdown(wait=True)
+
+    async def _decode(self, fn, *args):
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    @staticmethod
+    async def _send(writer, messages):
+        for message in messages:
+            writer.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        if self.sessions >= self.max_sessions:
+            metrics.inc("server_rejected_total")
+            await self._send(writer, [{"type": "error", "error": "сервер занят"}, {"type": "end"}])
+            writer.close()
+            return
+
+        self.sessions += 1
+        metrics.inc("server_sessions_total")
+        logger.info(f"Сессия {peer} открыта, активных: {self.sessions}", extra=NOISY)
+        try:
+            session = await self._decode(Session, self.model, self.sample_rate)
+            while True:
+                try:
+                    data = await reader.readexactly(CHUNK_BYTES)
+                except asyncio.IncompleteReadError as e:
+                    data = e.partial[:len(e.partial) // SAMPLE_WIDTH * SAMPLE_WIDTH]
+                    if data:
+                        await self._send(writer, await self._decode(session.accept, data))
+                    break
+                await self._send(writer, await self._decode(session.accept, data))
+            await self._send(writer, await self._decode(session.finish) + [{"type": "end"}])
+        except ConnectionError as e:
+            logger.info(f"Сессия {peer} прервана клиентом: {e}", extra=NOISY)
+        except Exception as e:
+            logger.error(f"Ошибка сессии {peer}: {e}", exc_info=True)
+            try:
+                await self._send(writer, [{"type": "error", "error": str(e)}, {"type": "end"}])
+            except ConnectionError:
+                pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+            logger.info(f"Сессия {peer} закрыта, активных: {self.sessions}", extra=NOISY)
+
+
+async def serve(model, host, port, workers=None, max_sessions=64):
+    server = RecognitionServer(model, workers, max_sessions)
+    await server.start(host, port)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    """CLI: python run.py server [--host] [--port] [--workers] [--max-sessions] [--model]"""
+    from config.settings import SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_MAX_SESSIONS
+    from app.speech import MODEL_PATH, check_model, get_model
+
+    parser = argparse.ArgumentParser(prog="run.py server", description="Сервер потокового распознавания речи")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS or None,
+                        help="потоков декодирования (по умолчанию — число ядер)")
+    parser.add_argument("--max-sessions", type=int, default=SERVER_MAX_SESSIONS)
+    parser.add_argument("--model", default=MODEL_PATH, help="путь к модели Vosk")
+    args = parser.parse_args(argv)
+
+    if not check_model(args.model):
+        return 1
+    metrics.configure_from_settings()
+    model = get_model(args.model)
+    print(f"🎧 Сервер распознавания слушает {args.host}:{args.port}")
+    try:
+        asyncio.run(serve(model, args.host, args.port, args.workers, args.max_sessions))
+    except KeyboardInterrupt:
+        print("\n👋 Сервер остановлен")
+    finally:
+        metrics.shutdown()
+    return 0
@@ -1,103 +1,166 @@
 import os
 import sys
+import queue
 import logging
-import vosk
-import time
-import pyaudio
-import json
+import threading
+from config.settings import VOSK_MODEL, VOSK_MODEL_SMALL_PATH, VOSK_MODEL_LARGE_PATH
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+# Логирование настраивает app.logs.setup_logging (run.py)
 logger = logging.getLogger("SpeechRecognition")
 
-# Путь к модели Vosk
-MODEL_PATH = os.path.join("models", "ru", "vosk-model-small-ru-0.22")
+# Путь к модели Vosk: малая или большая по настройке VOSK_MODEL
+MODEL_PATHS = {"small": VOSK_MODEL_SMALL_PATH, "large": VOSK_MODEL_LARGE_PATH}
+MODEL_PATH = MODEL_PATHS.get(VOSK_MODEL, VOSK_MODEL_SMALL_PATH)
 
-def check_model():
+# Сколько ждать фразу в listen_command, секунд
+LISTEN_TIMEOUT = 35
+
+_model = None
+_model_path = None
+_model_lock = threading.Lock()
+_capture = None
+
+def check_model(path=None):
     """Проверяет наличие модели Vosk"""
-    if not os.path.exists(MODEL_PATH):
-        logger.error(f"Модель не найдена в {MODEL_PATH}")
-        print(f"❌ Модель распознавания речи не найдена в {MODEL_PATH}")
+    path = path or MODEL_PATH
+    if not os.path.exists(path):
+        logger.error(f"Модель не найдена в {path}")
+        print(f"❌ Модель распознавания речи не найдена в {path}")
         print("Скачайте с https://alphacephei.com/vosk/models")
         print("и распакуйте в папку models/ru")
         return False
     return True
 
-def listen_command():
-    """Распознает речь локально через Vosk"""
+def get_model(path=None):
+    """Загружает модель Vosk один раз на процесс; в памяти держится только последняя модель"""
+    global _model, _model_path
+    path = path or MODEL_PATH
+    if _model is None or _model_path != path:
+        with _model_lock:
+            if _model is None or _model_path != path:
+                import vosk
+                logger.info(f"Загрузка модели Vosk из {path}")
+                _model = vosk.Model(path)
+                _model_path = path
+    return _model
+
+def print_partial(partial):
+    """Выводит промежуточный результат распознавания"""
+    print(f"Слушаю: {partial}", end='\r')
+
+def create_vad():
+    """Создает детектор речи по настройкам или None, если он отключен"""
+    from config.settings import VAD_ENABLED, VAD_FRAME_MS, VAD_THRESHOLD, VAD_PREROLL_MS, VAD_HANGOVER_MS
+    if not VAD_ENABLED:
+        return None
+
+    from app.vad import VoiceActivityDetector
+    return VoiceActivityDetector(
+        frame_ms=VAD_FRAME_MS,
+        threshold=VAD_THRESHOLD,
+        preroll_ms=VAD_PREROLL_MS,
+        hangover_ms=VAD_HANGOVER_MS
+    )
+
+def create_grammar(model_path=None):
+    """Грамматика распознавания по настройкам или None (отключена или модель не поддерживает)"""
+    from config.settings import RECOGNITION_GRAMMAR, TASK_LEXICON_PATH
+    if not RECOGNITION_GRAMMAR:
+        return None
+
+    from app.grammar import build_model_grammar
+    return build_model_grammar(model_path or MODEL_PATH, TASK_LEXICON_PATH)
+
+def create_wake():
+    """Создает ступень слова-триггера по настройкам или None, если она отключена"""
+    from config.settings import WAKE_WORD_ENABLED, WAKE_WORDS, WAKE_NAME, WAKE_PREROLL_MS, WAKE_ACTIVE_SECONDS
+    if not WAKE_WORD_ENABLED:
+        return None
+
+    from app.wakeword import WakeWordGate
+    return WakeWordGate(
+        WAKE_WORDS + WAKE_NAME.split(),
+        preroll_ms=WAKE_PREROLL_MS,
+        active_seconds=WAKE_ACTIVE_SECONDS
+    )
+
+def create_intent(on_verb=None):
+    """Создает разбор частичных результатов по настройкам или None, если он отключен"""
+    from config.settings import EARLY_INTENT_ENABLED, EARLY_INTENT_STABLE_MS
+    if not EARLY_INTENT_ENABLED:
+        return None
+
+    from app.intent import EarlyIntent
+    return EarlyIntent(stable_ms=EARLY_INTENT_STABLE_MS, on_verb=on_verb)
+
+def audio_device_options():
+    """Параметры устройства ввода для AudioCapture из AUDIO_DEVICE, AUDIO_NATIVE_RATE, AUDIO_CHANNEL_MODE"""
+    from config.settings import AUDIO_DEVICE, AUDIO_NATIVE_RATE, AUDIO_CHANNEL_MODE
+    options = {"native_rate": AUDIO_NATIVE_RATE,
+               "channel_mode": int(AUDIO_CHANNEL_MODE) if AUDIO_CHANNEL_MODE.isdigit() else AUDIO_CHANNEL_MODE}
+    if AUDIO_DEVICE.isdigit():
+        options["device_index"] = int(AUDIO_DEVICE)
+    elif AUDIO_DEVICE:
+        options["device_name"] = AUDIO_DEVICE
+    return options
+
+def start_capture(on_partial=print_partial, on_verb=None):
+    """Запускает постоянный захват звука; возвращает AudioCapture или None.
+
+    Микрофон открывается сразу, а модель загружается в потоке распознавания:
+    звук копится в буфере, пока модель не будет готова (capture.ready).
+    on_verb вызывается, как только в частичном результате появляется глагол команды.
+    """
+    global _capture
+    if _capture is not None:
+        return _capture
+
     try:
         if not check_model():
             return None
-            
-        # Загрузка модели (один раз)
-        if not hasattr(listen_command, 'model'):
-            logger.info(f"Загрузка модели Vosk из {MODEL_PATH}")
-            listen_command.model = vosk.Model(MODEL_PATH)
-        
-        recognizer = vosk.KaldiRecognizer(listen_command.model, 16000)
-        
-        p = pyaudio.PyAudio()
-        
-        # Поиск подходящего устройства ввода
-        device_index = None
-        for i in range(p.get_device_count()):
-            dev_info = p.get_device_info_by_index(i)
-            if int(dev_info.get('maxInputChannels', 0)) > 0:
-                device_index = i
-                break
-        
-        if device_index is None:
-            logger.error("Не найдено устройство ввода")
-            return None
-        
-        frames_per_buffer = 4096
-        stream = p.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=16000,
-            input=True,
-            frames_per_buffer=frames_per_buffer,
-            input_device_index=device_index
-        )
-        
-        print("🎤 Говорите...")
-        timeout = 35  # секунд
-        start_time = time.time()
-        
-        while True:
-            try:
-                data = stream.read(frames_per_buffer, exception_on_overflow=False)
-                
-                if recognizer.AcceptWaveform(data):
-                    result = json.loads(recognizer.Result())
-                    recognized_text = result.get("text", "")
-                    if recognized_text:
-                        stream.stop_stream()
-                        stream.close()
-                        p.terminate()
-                        return recognized_text
-                else:
-                    partial = json.loads(recognizer.PartialResult())
-                    if "partial" in partial and partial["partial"]:
-                        print(f"Слушаю: {partial['partial']}", end='\r')
-                
-                # Проверка таймаута
-                if time.time() - start_time > timeout:
-                    print("\n⏰ Таймаут ожидания речи")
-                    break
-                    
-            except OSError as e:
-                if "Input overflowed" in str(e):
-                    logger.warning("Переполнение буфера микрофона")
-                    continue
-                else:
-                    raise
-        
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-        return None
-        
+
+        from app.capture import AudioCapture
+        _capture = AudioCapture(get_model, on_partial=on_partial, vad=create_vad(),
+                                intent=create_intent(on_verb), grammar=create_grammar(),
+                                wake=create_wake(), **audio_device_options()).start()
+        return _capture
+
     except Exception as e:
-        logger.error(f"Ошибка распознавания речи: {e}", exc_info=True)
+        logger.error(f"Микрофон недоступен: {e}", exc_info=True)
+        return None
+
+def switch_model(size):
+    """Переключает распознавание на малую (small) или большую (large) модель.
+
+    Захват не прерывается: новая модель загружается в потоке распознавания
+    и применяется на границе фраз. Возвращает False, если модели нет на диске.
+    """
+    global MODEL_PATH
+    path = MODEL_PATHS[size]
+    if not check_model(path):
+        return False
+    MODEL_PATH = path
+    if _capture is not None:
+        _capture.swap_model(lambda: get_model(path), create_grammar(path))
+    logger.info(f"Модель распознавания: {size} ({path})")
+    return True
+
+def stop_capture():
+    """Останавливает захват звука"""
+    global _capture
+    if _capture is not None:
+        _capture.stop()
+        _capture = None
+
+def listen_command(timeout=LISTEN_TIMEOUT):
+    """Распознает речь локально через Vosk"""
+    capture = start_capture()
+    if capture is None:
+        return None
+
+    print("🎤 Говорите...")
+    try:
+        return capture.utterances.get(timeout=timeout).text
+    except queue.Empty:
+        print("\n⏰ Таймаут ожидания речи")
         return None
@@ -0,0 +1,155 @@
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from app.speech import MODEL_PATH
+
+logger = logging.getLogger("Transcribe")
+
+AUDIO_EXTENSIONS = (".wav", ".pcm", ".raw")
+
+# Сырые PCM-файлы считаются 16 кГц, моно, 16 бит
+PCM_SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+# Размер блока, передаваемого в AcceptWaveform (4 секунды при 16 кГц)
+CHUNK_FRAMES = 64000
+
+# Модель загружается один раз в каждом процессе пула
+_worker_model = None
+
+def init_worker(model_path):
+    """Инициализатор процесса пула: загружает модель Vosk"""
+    global _worker_model
+    import vosk
+    vosk.SetLogLevel(-1)
+    _worker_model = vosk.Model(model_path)
+
+def collect_files(paths):
+    """Разворачивает список файлов и папок в отсортированный список аудиофайлов"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in names:
+                    if name.lower().endswith(AUDIO_EXTENSIONS):
+                        files.append(os.path.join(root, name))
+        else:
+            files.append(path)
+    return sorted(files)
+
+def read_chunks(path):
+    """Открывает WAV или сырой PCM; возвращает частоту, длительность и генератор блоков"""
+    if path.lower().endswith(".wav"):
+        wf = wave.open(path, "rb")
+        if wf.getnchannels() != 1 or wf.getsampwidth() != SAMPLE_WIDTH or wf.getcomptype() != "NONE":
+            wf.close()
+            raise ValueError("нужен WAV моно, 16 бит PCM")
+        rate = wf.getframerate()
+        duration = wf.getnframes() / rate
+
+        def chunks():
+            with wf:
+                while True:
+                    data = wf.readframes(CHUNK_FRAMES)
+                    if not data:
+                        break
+                    yield data
+
+        return rate, duration, chunks()
+
+    duration = os.path.getsize(path) / (PCM_SAMPLE_RATE * SAMPLE_WIDTH)
+
+    def chunks():
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(CHUNK_FRAMES * SAMPLE_WIDTH)
+                if not data:
+                    break
+                yield data
+
+    return PCM_SAMPLE_RATE, duration, chunks()
+
+def transcribe_file(path):
+    """Распознает один файл моделью текущего процесса"""
+    started = time.perf_counter()
+    try:
+        rate, duration, chunks = read_chunks(path)
+        import vosk
+        recognizer = vosk.KaldiRecognizer(_worker_model, rate)
+        parts = []
+        for data in chunks:
+            if recognizer.AcceptWaveform(data):
+                parts.append(json.loads(recognizer.Result()).get("text", ""))
+        parts.append(json.loads(recognizer.FinalResult()).get("text", ""))
+
+        return {
+            "file": path,
+            "text": " ".join(part for part in parts if part),
+            "duration": round(duration, 3),
+            "elapsed": round(time.perf_counter() - started, 3),
+        }
+    except Exception as e:
+        return {
+            "file": path,
+            "error": str(e),
+            "duration": 0.0,
+            "elapsed": round(time.perf_counter() - started, 3),
+        }
+
+def transcribe_batch(paths, output, workers=None, model_path=MODEL_PATH):
+    """Распознает файлы пулом процессов и пишет результаты в JSONL"""
+    files = collect_files(paths)
+    if not files:
+        return {"files": 0, "errors": 0, "audio_seconds": 0.0, "wall_seconds": 0.0,
+                "rtf": 0.0, "files_per_second": 0.0}
+
+    started = time.perf_counter()
+    audio_seconds = 0.0
+    errors = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(model_path,)) as pool, \
+            open(output, "w", encoding="utf-8") as out:
+        for result in pool.map(transcribe_file, files):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            audio_seconds += result["duration"]
+            if "error" in result:
+                errors += 1
+                logger.error(f"❌ {result['file']}: {result['error']}")
+
+    wall = time.perf_counter() - started
+    return {
+        "files": len(files),
+        "errors": errors,
+        "audio_seconds": round(audio_seconds, 3),
+        "wall_seconds": round(wall, 3),
+        "rtf": round(wall / audio_seconds, 4) if audio_seconds else 0.0,
+        "files_per_second": round(len(files) / wall, 2) if wall else 0.0,
+    }
+
+def main(argv=None):
+    """CLI: python run.py transcribe <папка|файлы> [-o results.jsonl] [-j N]"""
+    parser = argparse.ArgumentParser(prog="run.py transcribe", description="Пакетное распознавание WAV/PCM файлов")
+    parser.add_argument("paths", nargs="+", help="файлы или папки с аудио")
+    parser.add_argument("-o", "--output", default="transcripts.jsonl", help="файл результатов JSONL")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="число процессов (по умолчанию — число ядер)")
+    parser.add_argument("--model", default=MODEL_PATH, help="путь к модели Vosk")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.model):
+        print(f"❌ Модель распознавания речи не найдена в {args.model}")
+        return 1
+
+    summary = transcribe_batch(args.paths, args.output, workers=args.workers, model_path=args.model)
+    print(f"✅ Файлов: {summary['files']} (ошибок: {summary['errors']}), "
+          f"аудио: {summary['audio_seconds']:.1f} с, время: {summary['wall_seconds']:.1f} с")
+    print(f"📊 RTF: {summary['rtf']:.4f}, файлов/с: {summary['files_per_second']:.2f}")
+    print(f"📝 Результаты: {args.output}")
+    return 0 if summary["errors"] == 0 else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
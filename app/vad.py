@@ -0,0 +1,120 @@
+import collections
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Энергия тишины не опускается ниже этого уровня (RMS ≈ 10 для int16)
+MIN_NOISE_FLOOR = 100.0
+
+
+class VoiceActivityDetector:
+    """Энергетический детектор речи с адаптивным шумовым порогом.
+
+    Признаки (энергия и частота переходов через ноль) считаются векторно для
+    всех кадров блока сразу. Пока речи нет, кадры копятся в буфере pre-roll,
+    чтобы начало слова не обрезалось; после конца речи еще hangover_ms звука
+    передается распознавателю.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, frame_ms=20, threshold=3.0, zcr_max=0.35,
+                 preroll_ms=300, hangover_ms=500, min_speech_ms=40, noise_adapt=0.05):
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.frame_bytes = self.frame_len * 2
+        self.threshold = threshold
+        self.zcr_max = zcr_max
+        self.noise_adapt = noise_adapt
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+
+        self.noise_floor = None
+        self.in_speech = False
+        self._preroll = collections.deque(maxlen=max(1, preroll_ms // frame_ms))
+        self._remainder = b""
+        self._speech_run = 0
+        self._silence_run = 0
+
+        # Статистика: сколько кадров всего и сколько ушло в распознаватель
+        self.frames_total = 0
+        self.frames_passed = 0
+
+    def reset(self):
+        """Сбрасывает состояние речи, сохраняя оценку шума"""
+        self.in_speech = False
+        self._preroll.clear()
+        self._remainder = b""
+        self._speech_run = 0
+        self._silence_run = 0
+
+    def features(self, samples):
+        """Энергия и доля переходов через ноль для каждого кадра"""
+        frames = samples[:len(samples) // self.frame_len * self.frame_len]
+        frames = frames.reshape(-1, self.frame_len).astype(np.float32)
+        energy = np.mean(frames * frames, axis=1)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame_len - 1)
+        return energy, zcr
+
+    def _update_noise_floor(self, energy, speech_mask):
+        quiet = energy[~speech_mask]
+        if self.noise_floor is None:
+            self.noise_floor = max(float(np.median(energy)), MIN_NOISE_FLOOR)
+            return
+        if quiet.size:
+            level = float(quiet.mean())
+            # Быстро опускаемся к тишине, медленно поднимаемся при росте шума
+            if level < self.noise_floor:
+                self.noise_floor = level
+            else:
+                self.noise_floor += self.noise_adapt * (level - self.noise_floor)
+        self.noise_floor = max(self.noise_floor, MIN_NOISE_FLOOR)
+
+    def process(self, data):
+        """Принимает блок PCM int16; возвращает список (звук для распознавателя, конец_речи)"""
+        data = self._remainder + bytes(data)
+        usable = len(data) // self.frame_bytes * self.frame_bytes
+        self._remainder = data[usable:]
+        if not usable:
+            return []
+
+        samples = np.frombuffer(data, dtype=np.int16, count=usable // 2)
+        energy, zcr = self.features(samples)
+        if self.noise_floor is None:
+            self._update_noise_floor(energy, np.zeros(len(energy), dtype=bool))
+
+        loud = energy > self.noise_floor * self.threshold
+        # Высокий ZCR при умеренной энергии — шипение, а не голос
+        speech_mask = loud & ((zcr < self.zcr_max) | (energy > self.noise_floor * self.threshold * 4))
+        self._update_noise_floor(energy, speech_mask)
+
+        segments = []
+        out = bytearray()
+        frame_bytes = self.frame_bytes
+        for i, is_speech in enumerate(speech_mask.tolist()):
+            frame = data[i * frame_bytes:(i + 1) * frame_bytes]
+            if self.in_speech:
+                out += frame
+                if is_speech:
+                    self._silence_run = 0
+                else:
+                    self._silence_run += 1
+                    if self._silence_run >= self.hangover_frames:
+                        segments.append((bytes(out), True))
+                        out = bytearray()
+                        self.in_speech = False
+                        self._speech_run = 0
+                        self._silence_run = 0
+            else:
+                self._preroll.append(frame)
+                self._speech_run = self._speech_run + 1 if is_speech else 0
+                if self._speech_run >= self.min_speech_frames:
+                    self.in_speech = True
+                    self._silence_run = 0
+                    out += b"".join(self._preroll)
+                    self._preroll.clear()
+
+        if out:
+            segments.append((bytes(out), False))
+
+        self.frames_total += len(speech_mask)
+        self.frames_passed += sum(len(chunk) for chunk, _ in segments) // frame_bytes
+        return segments
@@ -0,0 +1,109 @@
+import json
+import time
+import collections
+import logging
+from app import metrics
+from app.capture import waveform
+
+logger = logging.getLogger("WakeWord")
+
+SAMPLE_WIDTH = 2
+UNK = "[unk]"
+
+
+class WakeWordGate:
+    """Первая ступень распознавания: маленький KaldiRecognizer ищет только слова-триггеры.
+
+    Пока триггера нет, звук идет лишь в распознаватель с грамматикой из
+    нескольких слов, а последние preroll_ms звука хранятся в буфере. Когда в
+    гипотезе появляется триггер, process() возвращает буфер целиком (вместе с
+    самим словом) и дальше пропускает звук к полному распознавателю, пока
+    AudioCapture не завершит фразу и не вызовет release(). Фраза длиннее
+    active_seconds завершается принудительно.
+    """
+
+    def __init__(self, words, sample_rate=16000, preroll_ms=1000, active_seconds=15):
+        self.words = frozenset(word.lower() for word in words)
+        self.sample_rate = sample_rate
+        self.preroll_bytes = sample_rate * SAMPLE_WIDTH * preroll_ms // 1000
+        self.active_bytes = int(sample_rate * SAMPLE_WIDTH * active_seconds)
+        self.active = False
+        self._spotter = None
+        self._preroll = collections.deque()
+        self._preroll_size = 0
+        self._passed = 0
+
+        # Статистика: срабатывания и время работы первой ступени
+        self.triggers = 0
+        self.spot_seconds = 0.0
+        self.audio_seconds = 0.0
+
+    def bind(self, model):
+        """Создает распознаватель триггеров для загруженной модели"""
+        import vosk
+        grammar = sorted(self.words) + [UNK]
+        self._spotter = vosk.KaldiRecognizer(model, self.sample_rate, json.dumps(grammar, ensure_ascii=False))
+        return self
+
+    def _remember(self, data):
+        # Блок может быть memoryview на буфер, который AudioCapture заполнит снова
+        data = bytes(data)
+        self._preroll.append(data)
+        self._preroll_size += len(data)
+        while self._preroll_size - len(self._preroll[0]) >= self.preroll_bytes:
+            self._preroll_size -= len(self._preroll.popleft())
+
+    def _spot(self, data):
+        """Есть ли слово-триггер в гипотезе распознавателя триггеров"""
+        started = time.perf_counter()
+        if self._spotter.AcceptWaveform(waveform(data)):
+            text = json.loads(self._spotter.Result()).get("text", "")
+        else:
+            text = json.loads(self._spotter.PartialResult()).get("partial", "")
+        elapsed = time.perf_counter() - started
+        self.spot_seconds += elapsed
+        metrics.inc("wake_decode_seconds_total", elapsed)
+        return any(word in self.words for word in text.split())
+
+    def process(self, data):
+        """Звук для полного распознавателя: пусто, пока нет триггера"""
+        if self.active:
+            self._passed += len(data)
+            return data
+
+        self.audio_seconds += len(data) / (self.sample_rate * SAMPLE_WIDTH)
+        self._remember(data)
+        if not self._spot(data):
+            return b""
+
+        self.active = True
+        self.triggers += 1
+        metrics.inc("wake_triggers_total")
+        audio = b"".join(self._preroll)
+        self._preroll.clear()
+        self._preroll_size = 0
+        self._passed = len(audio)
+        # Следующий поиск триггера начинается с чистой гипотезы
+        self._spotter.FinalResult()
+        return audio
+
+    def expired(self):
+        """Фраза после триггера длится дольше active_seconds"""
+        return self.active and self._passed >= self.active_bytes
+
+    def reset(self):
+        """Конец участка речи без триггера: гипотеза распознавателя триггеров сбрасывается"""
+        if not self.active and self._spotter is not None:
+            self._spotter.FinalResult()
+
+    def release(self):
+        """Фраза завершена: снова ждем триггер"""
+        self.active = False
+        self._passed = 0
+
+    def stats(self):
+        return {
+            "triggers": self.triggers,
+            "spot_seconds": round(self.spot_seconds, 3),
+            "audio_seconds": round(self.audio_seconds, 3),
+        }
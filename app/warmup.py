@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import time
+import logging
+import importlib
+import threading
+
+logger = logging.getLogger("Warmup")
+
+# Модули, которые бот импортирует до главного цикла
+STARTUP_MODULES = ("config.settings", "app.logs", "app.speech", "app.command", "app.dispatch", "app.outbox")
+# Тяжелые зависимости: их импорт должен происходить только в фоновом прогреве
+HEAVY_MODULES = ("vosk", "pyaudio", "dateparser", "googleapiclient", "google_auth_oauthlib", "requests")
+
+
+class Warmup:
+    """Параллельный прогрев: каждая задача выполняется в своем потоке с замером времени"""
+
+    def __init__(self):
+        self.tasks = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, fn):
+        """Запускает fn в фоновом потоке"""
+        task = {"thread": None, "seconds": None, "error": None}
+        task["thread"] = threading.Thread(target=self._run, args=(task, fn), name=f"warmup-{name}", daemon=True)
+        with self._lock:
+            self.tasks[name] = task
+        task["thread"].start()
+        return self
+
+    def _run(self, task, fn):
+        started = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            task["error"] = str(e)
+            logger.warning(f"Прогрев {task['thread'].name} не удался: {e}")
+        finally:
+            task["seconds"] = time.perf_counter() - started
+
+    def wait(self, timeout=None):
+        """Ждет завершения всех задач; возвращает True, если все завершились"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for task in list(self.tasks.values()):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            task["thread"].join(remaining)
+        return all(not task["thread"].is_alive() for task in self.tasks.values())
+
+    def report(self):
+        """{имя: {"seconds", "error"}}; seconds равно None, пока задача выполняется"""
+        return {name: {"seconds": task["seconds"], "error": task["error"]} for name, task in self.tasks.items()}
+
+
+def _warm_model():
+    from app.speech import MODEL_PATH, get_model
+    # Сообщение о ненайденной модели выведет проверка микрофона в основном потоке
+    if not os.path.exists(MODEL_PATH):
+        raise FileNotFoundError(f"модель Vosk не найдена в {MODEL_PATH}")
+    get_model()
+
+
+def _warm_dateparser():
+    from app.dates import warm_up_dateparser
+    warm_up_dateparser()
+
+
+def _warm_notion():
+    from app.notion import get_notion_client
+    get_notion_client()
+
+
+def _warm_calendar():
+    from app.google_calendar import warm_up_calendar_service
+    warm_up_calendar_service()
+
+
+def _warm_dedup():
+    from app.dedup import warm_from_notion
+    warm_from_notion()
+
+
+def start_warmup():
+    """Запускает загрузку модели, dateparser, клиентов API и индекса повторов в фоновых потоках"""
+    return (
+        Warmup()
+        .add("model", _warm_model)
+        .add("dateparser", _warm_dateparser)
+        .add("notion", _warm_notion)
+        .add("calendar", _warm_calendar)
+        .add("dedup", _warm_dedup)
+    )
+
+
+def profile_startup(as_json=False):
+    """Замеряет время импорта модулей и прогрева; печатает таблицу или JSON"""
+    started = time.perf_counter()
+    imports = {}
+    for name in STARTUP_MODULES:
+        module_started = time.perf_counter()
+        importlib.import_module(name)
+        imports[name] = time.perf_counter() - module_started
+    imports_total = time.perf_counter() - started
+    heavy_loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    warmup = start_warmup()
+
+    # Проверка микрофона идет в основном потоке одновременно с прогревом
+    from app.speech import start_capture, stop_capture
+    microphone_started = time.perf_counter()
+    capture = start_capture(on_partial=None)
+    microphone = {"seconds": time.perf_counter() - microphone_started, "error": None}
+    if capture is None:
+        microphone["error"] = "микрофон недоступен"
+    else:
+        stop_capture()
+
+    warmup.wait()
+    profile = {
+        "imports": imports,
+        "imports_total": imports_total,
+        "heavy_loaded": heavy_loaded,
+        "microphone": microphone,
+        "warmup": warmup.report(),
+        "ready": time.perf_counter() - started,
+    }
+
+    if as_json:
+        print(json.dumps(profile, ensure_ascii=False))
+        return profile
+
+    print("Импорт модулей:")
+    for name, seconds in imports.items():
+        print(f"  {name:<28} {1000 * seconds:8.1f} мс")
+    print(f"  {'всего':<28} {1000 * imports_total:8.1f} мс")
+    if heavy_loaded:
+        print(f"⚠️ Тяжелые модули загружены до прогрева: {', '.join(heavy_loaded)}")
+    print("Прогрев (параллельно):")
+    for name, task in [("microphone", microphone)] + list(profile["warmup"].items()):
+        suffix = f" — {task['error']}" if task["error"] else ""
+        print(f"  {name:<28} {1000 * task['seconds']:8.1f} мс{suffix}")
+    print(f"Готовность: {1000 * profile['ready']:.1f} мс")
+    return profile
@@ -0,0 +1,73 @@
+"""Фраза с несколькими командами: по команде за раз против одного пакета.
+
+    python -m benchmarks.bench_batch --commands 5 --notion-latency 0.3 --calendar-latency 0.2
+
+Сравнивается время от разбора фразы до результатов всех ее команд: прежний
+путь (Dispatcher.dispatch для каждой команды по очереди) и dispatch_batch, где
+страницы Notion создаются одновременно, а события календаря уходят одним
+пакетным запросом. Результат пакета проверяется по каждой команде.
+"""
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+from benchmarks.common import summarize
+from benchmarks.mock_servers import MockNotionServer, MockCalendarServer, use_mock_sinks
+
+PHRASE = "создай задачу отчёт на завтра и задачу созвон в пятницу в 10"
+
+
+def make_commands(count, key_prefix):
+    start = datetime(2030, 1, 1, 10, 0)
+    return [
+        {"task": f"Задача {i}", "due": start + timedelta(hours=i), "start": start + timedelta(hours=i),
+         "key": f"{key_prefix}-{i}"}
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=5, help="команд во фразе")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--notion-latency", type=float, default=0.3, help="задержка заглушки Notion, с")
+    parser.add_argument("--calendar-latency", type=float, default=0.2, help="задержка заглушки Calendar, с")
+    args = parser.parse_args()
+
+    from app.command import parse_commands
+    parsed = parse_commands(PHRASE)
+    print(f"'{PHRASE}' → {[command['task'] for command in parsed]}")
+
+    with MockNotionServer(latency=args.notion_latency) as notion, \
+            MockCalendarServer(latency=args.calendar_latency) as calendar:
+        use_mock_sinks(notion, calendar)
+        from app.dispatch import create_dispatcher
+
+        dispatcher = create_dispatcher()
+        # Прогрев соединений, чтобы оба варианта шли по открытым сокетам
+        dispatcher.dispatch(make_commands(1, "warmup")[0]).result()
+
+        one_by_one, batched, failed = [], [], 0
+        for round_index in range(args.rounds):
+            commands = make_commands(args.commands, f"single-{round_index}")
+            started = time.perf_counter()
+            for command in commands:
+                dispatcher.dispatch(command).result()
+            one_by_one.append(time.perf_counter() - started)
+
+            commands = make_commands(args.commands, f"batch-{round_index}")
+            started = time.perf_counter()
+            results = dispatcher.dispatch_batch(commands).result()
+            batched.append(time.perf_counter() - started)
+            failed += sum(1 for result in results for sink in result.values() if not sink["success"])
+        dispatcher.shutdown()
+
+    print(f"Команд во фразе: {args.commands}, Notion {1000 * args.notion_latency:.0f} мс, "
+          f"Calendar {1000 * args.calendar_latency:.0f} мс")
+    print(f"По команде: {summarize(one_by_one)}")
+    print(f"Пакет:      {summarize(batched)}, неудачных доставок {failed}")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Создание событий на локальной заглушке Calendar API: сервис на каждое событие,
+кэшированный сервис и пакетные запросы.
+
+    python -m benchmarks.bench_calendar --events 50 --latency 0.05
+"""
+import os
+import time
+import argparse
+from datetime import datetime, timedelta
+from benchmarks.mock_servers import MockCalendarServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа заглушки, с")
+    args = parser.parse_args()
+
+    with MockCalendarServer(latency=args.latency) as server:
+        # Настройки читаются при импорте, поэтому окружение задается до него
+        os.environ["GOOGLE_CALENDAR_API_ENDPOINT"] = server.url + "/"
+        os.environ.setdefault("NOTION_API_KEY", "bench")
+        os.environ.setdefault("DATABASE_ID", "bench")
+        from google.auth.credentials import AnonymousCredentials
+        from app import google_calendar
+
+        creds = AnonymousCredentials()
+        start = datetime(2030, 1, 1, 10, 0)
+        items = [(f"Событие {i}", start + timedelta(hours=i)) for i in range(args.events)]
+
+        # Как было раньше: сервис собирается заново для каждого события
+        started = time.perf_counter()
+        for name, date in items:
+            service = google_calendar._build_service(creds)
+            service.events().insert(calendarId="primary", body=google_calendar.build_event(name, date)).execute()
+        rebuild = time.perf_counter() - started
+
+        google_calendar._credentials = creds
+        google_calendar._service = google_calendar._build_service(creds)
+
+        started = time.perf_counter()
+        for name, date in items:
+            google_calendar.create_calendar_event(name, date)
+        cached = time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = google_calendar.create_calendar_events_bulk(items)
+        bulk = time.perf_counter() - started
+
+    ok = sum(1 for result in results if result["success"])
+    print(f"Событий: {args.events}, задержка заглушки: {1000 * args.latency:.0f} мс")
+    print(f"Сервис на каждое событие: {rebuild:.2f} с ({1000 * rebuild / args.events:.1f} мс/событие)")
+    print(f"Кэшированный сервис:      {cached:.2f} с ({1000 * cached / args.events:.1f} мс/событие)")
+    print(f"Пакетный запрос:          {bulk:.2f} с ({1000 * bulk / args.events:.1f} мс/событие), успешно {ok}")
+
+
+if __name__ == "__main__":
+    main()
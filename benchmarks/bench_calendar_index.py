@@ -0,0 +1,141 @@
+"""Локальная копия календаря на заглушке Calendar API: синхронизация и запросы занятости.
+
+    python -m benchmarks.bench_calendar_index --events 2000 --latency 0.05
+
+Заглушка отдает события постранично и инкрементально по syncToken. Проверяется,
+что после полной синхронизации, после добавления, переноса и удаления событий
+и после устаревания токена (410) индекс совпадает с календарем, а после
+перезапуска читается с диска. Затем сравнивается время проверки пересечения
+и поиска свободного времени по индексу с одним запросом events.list.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta, timezone
+from benchmarks.common import summarize
+from benchmarks.mock_servers import MockCalendarServer
+
+START = datetime(2030, 1, 1, 9, 0, tzinfo=timezone.utc)
+
+
+def make_event(rng, days):
+    start = START + timedelta(days=rng.randrange(days), hours=rng.randrange(10), minutes=rng.choice((0, 30)))
+    end = start + timedelta(minutes=rng.choice((30, 60, 90, 120)))
+    return {"summary": f"Событие {rng.randrange(10 ** 6)}",
+            "start": {"dateTime": start.isoformat()}, "end": {"dateTime": end.isoformat()}}
+
+
+def matches(index, server):
+    """Совпадает ли занятое время в индексе с событиями заглушки"""
+    from app.calendar_index import busy_interval
+    expected = {}
+    for event in server.events:
+        interval = busy_interval(event)
+        if interval is not None:
+            expected[event["id"]] = interval
+    actual = {event_id: (start, end) for start, end, event_id, _ in index._intervals}
+    return actual == expected
+
+
+def check(name, ok, requests=None):
+    print(f"{'✅' if ok else '❌'} {name}" + (f" (запросов: {requests})" if requests is not None else ""))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=60, help="на сколько дней распределены события")
+    parser.add_argument("--changes", type=int, default=20, help="добавлений, переносов и удалений")
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа заглушки, с")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    workdir = tempfile.mkdtemp()
+    ok = True
+    with MockCalendarServer(latency=args.latency) as server:
+        for _ in range(args.events):
+            server.insert(make_event(rng, args.days))
+
+        # Настройки читаются при импорте, поэтому окружение задается до него
+        os.environ["GOOGLE_CALENDAR_API_ENDPOINT"] = server.url + "/"
+        os.environ["CALENDAR_INDEX_PATH"] = os.path.join(workdir, "calendar_index.db")
+        os.environ.setdefault("NOTION_API_KEY", "bench")
+        os.environ.setdefault("DATABASE_ID", "bench")
+        from google.auth.credentials import AnonymousCredentials
+        from app import google_calendar
+        from app.calendar_index import CalendarIndex, CalendarSync, SYNC_LOOKBACK
+        google_calendar._credentials = AnonymousCredentials()
+        google_calendar._service = google_calendar._build_service(google_calendar._credentials)
+
+        index = CalendarIndex()
+        sync = CalendarSync(index)
+        with server.lock:
+            server.requests = 0
+        started = time.perf_counter()
+        sync.sync_once()
+        full = time.perf_counter() - started
+        ok &= check(f"Полная синхронизация: {len(index)} событий за {full:.2f} с", matches(index, server),
+                    server.requests)
+
+        ids = [event["id"] for event in server.events]
+        for _ in range(args.changes):
+            server.insert(make_event(rng, args.days))
+        for event_id in rng.sample(ids, args.changes):
+            moved = make_event(rng, args.days)
+            server.update(event_id, start=moved["start"], end=moved["end"])
+        for event_id in rng.sample(ids, args.changes):
+            server.delete(event_id)
+        with server.lock:
+            server.requests = 0
+        started = time.perf_counter()
+        changes = sync.sync_once()
+        incremental = time.perf_counter() - started
+        ok &= check(f"Инкрементальная синхронизация: {changes} изменений за {1000 * incremental:.0f} мс",
+                    matches(index, server), server.requests)
+
+        server.expire_sync_tokens()
+        server.insert(make_event(rng, args.days))
+        sync.sync_once()
+        ok &= check("Устаревший syncToken (410): полная синхронизация заново", matches(index, server))
+
+        index.close()
+        index = CalendarIndex()
+        ok &= check(f"Индекс прочитан с диска: {len(index)} событий, токен сохранен",
+                    matches(index, server) and index.sync_token is not None)
+
+        moments = [START + timedelta(days=rng.randrange(args.days), minutes=15 * rng.randrange(40))
+                   for _ in range(args.queries)]
+        overlap = []
+        for moment in moments:
+            started = time.perf_counter()
+            index.overlaps(moment)
+            overlap.append(time.perf_counter() - started)
+        free = []
+        for moment in moments:
+            started = time.perf_counter()
+            index.next_free_slot(moment)
+            free.append(time.perf_counter() - started)
+
+        # Для сравнения: одна проверка занятости запросом к API
+        service = google_calendar.get_calendar_service()
+        remote = []
+        for moment in moments[:20]:
+            started = time.perf_counter()
+            service.events().list(calendarId="primary", timeMin=(moment - SYNC_LOOKBACK).isoformat(),
+                                  maxResults=2500).execute()
+            remote.append(time.perf_counter() - started)
+        index.close()
+
+    print(f"Пересечение по индексу:       {summarize(overlap)}")
+    print(f"Свободное время по индексу:   {summarize(free)}")
+    print(f"events.list на каждую команду: {summarize(remote)}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
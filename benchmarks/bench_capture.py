@@ -0,0 +1,179 @@
+"""Приведение звука устройства к 16 кГц моно: AudioConverter против наивного np.interp + среднее.
+
+    python -m benchmarks.bench_capture --seconds 20 --noise 600
+
+Синтетическая запись массива микрофонов в родной частоте устройства: один
+голос приходит на каналы с разной задержкой (до MAX_CHANNEL_DELAY), у
+каждого канала свой шум, у последнего — в --noisy-gain раз громче. Звук
+подается блоками, как в callback PyAudio, и для каждой конфигурации
+выводятся процессорное время на секунду звука, отношение сигнал/шум
+результата относительно чистого голоса, подавление наложения спектра
+(тон выше 8 кГц, который после передискретизации должен исчезнуть) и
+память, выделяемая на блок (у beam пик — блоки с пересчетом задержек).
+"""
+import sys
+import argparse
+import tracemalloc
+import numpy as np
+from benchmarks.common import cpu_seconds, synthetic_speech, SAMPLE_RATE
+
+FRAMES_PER_BUFFER = 4096
+# Задержки голоса на каналах массива, секунд (меньше MAX_CHANNEL_DELAY)
+CHANNEL_DELAYS = (0.0, 0.0001, 0.00019, 0.00006)
+# Частота, устройства, каналы и сведение
+CONFIGS = (
+    (48000, 4, "beam"),
+    (48000, 4, "mix"),
+    (48000, 2, "beam"),
+    (44100, 2, "beam"),
+    (16000, 1, "mix"),
+)
+
+
+def delayed(signal, seconds, rate):
+    """Сигнал с задержкой на seconds (дробная задержка — линейной интерполяцией)"""
+    shift = seconds * rate
+    positions = np.arange(len(signal)) - shift
+    return np.interp(positions, np.arange(len(signal)), signal, left=0.0)
+
+
+def array_recording(seconds, rate, channels, noise, noisy_gain, seed=0):
+    """Чистый голос (float) и запись массива int16 (отсчеты × каналы) в частоте rate"""
+    rng = np.random.default_rng(seed)
+    voice = synthetic_speech(seconds, rate, np.random.default_rng(seed))
+    frames = np.empty((len(voice), channels))
+    for channel in range(channels):
+        level = noise * (noisy_gain if channel == channels - 1 and channels > 1 else 1)
+        frames[:, channel] = delayed(voice, CHANNEL_DELAYS[channel % len(CHANNEL_DELAYS)], rate)
+        frames[:, channel] += rng.normal(0, level, len(voice))
+    return voice, np.clip(np.rint(frames), -32768, 32767).astype(np.int16)
+
+
+def blocks(recording, rate):
+    """Блоки байтов, как их отдает callback устройства с этой частотой"""
+    size = FRAMES_PER_BUFFER * rate // SAMPLE_RATE
+    return [recording[start:start + size].tobytes() for start in range(0, len(recording), size)]
+
+
+class NaiveConverter:
+    """Прежний подход без фильтра: среднее каналов и np.interp на каждом блоке (новые массивы на блок)"""
+
+    def __init__(self, in_rate, channels, out_rate=SAMPLE_RATE):
+        self.in_rate = in_rate
+        self.channels = channels
+        self.out_rate = out_rate
+        self._position = 0.0
+
+    def process(self, data):
+        frames = np.frombuffer(data, dtype=np.int16).reshape(-1, self.channels).astype(np.float32)
+        mono = frames.mean(axis=1)
+        step = self.in_rate / self.out_rate
+        positions = np.arange(self._position, len(mono) - 1, step)
+        self._position = positions[-1] + step - len(mono) if len(positions) else self._position - len(mono)
+        result = np.interp(positions, np.arange(len(mono)), mono)
+        return np.clip(np.rint(result), -32768, 32767).astype(np.int16).tobytes()
+
+
+def convert(converter, chunks):
+    return np.concatenate([np.frombuffer(bytes(converter.process(chunk)), dtype=np.int16) for chunk in chunks])
+
+
+def snr_db(reference, output):
+    """Отношение сигнал/шум output относительно reference после подбора усиления, дБ"""
+    size = min(len(reference), len(output))
+    reference, output = reference[:size].astype(np.float64), output[:size].astype(np.float64)
+    gain = np.dot(reference, output) / max(np.dot(reference, reference), 1e-9)
+    error = output - gain * reference
+    return 10 * np.log10(np.dot(gain * reference, gain * reference) / max(np.dot(error, error), 1e-9))
+
+
+def aliasing_db(make, rate, channels, seconds=2.0):
+    """Во сколько раз (дБ) ослаблен тон 11 кГц (выше Найквиста 16 кГц) относительно тона 1 кГц.
+
+    Остаток тона меньше половины младшего разряда int16 округляется до нуля,
+    поэтому оценка ограничена сверху этим уровнем.
+    """
+    if rate <= 2 * 11000:
+        return None
+    t = np.arange(int(seconds * rate)) / rate
+    levels = []
+    for frequency in (1000, 11000):
+        tone = np.repeat((8000 * np.sin(2 * np.pi * frequency * t))[:, None], channels, axis=1)
+        output = convert(make(), blocks(np.rint(tone).astype(np.int16), rate)).astype(np.float64)
+        steady = output[len(output) // 4:]
+        levels.append(np.sqrt(np.mean(steady ** 2)))
+    return 20 * np.log10(levels[0] / max(levels[1], 0.5))
+
+
+def block_allocations(converter, chunks):
+    """Память, выделяемая за обработку блока после прогрева: (медиана, наибольшая), байт"""
+    for chunk in chunks[:4]:
+        converter.process(chunk)
+    peaks = []
+    tracemalloc.start()
+    for chunk in chunks[4:24]:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        converter.process(chunk)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return (float(np.median(peaks)), max(peaks)) if peaks else (0.0, 0)
+
+
+def run_config(rate, channels, mode, args):
+    from app.resample import AudioConverter, ChannelMixer
+    voice, recording = array_recording(args.seconds, rate, channels, args.noise, args.noisy_gain)
+    chunks = blocks(recording, rate)
+    max_frames = FRAMES_PER_BUFFER * rate // SAMPLE_RATE
+
+    def make():
+        return AudioConverter(rate, channels, SAMPLE_RATE, mode, max_frames=max_frames)
+
+    # Эталон — чистый голос канала 0, приведенный к 16 кГц тем же способом (с той же задержкой сведения)
+    pad = ChannelMixer(channels, rate).max_lag if channels > 1 and mode == "beam" else 0
+    clean = np.concatenate((np.zeros((pad, 1)), voice[:, None]))
+    clean = blocks(np.clip(np.rint(clean), -32768, 32767).astype(np.int16), rate)
+
+    results = {}
+    for name, factory, mono in (
+        ("AudioConverter", make, lambda: AudioConverter(rate, 1, SAMPLE_RATE, max_frames=max_frames)),
+        ("np.interp", lambda: NaiveConverter(rate, channels), lambda: NaiveConverter(rate, 1)),
+    ):
+        output, cpu, _ = cpu_seconds(convert, factory(), chunks)
+        results[name] = {
+            "cpu_ms": cpu / args.seconds * 1000,
+            "snr": snr_db(convert(mono(), clean), output),
+            "aliasing": aliasing_db(factory, rate, channels),
+            "alloc": block_allocations(factory(), chunks),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=20.0, help="длительность записи")
+    parser.add_argument("--noise", type=float, default=600.0, help="СКО шума каждого микрофона")
+    parser.add_argument("--noisy-gain", type=float, default=4.0, help="во сколько раз шумнее последний микрофон")
+    args = parser.parse_args()
+
+    ok = True
+    for rate, channels, mode in CONFIGS:
+        results = run_config(rate, channels, mode, args)
+        print(f"\n{rate} Гц × {channels} кан. ({mode}):")
+        for name, result in results.items():
+            aliasing = f"{result['aliasing']:.0f} дБ" if result["aliasing"] is not None else "—"
+            print(f"  {name:15} CPU {result['cpu_ms']:6.2f} мс на секунду звука, SNR {result['snr']:5.1f} дБ, "
+                  f"подавление наложения {aliasing}, память на блок {result['alloc'][0] / 1024:.1f} КБ "
+                  f"(пик {result['alloc'][1] / 1024:.1f} КБ)")
+        converter = results["AudioConverter"]
+        # Реальное время с большим запасом и не хуже наивного подхода по качеству
+        ok &= converter["cpu_ms"] < 100
+        ok &= converter["snr"] >= results["np.interp"]["snr"] - 0.5
+        ok &= converter["aliasing"] is None or converter["aliasing"] > 60
+
+    print(f"\n{'✅' if ok else '❌'} Приведение к 16 кГц моно укладывается в реальное время без потери качества")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
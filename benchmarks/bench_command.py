@@ -0,0 +1,63 @@
+"""Совпадение и скорость разбора команд: грамматика app.command против каскада regex.
+
+    python -m benchmarks.bench_command --seconds 2
+"""
+import os
+import json
+import time
+import argparse
+from app.command import extract_task_and_date
+from benchmarks import legacy_command
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "corpus", "commands_v1.jsonl")
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def check_parity(corpus):
+    """Возвращает список расхождений с корпусом и с исходной реализацией"""
+    mismatches = []
+    for item in corpus:
+        expected = (item["task"], item["date_part"])
+        got = extract_task_and_date(item["text"])
+        legacy = legacy_command.extract_task_and_date(item["text"])
+        if got != expected or legacy != expected:
+            mismatches.append((item["text"], expected, got, legacy))
+    return mismatches
+
+
+def commands_per_second(fn, texts, seconds):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        for text in texts:
+            fn(text)
+        count += len(texts)
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    mismatches = check_parity(corpus)
+    for text, expected, got, legacy in mismatches:
+        print(f"❌ {text!r}: ожидалось {expected}, грамматика {got}, regex {legacy}")
+    print(f"Совпадение: {len(corpus) - len(mismatches)}/{len(corpus)}")
+
+    texts = [item["text"] for item in corpus]
+    new_rate = commands_per_second(extract_task_and_date, texts, args.seconds)
+    old_rate = commands_per_second(legacy_command.extract_task_and_date, texts, args.seconds)
+    print(f"Грамматика: {new_rate:,.0f} команд/с")
+    print(f"Каскад regex: {old_rate:,.0f} команд/с (ускорение x{new_rate / old_rate:.2f})")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
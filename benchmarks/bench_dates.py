@@ -0,0 +1,63 @@
+"""Задержка разбора дат: быстрый путь с LRU-кэшем против одного dateparser.
+
+    python -m benchmarks.bench_dates --rounds 20
+"""
+import time
+import argparse
+from app.command import preprocess_date
+from app.dates import resolve_date, clear_date_cache, date_cache_stats
+from benchmarks.bench_command import load_corpus
+from benchmarks.common import summarize
+
+EXTRA_DATES = [
+    "завтра", "послезавтра", "сегодня", "в пятницу в 10", "15 марта в 14:30", "через 2 часа",
+    "через неделю", "завтра в 7 утра", "в 10 вечера", "к понедельнику", "1 июля"
+]
+
+
+def load_dates():
+    dates = [item["date_part"] for item in load_corpus() if item["date_part"]]
+    return [preprocess_date(text) for text in dates + EXTRA_DATES]
+
+
+def timed(fn, texts, rounds, before_each=None):
+    samples = []
+    for _ in range(rounds):
+        for text in texts:
+            if before_each:
+                before_each()
+            started = time.perf_counter()
+            fn(text)
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def dateparser_only(text):
+    import dateparser
+    return dateparser.parse(text, languages=["ru"], settings={"TIMEZONE": "Europe/Moscow", "RETURN_AS_TIMEZONE_AWARE": True})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    texts = load_dates()
+    dateparser_only("завтра")  # загрузка языковых данных не входит в замер
+
+    results = {
+        "dateparser": timed(dateparser_only, texts, args.rounds),
+        "resolver, холодный кэш": timed(resolve_date, texts, args.rounds, before_each=clear_date_cache),
+    }
+    clear_date_cache()
+    results["resolver, теплый кэш"] = timed(resolve_date, texts, args.rounds)
+
+    print(f"Строк с датами: {len(texts)}, повторов: {args.rounds}")
+    for name, samples in results.items():
+        stats = summarize(samples)
+        print(f"{name:24} p50={stats['p50_ms']:.3f} мс  p95={stats['p95_ms']:.3f} мс  p99={stats['p99_ms']:.3f} мс")
+    print(f"Кэш: {date_cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
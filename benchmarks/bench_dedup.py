@@ -0,0 +1,117 @@
+"""Подавление повторов на локальных заглушках Notion и Calendar.
+
+    python -m benchmarks.bench_dedup --commands 200 --repeat-ratio 0.3
+
+Поток команд содержит точные повторы (Vosk вернул фразу дважды), похожие
+повторы (другое окончание или «ё») и задачи, уже созданные в Notion до
+запуска. Индекс прогревается постраничным запросом к базе Notion. Проверяется,
+что в заглушках не осталось дублей и ни одна новая задача не была подавлена;
+сравнивается число запросов к API без индекса и с ним и время проверки.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from benchmarks.common import summarize
+from benchmarks.mock_servers import MockNotionServer, MockCalendarServer, use_mock_sinks
+
+WORDS = ("отчёт", "созвон", "встреча", "план", "бюджет", "ревью", "почта", "звонок", "договор", "презентация",
+         "продажи", "команда", "клиент", "поставщик", "квартал", "релиз", "дизайн", "счёт", "аудит", "обучение")
+# Похожий повтор: так Vosk иногда расслышивает ту же фразу
+VARIANTS = {"отчёт": "отчет", "продажи": "продаж", "команда": "командой", "счёт": "счет", "клиент": "клиента"}
+
+
+def make_workload(rng, count, repeat_ratio, existing):
+    start = datetime(2030, 1, 1, 10, 0).astimezone()
+    unique, commands = [], []
+    while len(commands) < count:
+        if unique and rng.random() < repeat_ratio:
+            name, due = rng.choice(unique)
+            if rng.random() < 0.5:
+                name = " ".join(VARIANTS.get(word, word) for word in name.split())
+            commands.append((name, due, False))
+        elif existing and rng.random() < 0.1:
+            commands.append((existing.pop(), None, False))
+        else:
+            name = " ".join(rng.sample(WORDS, 3))
+            due = start + timedelta(hours=rng.randrange(500))
+            unique.append((name, due))
+            commands.append((name, due, True))
+    return commands
+
+
+def run(commands):
+    from app.notion import create_notion_task
+    from app.google_calendar import create_calendar_event
+    for name, due, _ in commands:
+        create_notion_task(name, due)
+        if due is not None:
+            create_calendar_event(name, due)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=200)
+    parser.add_argument("--repeat-ratio", type=float, default=0.3)
+    parser.add_argument("--existing", type=int, default=250, help="задач в Notion до запуска")
+    parser.add_argument("--entries", type=int, default=10000, help="записей в индексе для замера проверки")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    workdir = tempfile.mkdtemp()
+    os.environ["DEDUP_PATH"] = os.path.join(workdir, "dedup.db")
+    existing = [f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}" for i in range(args.existing)]
+    commands = make_workload(rng, args.commands, args.repeat_ratio, list(existing))
+    expected = sum(1 for _, _, new in commands if new)
+
+    counts = {}
+    with MockNotionServer() as notion, MockCalendarServer() as calendar:
+        use_mock_sinks(notion, calendar)
+        from app import dedup
+        for mode in ("без индекса", "с индексом"):
+            notion.pages, calendar.events = [], []
+            for name in existing:
+                notion.create_page({"properties": {"Name": {"title": [{"text": {"content": name}}]}}})
+            notion.requests = calendar.requests = 0
+            if mode == "с индексом":
+                index = dedup.open_dedup_index()
+                warmed = dedup.warm_from_notion()
+                print(f"Прогрев из Notion: {warmed} задач за {notion.requests} запросов")
+            run(commands)
+            pages = len(notion.pages) - len(existing)
+            counts[mode] = (notion.requests, calendar.requests, pages, len(calendar.events))
+            if mode == "с индексом":
+                print(f"Повторы: {index.report()}")
+                dedup.close_dedup_index()
+
+    for mode, (notion_requests, calendar_requests, pages, events) in counts.items():
+        print(f"{mode}: запросов Notion {notion_requests}, Calendar {calendar_requests}; "
+              f"создано задач {pages}, событий {events}")
+    pages, events = counts["с индексом"][2:]
+    dated = sum(1 for _, due, new in commands if new and due is not None)
+    ok = pages == expected and events == dated
+    print(f"{'✅' if ok else '❌'} Без дублей и без лишних подавлений: задач {pages} из {expected}, "
+          f"событий {events} из {dated}")
+
+    from app.dedup import DedupIndex
+    index = DedupIndex(os.path.join(workdir, "timing.db"))
+    start = datetime(2030, 1, 1).astimezone()
+    for i in range(args.entries):
+        index.confirm("calendar", " ".join(rng.sample(WORDS, 3)) + f" {i}", start + timedelta(hours=i % 1000))
+    timings = []
+    for i in range(2000):
+        name, due = " ".join(rng.sample(WORDS, 3)) + f" {rng.randrange(2 * args.entries)}", start
+        started = time.perf_counter()
+        if index.claim("calendar", name, due) is None:
+            index.release("calendar", name, due)
+        timings.append(time.perf_counter() - started)
+    print(f"Проверка при {len(index)} записях: {summarize(timings)}")
+    index.close()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Время от команды до результата: Notion и Calendar по очереди против Dispatcher.
+
+    python -m benchmarks.bench_dispatch --commands 20 --notion-latency 0.3 --calendar-latency 0.2
+"""
+import time
+import argparse
+from datetime import datetime, timedelta
+from benchmarks.common import summarize
+from benchmarks.mock_servers import MockNotionServer, MockCalendarServer, use_mock_sinks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=20)
+    parser.add_argument("--notion-latency", type=float, default=0.3, help="задержка заглушки Notion, с")
+    parser.add_argument("--calendar-latency", type=float, default=0.2, help="задержка заглушки Calendar, с")
+    args = parser.parse_args()
+
+    with MockNotionServer(latency=args.notion_latency) as notion, \
+            MockCalendarServer(latency=args.calendar_latency) as calendar:
+        use_mock_sinks(notion, calendar)
+        from app.notion import create_notion_task
+        from app.google_calendar import create_calendar_event
+        from app.dispatch import create_dispatcher
+
+        start = datetime(2030, 1, 1, 10, 0)
+        commands = [
+            {"task": f"Задача {i}", "due": start + timedelta(hours=i), "start": start + timedelta(hours=i)}
+            for i in range(args.commands)
+        ]
+
+        # Прогрев соединений, чтобы оба варианта шли по открытым сокетам
+        create_notion_task("прогрев")
+        create_calendar_event("прогрев", start)
+
+        sequential = []
+        for command in commands:
+            started = time.perf_counter()
+            create_notion_task(command["task"], command["due"])
+            create_calendar_event(command["task"], command["start"])
+            sequential.append(time.perf_counter() - started)
+
+        dispatcher = create_dispatcher()
+        concurrent = []
+        for command in commands:
+            started = time.perf_counter()
+            results = dispatcher.dispatch(command).result()
+            concurrent.append(time.perf_counter() - started)
+        dispatcher.shutdown()
+
+    ok = sum(1 for result in results.values() if result["success"])
+    print(f"Команд: {args.commands}, Notion {1000 * args.notion_latency:.0f} мс, "
+          f"Calendar {1000 * args.calendar_latency:.0f} мс")
+    print(f"По очереди: {summarize(sequential)}")
+    print(f"Dispatcher: {summarize(concurrent)}, успешно в последней команде {ok} из {len(results)}")
+
+
+if __name__ == "__main__":
+    main()
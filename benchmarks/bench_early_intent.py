@@ -0,0 +1,179 @@
+"""Задержка от конца речи до созданной задачи с досрочным завершением фразы и без него.
+
+    python -m benchmarks.bench_early_intent                      # имитация частичных результатов по корпусу
+    python -m benchmarks.bench_early_intent --audio fixtures/ --model models/ru/vosk-model-small-ru-0.22
+
+Звук подается в AudioCapture.feed в модельном реальном времени: блок,
+заканчивающийся на позиции p, доступен не раньше p секунд от начала записи,
+а декодирование сдвигает часы на фактически затраченное время. Задержка —
+от конца речи до ответа заглушек Notion и Calendar.
+
+С --audio нужен manifest.jsonl как у benchmarks.suite; конец речи берется из
+поля speech_end (секунды) или по энергии последнего громкого кадра, после записи
+добавляется --pad секунд тишины. Без --audio распознаватель имитируется: слова
+корпуса появляются в частичном результате каждые --word-ms мс, а окончательный
+результат Vosk приходит через --endpoint-ms мс после последнего слова.
+"""
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import numpy as np
+from benchmarks.common import SAMPLE_RATE, summarize
+from benchmarks.mock_servers import MockNotionServer, MockCalendarServer, use_mock_sinks
+from benchmarks.suite import load_corpus, load_audio
+
+FRAMES_PER_BUFFER = 4096
+
+
+class ScriptedRecognizer:
+    """Имитация KaldiRecognizer: слова фразы открываются по одному каждые word_ms"""
+
+    def __init__(self, text, word_ms, endpoint_ms):
+        self.words = text.split()
+        self.word = word_ms / 1000
+        self.endpoint = len(self.words) * self.word + endpoint_ms / 1000
+        self.position = 0.0
+        self.done = False
+
+    def _visible(self):
+        return " ".join(self.words[:int(self.position / self.word) + 1])
+
+    def AcceptWaveform(self, data):
+        self.position += len(data) / (2 * SAMPLE_RATE)
+        return not self.done and self.position >= self.endpoint
+
+    def PartialResult(self):
+        return json.dumps({"partial": "" if self.done else self._visible()})
+
+    def Result(self):
+        return self.FinalResult()
+
+    def FinalResult(self):
+        text = "" if self.done else self._visible()
+        self.done = True
+        return json.dumps({"text": text})
+
+
+def read_wav(path):
+    with wave.open(path, "rb") as f:
+        if f.getframerate() != SAMPLE_RATE or f.getnchannels() != 1 or f.getsampwidth() != 2:
+            raise ValueError(f"{path}: нужен WAV 16 кГц, моно, 16 бит")
+        return np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+
+
+def speech_end(samples, frame_ms=20, threshold=3.0):
+    """Конец последнего кадра, энергия которого в threshold раз выше шума"""
+    frame = SAMPLE_RATE * frame_ms // 1000
+    frames = samples[:len(samples) // frame * frame].reshape(-1, frame).astype(np.float32)
+    energy = np.mean(frames * frames, axis=1)
+    floor = max(float(np.percentile(energy, 10)), 100.0)
+    loud = np.flatnonzero(energy > threshold * floor)
+    return (loud[-1] + 1) * frame / SAMPLE_RATE if len(loud) else len(samples) / SAMPLE_RATE
+
+
+def stream(capture, recognizer, data):
+    """Подает звук блоками; возвращает (фраза, модельное время ее готовности, с)"""
+    step = FRAMES_PER_BUFFER * 2
+    clock = 0.0
+    for offset in range(0, len(data), step):
+        chunk = data[offset:offset + step]
+        clock = max(clock, (offset + len(chunk)) / (2 * SAMPLE_RATE))
+        started = time.perf_counter()
+        capture.feed(recognizer, chunk)
+        clock += time.perf_counter() - started
+        if not capture.utterances.empty():
+            return capture.utterances.get(), clock
+    capture._emit(recognizer.FinalResult())
+    return (capture.utterances.get() if not capture.utterances.empty() else None), clock
+
+
+def run(items, args, early):
+    """Задержки от конца речи до ответа получателей для всех фраз"""
+    from app.capture import AudioCapture
+    from app.command import parse_command
+    from app.dispatch import create_dispatcher
+    from app.intent import EarlyIntent
+    from app.speech import create_vad, get_model
+
+    dispatcher = create_dispatcher()
+    # Интервал 0: прогрев на каждой фразе, как будто между командами прошло много времени
+    dispatcher.prewarm_interval = 0
+    model = get_model() if args.audio else None
+    latencies = []
+    outcome = {"utterances": len(items), "early": 0, "changed": 0, "delivered": 0}
+
+    for item in items:
+        intent = EarlyIntent(args.stable_ms, on_verb=dispatcher.prewarm) if early else None
+        if args.audio:
+            samples = read_wav(item["file"])
+            end = item.get("speech_end") or speech_end(samples)
+            data = samples.tobytes() + bytes(int(args.pad * SAMPLE_RATE) * 2)
+            capture = AudioCapture(model, vad=None if args.no_vad else create_vad(), intent=intent)
+            recognizer = capture.create_recognizer()
+        else:
+            recognizer = ScriptedRecognizer(item["text"], args.word_ms, args.endpoint_ms)
+            end = len(recognizer.words) * args.word_ms / 1000
+            data = bytes(int((recognizer.endpoint + args.pad) * SAMPLE_RATE) * 2)
+            capture = AudioCapture(None, intent=intent)
+
+        utterance, ready = stream(capture, recognizer, data)
+        if utterance is None:
+            continue
+        outcome["early"] += utterance.early
+        # Досрочно завершенная фраза не должна отличаться от полной
+        outcome["changed"] += utterance.text != item["text"]
+
+        started = time.perf_counter()
+        parsed = parse_command(utterance.text, item["now"])
+        if parsed:
+            due = parsed.get("due")
+            start = due[0] if isinstance(due, tuple) else due
+            results = dispatcher.dispatch({"task": parsed["task"], "due": due, "start": start}).result()
+            outcome["delivered"] += all(result["success"] for result in results.values())
+        latencies.append(max(0.0, ready - end) + time.perf_counter() - started)
+
+    dispatcher.shutdown()
+    return latencies, outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--audio", help="папка с WAV и manifest.jsonl")
+    parser.add_argument("--model", default=os.path.join("models", "ru", "vosk-model-small-ru-0.22"))
+    parser.add_argument("--no-vad", action="store_true", help="подавать звук в Vosk без детектора речи")
+    parser.add_argument("--pad", type=float, default=2.0, help="тишина после записи, с")
+    parser.add_argument("--stable-ms", type=int, default=300, help="окно стабильности гипотезы")
+    parser.add_argument("--word-ms", type=int, default=350, help="темп речи в имитации")
+    parser.add_argument("--endpoint-ms", type=int, default=800, help="пауза до конца фразы Vosk в имитации")
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа заглушек, с")
+    args = parser.parse_args()
+
+    if args.audio:
+        items = load_audio(args.audio)
+    else:
+        items = [item for item in load_corpus() if item["due"]]
+
+    with MockNotionServer(latency=args.latency) as notion, MockCalendarServer(latency=args.latency) as calendar:
+        use_mock_sinks(notion, calendar)
+        if args.audio:
+            from app import speech
+            speech.MODEL_PATH = args.model
+        report = {}
+        for name, early in (("final", False), ("early", True)):
+            latencies, outcome = run(items, args, early)
+            report[name] = dict(summarize(latencies), **outcome)
+
+    for name, stats in report.items():
+        print(f"{name:6} p50={stats['p50_ms']:8.1f} мс  p95={stats['p95_ms']:8.1f} мс  "
+              f"досрочно {stats['early']}/{stats['utterances']}, изменился текст {stats['changed']}, "
+              f"доставлено {stats['delivered']}")
+    saved = report["final"]["p50_ms"] - report["early"]["p50_ms"]
+    print(f"Выигрыш p50: {saved:.1f} мс")
+    return 1 if report["early"]["changed"] > report["final"]["changed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Скорость и точность распознавания по грамматике команды и с открытым словарем.
+
+    python -m benchmarks.bench_grammar                        # покрытие корпуса грамматикой
+    python -m benchmarks.bench_grammar --audio records/ --model models/ru/vosk-model-small-ru-0.22
+    python -m benchmarks.bench_grammar --audio records/ --model models/ru/vosk-model-small-ru-0.22 \\
+        --model models/ru/vosk-model-ru-0.42 --lexicon task_lexicon.txt
+
+Для каждой модели файлы из manifest.jsonl (как у benchmarks.suite) распознаются
+без грамматики и с ней, если модель ее поддерживает. Печатаются коэффициент
+реального времени (процессорное время / длительность звука), WER, доля фраз
+с повторным проходом открытым словарем и доля команд, разобранных так же, как
+эталонный текст. Без --audio печатается только покрытие слов корпуса
+грамматикой: чем оно выше, тем реже нужен повторный проход.
+"""
+import sys
+import json
+import time
+import argparse
+from benchmarks.common import word_errors
+from benchmarks.suite import load_corpus, load_audio
+from app.grammar import build_grammar, load_lexicon, model_words, supports_grammar, UNK
+
+
+def coverage(corpus, grammar):
+    """Доля слов корпуса в грамматике и доля фраз, целиком покрытых ею"""
+    vocabulary = set(grammar) - {UNK}
+    words = covered = full = 0
+    for item in corpus:
+        text = item["text"].lower().split()
+        hits = sum(word in vocabulary for word in text)
+        words += len(text)
+        covered += hits
+        full += hits == len(text)
+    return covered / words if words else 0.0, full / len(corpus) if corpus else 0.0
+
+
+def decode(model, path, grammar):
+    """Распознает файл; возвращает (текст, процессорное время, длительность, был ли повторный проход)"""
+    import vosk
+    from app.grammar import GrammarRecognizer
+    from app.transcribe import read_chunks
+
+    rate, duration, chunks = read_chunks(path)
+    started = time.process_time()
+    recognizer = GrammarRecognizer(model, rate, grammar) if grammar else vosk.KaldiRecognizer(model, rate)
+    parts = []
+    for data in chunks:
+        if recognizer.AcceptWaveform(data):
+            parts.append(json.loads(recognizer.Result()).get("text", ""))
+    parts.append(json.loads(recognizer.FinalResult()).get("text", ""))
+    cpu = time.process_time() - started
+    return " ".join(part for part in parts if part), cpu, duration, bool(getattr(recognizer, "fallbacks", 0))
+
+
+def evaluate(model, items, grammar):
+    from app.command import parse_command
+
+    cpu = audio = errors = words = fallbacks = commands = matched = 0
+    for item in items:
+        text, seconds, duration, fallback = decode(model, item["file"], grammar)
+        cpu += seconds
+        audio += duration
+        fallbacks += fallback
+        item_errors, item_words = word_errors(item["text"].lower(), text)
+        errors += item_errors
+        words += item_words
+
+        expected = parse_command(item["text"], item["now"])
+        if expected:
+            commands += 1
+            matched += parse_command(text, item["now"]) == expected
+    return {
+        "rtf": round(cpu / audio, 4) if audio else 0.0,
+        "wer": round(errors / words, 4) if words else 0.0,
+        "fallback_rate": round(fallbacks / len(items), 3) if items else 0.0,
+        "command_accuracy": round(matched / commands, 3) if commands else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--audio", help="папка с WAV и manifest.jsonl")
+    parser.add_argument("--model", action="append", help="путь к модели Vosk (можно несколько; по умолчанию VOSK_MODEL)")
+    parser.add_argument("--lexicon", help="словарь названий задач")
+    args = parser.parse_args()
+
+    lexicon = load_lexicon(args.lexicon)
+    corpus = load_corpus()
+    grammar = build_grammar(lexicon)
+    words, phrases = coverage(corpus, grammar)
+    print(f"Грамматика: {len(grammar)} слов, словарь задач: {len(lexicon)} названий")
+    print(f"Покрытие корпуса: слов {100 * words:.1f}%, фраз целиком {100 * phrases:.1f}%")
+    if not args.audio:
+        return 0
+
+    import vosk
+    vosk.SetLogLevel(-1)
+    items = load_audio(args.audio)
+    from app.speech import MODEL_PATH
+    for path in args.model or [MODEL_PATH]:
+        model = vosk.Model(path)
+        modes = [("open", None)]
+        if supports_grammar(path):
+            modes.append(("grammar", build_grammar(lexicon, model_words(path))))
+        else:
+            print(f"⚠️ {path}: модель не поддерживает грамматику")
+        for name, model_grammar in modes:
+            report = evaluate(model, items, model_grammar)
+            print(f"{path} [{name}]: RTF={report['rtf']:.4f}  WER={100 * report['wer']:.1f}%  "
+                  f"повторных проходов {100 * report['fallback_rate']:.0f}%  "
+                  f"команд верно {100 * report['command_accuracy']:.1f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Массовый импорт команд на локальных заглушках Notion и Calendar.
+
+    python -m benchmarks.bench_import --lines 5000 --notion-latency 0.05 --calendar-latency 0.05
+    python -m benchmarks.bench_import --memory-lines 1000000
+
+Файл собирается из корпуса benchmarks/corpus/commands_v2.jsonl (строки JSONL
+с now и обычный текст) с примесью строк без команды. Замеряется скорость
+разбора одним процессом и пулом, затем импорт прерывается на середине и
+продолжается с отметки: в отчете каждая строка должна быть ровно один раз, а
+в заглушках — ни одной лишней задачи или события. С --memory-lines
+проверяется, что пиковая память разбора не растет с длиной файла.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from benchmarks.mock_servers import MockNotionServer, MockCalendarServer, use_mock_sinks
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus", "commands_v2.jsonl")
+
+
+def write_input(path, count):
+    with open(CORPUS, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f]
+    with open(path, "w", encoding="utf-8") as out:
+        for i in range(count):
+            item = corpus[i % len(corpus)]
+            if i % 20 == 19:
+                out.write(f"строка переписки без команды номер {i}\n")
+            elif i % 2:
+                out.write(json.dumps({"text": item["text"], "now": item["now"]}, ensure_ascii=False) + "\n")
+            else:
+                out.write(item["text"] + "\n")
+
+
+def read_report(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def dry_run(path, report, workers):
+    from app.importer import import_file
+    return import_file(path, report, workers=workers, dry_run=True, now="2030-01-15T10:00:00+03:00")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--notion-latency", type=float, default=0.05, help="задержка заглушки Notion, с")
+    parser.add_argument("--calendar-latency", type=float, default=0.05, help="задержка заглушки Calendar, с")
+    parser.add_argument("--memory-lines", type=int, help="строк для замера памяти разбора")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    source = os.path.join(workdir, "commands.txt")
+    report = os.path.join(workdir, "report.jsonl")
+    write_input(source, args.lines)
+
+    with MockNotionServer(latency=args.notion_latency) as notion, \
+            MockCalendarServer(latency=args.calendar_latency) as calendar:
+        use_mock_sinks(notion, calendar)
+        from app.importer import import_file
+
+        for workers in sorted({1, args.workers}):
+            summary = dry_run(source, report, workers)
+            print(f"Разбор, процессов {workers}: {summary['lines_per_second']:.0f} строк/с")
+
+        half = args.lines // 2
+        first = import_file(source, report, workers=args.workers, limit=half)
+        print(f"Импорт прерван после {first['lines']} строк")
+        second = import_file(source, report, workers=args.workers, resume=True)
+        seconds = first["seconds"] + second["seconds"]
+        print(f"Импорт продолжен: еще {second['lines']} строк; всего {args.lines / seconds:.0f} строк/с, "
+              f"{(first.get('commands', 0) + second.get('commands', 0)) / seconds:.0f} команд/с")
+
+        entries = read_report(report)
+        commands = [command for entry in entries for command in entry["commands"]]
+        dated = [command for command in commands if command["start"]]
+        failed = sum(1 for entry in entries if entry["status"] in ("failed", "error"))
+        ok = ([entry["line"] for entry in entries] == list(range(1, args.lines + 1))
+              and len(notion.pages) == len(commands) and len(calendar.events) == len(dated) and not failed
+              and not os.path.exists(report + ".checkpoint"))
+        print(f"{'✅' if ok else '❌'} Отчет: {len(entries)} строк из {args.lines}, ошибок {failed}; "
+              f"задач {len(notion.pages)} из {len(commands)}, событий {len(calendar.events)} из {len(dated)}")
+
+        if args.memory_lines:
+            for count in (args.memory_lines // 10, args.memory_lines):
+                write_input(source, count)
+                tracemalloc.start()
+                started = time.perf_counter()
+                dry_run(source, report, args.workers)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"Разбор {count} строк: {time.perf_counter() - started:.1f} с, "
+                      f"пик памяти {peak / 2 ** 20:.1f} МБ, файл {os.path.getsize(source) / 2 ** 20:.1f} МБ")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
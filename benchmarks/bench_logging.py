@@ -0,0 +1,124 @@
+"""Задержка главного цикла на логировании: синхронный FileHandler и очередь app.logs на медленном диске.
+
+    python -m benchmarks.bench_logging --commands 200 --disk-latency 5
+
+На каждую команду пишутся те же записи, что в боте: разбор (parse_command),
+создание задачи Notion и события календаря, а также --chunk-messages
+одинаковых сообщений из одного места (как ошибка на каждом блоке звука).
+Диск имитируется потоком, у которого каждый flush ждет --disk-latency мс.
+Сравнивается время команды в вызывающем потоке без обработчиков лога,
+с прежней настройкой (FileHandler + консоль) и с setup_logging; затем
+проверяется, что все записи команд дошли до файла в JSON с command_id, а
+частые однотипные ограничены RateLimitFilter.
+"""
+import io
+import sys
+import json
+import time
+import logging
+import argparse
+from benchmarks.common import summarize
+from benchmarks.suite import load_corpus
+
+
+class SlowStream(io.StringIO):
+    """Поток, запись на «диск» которого (flush) занимает latency секунд"""
+
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+        time.sleep(self.latency)
+
+
+def run_commands(items, chunk_messages):
+    """Записи лога одной команды в том же порядке, что в боте; возвращает длительности команд"""
+    from app import logs
+    from app.command import parse_command
+    notion, calendar, capture = (logging.getLogger(name) for name in ("NotionClient", "GoogleCalendar", "AudioCapture"))
+    durations = []
+    for number, item in enumerate(items):
+        started = time.perf_counter()
+        with logs.command_context(f"bench-{number}"):
+            for _ in range(chunk_messages):
+                capture.error("Ошибка распознавания речи: блок звука пропущен", extra=logs.NOISY)
+            parsed = parse_command(item["text"], item["now"]) or {"task": item["text"]}
+            notion.info("Создаю задачу в Notion: '%s'", parsed["task"])
+            notion.info("✅ Задача успешно создана в Notion")
+            calendar.info("Создаю событие в Google Calendar: '%s' на %s", parsed["task"], item["now"])
+            calendar.info("✅ Событие создано: %s", "https://calendar.google.com/event?eid=bench")
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def sync_setup(stream):
+    """Прежняя настройка run.py: FileHandler и StreamHandler в вызывающем потоке"""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    for target in (stream, io.StringIO()):
+        handler = logging.StreamHandler(target)
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=200)
+    parser.add_argument("--disk-latency", type=float, default=5.0, help="задержка flush, мс")
+    parser.add_argument("--chunk-messages", type=int, default=20, help="шумных сообщений на команду")
+    args = parser.parse_args()
+
+    from app import logs
+    corpus = load_corpus()
+    items = [corpus[i % len(corpus)] for i in range(args.commands)]
+    latency = args.disk_latency / 1000
+    run_commands(items[:20], 0)  # прогрев dateparser и кэша дат
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.NullHandler())
+    baseline = run_commands(items, args.chunk_messages)
+
+    sync_stream = SlowStream(latency)
+    sync_setup(sync_stream)
+    sync = run_commands(items, args.chunk_messages)
+
+    queue_stream = SlowStream(latency)
+    logs.setup_logging(console=False, file_handler=logging.StreamHandler(queue_stream))
+    started = time.perf_counter()
+    queued = run_commands(items, args.chunk_messages)
+    loop_seconds = time.perf_counter() - started
+    logs.stop_logging()
+    drain_seconds = time.perf_counter() - started - loop_seconds
+
+    records = [json.loads(line) for line in queue_stream.getvalue().splitlines()]
+    noisy = [record for record in records if record["logger"] == "AudioCapture"]
+    with_id = sum(1 for record in records if record.get("command_id", "").startswith("bench-"))
+    parsed_lines = sum(1 for record in records if record["logger"] == "CommandParser")
+
+    print(f"Без обработчиков:       {summarize(baseline)}")
+    print(f"FileHandler (синхронно): {summarize(sync)}")
+    print(f"Очередь app.logs:        {summarize(queued)}")
+    overhead_sync = (sum(sync) - sum(baseline)) / len(items) * 1000
+    overhead_queue = (sum(queued) - sum(baseline)) / len(items) * 1000
+    print(f"Накладные расходы на команду: синхронно {overhead_sync:.2f} мс, через очередь {overhead_queue:.3f} мс")
+    print(f"Запись очереди на диск заняла еще {drain_seconds:.2f} с после цикла ({queue_stream.flushes} flush)")
+
+    # Записи команд не теряются, все помечены command_id, а шумные ограничены фильтром
+    ok = len(records) - len(noisy) - parsed_lines == args.commands * 4 and with_id == len(records)
+    ok &= len(noisy) < args.commands * args.chunk_messages or args.chunk_messages == 0
+    print(f"{'✅' if ok else '❌'} Записей в JSON: {len(records)} (с command_id: {with_id}), "
+          f"частых однотипных: {len(noisy)} из {args.commands * args.chunk_messages}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""Накладные расходы метрик на parse_command: без обертки, метрики выключены, включены.
+
+    python -m benchmarks.bench_metrics --rounds 50
+"""
+import os
+import time
+import tempfile
+import argparse
+import urllib.request
+from app import metrics
+from app.command import parse_command
+from benchmarks.suite import load_corpus
+
+
+def per_call_us(fn, calls, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for args in calls:
+            fn(*args)
+    return 1e6 * (time.perf_counter() - started) / (rounds * len(calls))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    calls = [(item["text"], item["now"]) for item in load_corpus()]
+    per_call_us(parse_command, calls, 1)  # прогрев кэша дат и dateparser
+
+    raw = per_call_us(parse_command.__wrapped__, calls, args.rounds)
+    disabled = per_call_us(parse_command, calls, args.rounds)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        trace_path = os.path.join(workdir, "trace.jsonl")
+        metrics.configure(port=0, trace_path=trace_path)
+        traced = per_call_us(parse_command, calls, args.rounds)
+        metrics.shutdown()
+        with open(trace_path, encoding="utf-8") as f:
+            lines = sum(1 for _ in f)
+
+    metrics.configure(port=19108)
+    enabled = per_call_us(parse_command, calls, args.rounds)
+    body = urllib.request.urlopen("http://127.0.0.1:19108/metrics").read().decode("utf-8")
+    metrics.shutdown()
+
+    print(f"Без обертки:              {raw:7.2f} мкс/вызов")
+    print(f"Метрики выключены:        {disabled:7.2f} мкс/вызов (+{disabled - raw:.2f})")
+    print(f"Гистограммы:              {enabled:7.2f} мкс/вызов (+{enabled - raw:.2f})")
+    print(f"Гистограммы + трассировка: {traced:7.2f} мкс/вызов (+{traced - raw:.2f}), строк: {lines}")
+    print("\n".join(line for line in body.splitlines() if 'stage="parse"' in line and "_bucket" not in line))
+
+
+if __name__ == "__main__":
+    main()
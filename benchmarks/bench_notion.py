@@ -0,0 +1,57 @@
+"""Создание задач на локальной заглушке Notion API: requests.post на каждую задачу,
+NotionClient последовательно и create_tasks_bulk.
+
+    python -m benchmarks.bench_notion --tasks 30 --latency 0.1 --rate 3
+"""
+import os
+import time
+import argparse
+from benchmarks.mock_servers import MockNotionServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.1, help="задержка ответа заглушки, с")
+    parser.add_argument("--rate", type=float, default=3, help="лимит клиента, запросов в секунду (0 — без лимита)")
+    parser.add_argument("--server-rate", type=int, default=0, help="лимит заглушки; сверх него она отвечает 429")
+    args = parser.parse_args()
+
+    with MockNotionServer(latency=args.latency, rate_limit=args.server_rate) as server:
+        os.environ["NOTION_API_URL"] = server.url
+        os.environ.setdefault("NOTION_API_KEY", "bench")
+        os.environ.setdefault("DATABASE_ID", "bench")
+        import requests
+        from app.notion import NotionClient
+
+        names = [f"Задача {i}" for i in range(args.tasks)]
+        client = NotionClient(base_url=server.url, rate_limit=args.rate)
+        headers = dict(client.session.headers)
+
+        # Как было раньше: новое соединение и никаких повторов на каждую задачу
+        started = time.perf_counter()
+        legacy_ok = 0
+        for name in names:
+            response = requests.post(server.url + "/pages", headers=headers, json=client.build_page(name))
+            legacy_ok += response.status_code == 200
+        legacy = time.perf_counter() - started
+
+        started = time.perf_counter()
+        sequential_ok = sum(1 for name in names if client.create_task(name))
+        sequential = time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = client.create_tasks_bulk(names)
+        bulk = time.perf_counter() - started
+        bulk_ok = sum(1 for result in results if result["success"])
+        client.close()
+
+    print(f"Задач: {args.tasks}, задержка заглушки: {1000 * args.latency:.0f} мс, лимит клиента: {args.rate or 'нет'}")
+    print(f"requests.post на задачу: {legacy:.2f} с ({1000 * legacy / args.tasks:.1f} мс/задача), успешно {legacy_ok}")
+    print(f"NotionClient по одной:   {sequential:.2f} с ({1000 * sequential / args.tasks:.1f} мс/задача), успешно {sequential_ok}")
+    print(f"create_tasks_bulk:       {bulk:.2f} с ({1000 * bulk / args.tasks:.1f} мс/задача), успешно {bulk_ok}")
+    print(f"Ответов 429 от заглушки: {server.throttled}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Пропускная способность нормализации числительных: один проход по автомату
+против цикла str.replace по словарю.
+
+    python -m benchmarks.bench_numerals --seconds 1
+"""
+import time
+import argparse
+from app.numerals import NUMERAL_TRIE, normalize_numerals, _numeral_phrases
+
+SAMPLES = [
+    "двадцать первое мая", "первое марта в десять тридцать", "завтра в половине третьего",
+    "тридцать первое декабря две тысячи двадцать шестого года", "через два часа",
+    "пятнадцатого апреля в семь часов вечера", "в пятницу в девять ноль пять", "послезавтра",
+]
+
+# Исходный цикл из preprocess_date (35 замен)
+LEGACY_REPLACEMENTS = {
+    "первое": "1", "второе": "2", "третье": "3", "четвертое": "4", "пятое": "5",
+    "шестое": "6", "седьмое": "7", "восьмое": "8", "девятое": "9", "десятое": "10",
+    "одиннадцатое": "11", "двенадцатое": "12", "тринадцатое": "13", "четырнадцатое": "14",
+    "пятнадцатое": "15", "шестнадцатое": "16", "семнадцатое": "17", "восемнадцатое": "18",
+    "девятнадцатое": "19", "двадцатое": "20", "двадцать первое": "21", "двадцать второе": "22",
+    "двадцать третье": "23", "двадцать четвертое": "24", "двадцать пятое": "25", "двадцать шестое": "26",
+    "двадцать седьмое": "27", "двадцать восьмое": "28", "двадцать девятое": "29", "тридцатое": "30",
+    "тридцать первое": "31",
+    "двенадцатая": "12", "двенадцатое": "12", "двенадцатый": "12"
+}
+
+
+def replace_loop(replacements):
+    items = list(replacements.items())
+
+    def normalize(text):
+        for word, num in items:
+            text = text.replace(word, num)
+        return text
+
+    return normalize
+
+
+def strings_per_second(fn, seconds):
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        for text in SAMPLES:
+            fn(text)
+        count += len(SAMPLES)
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    # Полный словарь автомата в виде цикла замен (длинные фразы первыми)
+    phrases = sorted(_numeral_phrases(), key=lambda item: -len(" ".join(item[0])))
+    full = {" ".join(words): str(value) for words, value, _ in phrases}
+
+    print(f"Фраз в автомате: {len(full)}, слов в корне: {len(NUMERAL_TRIE)}")
+    for text in SAMPLES[:4]:
+        print(f"  {text!r} -> {normalize_numerals(text)!r}")
+    print(f"Автомат:                    {strings_per_second(normalize_numerals, args.seconds):>12,.0f} строк/с")
+    print(f"str.replace, 35 замен:      {strings_per_second(replace_loop(LEGACY_REPLACEMENTS), args.seconds):>12,.0f} строк/с")
+    print(f"str.replace, {len(full)} замен:  {strings_per_second(replace_loop(full), args.seconds):>12,.0f} строк/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Outbox при отказе сервисов: задержка подтверждения команды, доставка после
+восстановления и отсутствие дублей после падения процесса.
+
+    python -m benchmarks.bench_outbox --commands 20 --outage 2
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+from datetime import datetime, timedelta
+from benchmarks.common import summarize
+from benchmarks.mock_servers import MockNotionServer, MockCalendarServer, use_mock_sinks
+
+
+def wait_until(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return predicate()
+
+
+def check_unique(notion, calendar, names):
+    """Каждая задача ровно одна в Notion и ровно одно событие в календаре"""
+    titles = [MockNotionServer.title(page) for page in notion.pages]
+    event_ids = [event["id"] for event in calendar.events]
+    notion_ok = all(titles.count(name) == 1 for name in names)
+    calendar_ok = len(event_ids) == len(set(event_ids)) == len(names)
+    return notion_ok and calendar_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=20)
+    parser.add_argument("--outage", type=float, default=2.0, help="длительность отказа сервисов, с")
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа заглушек, с")
+    args = parser.parse_args()
+
+    with MockNotionServer(latency=args.latency) as notion, MockCalendarServer(latency=args.latency) as calendar, \
+            tempfile.TemporaryDirectory() as workdir:
+        use_mock_sinks(notion, calendar)
+        from app import notion as notion_module
+        from app.dispatch import create_dispatcher
+        from app.outbox import Outbox, OutboxWorker
+
+        # Повторы внутри клиента не нужны: их делает outbox
+        notion_module._client = notion_module.NotionClient(max_retries=0)
+
+        path = os.path.join(workdir, "outbox.db")
+        dispatcher = create_dispatcher()
+        start = datetime(2030, 1, 1, 10, 0).astimezone()
+
+        # 1. Отказ: команды подтверждаются записью на диск и доставляются после восстановления
+        notion.fail_status = calendar.fail_status = 503
+        outbox = Outbox(path)
+        worker = OutboxWorker(outbox, dispatcher, backoff_base=0.2, backoff_max=1.0).start()
+        names = [f"Задача {i}" for i in range(args.commands)]
+        acknowledge = []
+        for i, name in enumerate(names):
+            started = time.perf_counter()
+            command = {"task": name, "due": start + timedelta(hours=i), "start": start + timedelta(hours=i)}
+            outbox.enqueue(command, dispatcher.applicable(command))
+            acknowledge.append(time.perf_counter() - started)
+
+        time.sleep(args.outage)
+        failed_attempts = sum(item["attempts"] for item in outbox.items())
+        notion.fail_status = calendar.fail_status = None
+        restored = time.perf_counter()
+        delivered = wait_until(lambda: outbox.counts().get("done", 0) == 2 * len(names), 30)
+        recovery = time.perf_counter() - restored
+        worker.stop()
+        outbox_ok = delivered and check_unique(notion, calendar, names)
+
+        # 2. Падение процесса после отправки, но до отметки о доставке
+        crash_names = [f"После сбоя {i}" for i in range(5)]
+        for i, name in enumerate(crash_names):
+            command = {"task": name, "due": start + timedelta(days=i), "start": start + timedelta(days=i)}
+            outbox.enqueue(command, dispatcher.applicable(command))
+        for key, command, rows in outbox.claim(100):
+            dispatcher.dispatch(command, only={sink for _, sink, _ in rows}).result()
+        outbox.close()
+
+        outbox = Outbox(path)
+        worker = OutboxWorker(outbox, dispatcher)
+        recovered = outbox.recover()
+        worker.drain(timeout=30)
+        crash_ok = outbox.counts() == {"done": 2 * (len(names) + len(crash_names))} \
+            and check_unique(notion, calendar, names + crash_names)
+        outbox.close()
+        dispatcher.shutdown()
+
+    print(f"Команд: {args.commands}, отказ сервисов: {args.outage:.1f} с")
+    print(f"Подтверждение команды (запись в outbox): {summarize(acknowledge)}")
+    print(f"Неудачных попыток во время отказа: {failed_attempts}")
+    print(f"Доставка после восстановления: {recovery:.2f} с, без потерь и дублей: {'да' if outbox_ok else 'НЕТ'}")
+    print(f"После падения восстановлено доставок: {recovered}, дублей нет: {'да' if crash_ok else 'НЕТ'}")
+    return 0 if outbox_ok and crash_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
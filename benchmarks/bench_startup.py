@@ -0,0 +1,74 @@
+"""Регрессия времени запуска: python run.py --profile-startup в отдельных процессах
+против порогов из startup_thresholds.json.
+
+    python -m benchmarks.bench_startup [--runs 5] [--thresholds benchmarks/startup_thresholds.json]
+
+Пороги задаются для импортов до главного цикла (медиана по запускам); тяжелые
+зависимости (vosk, dateparser, googleapiclient...) не должны загружаться до прогрева.
+Код возврата 1, если порог превышен.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_thresholds.json")
+
+
+def profile_once():
+    output = subprocess.run(
+        [sys.executable, "run.py", "--profile-startup", "--json"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    # Последняя строка — JSON, выше могут быть сообщения о модели и микрофоне
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=None)
+    parser.add_argument("--thresholds", default=THRESHOLDS)
+    args = parser.parse_args()
+
+    with open(args.thresholds, encoding="utf-8") as f:
+        thresholds = json.load(f)
+    profiles = [profile_once() for _ in range(args.runs or thresholds.get("runs", 5))]
+
+    def median_ms(values):
+        return 1000 * statistics.median(values)
+
+    failures = []
+    total = median_ms([profile["imports_total"] for profile in profiles])
+    print(f"Импорт до главного цикла: {total:.1f} мс (порог {thresholds['imports_total_ms']} мс)")
+    if total > thresholds["imports_total_ms"]:
+        failures.append(f"imports_total {total:.1f} мс")
+
+    for name, limit in thresholds["imports_ms"].items():
+        value = median_ms([profile["imports"][name] for profile in profiles])
+        print(f"  {name:<28} {value:8.1f} мс (порог {limit} мс)")
+        if value > limit:
+            failures.append(f"{name} {value:.1f} мс")
+
+    heavy = sorted({name for profile in profiles for name in profile["heavy_loaded"]} - set(thresholds["heavy_loaded"]))
+    if heavy:
+        failures.append(f"до прогрева загружены: {', '.join(heavy)}")
+
+    print("Прогрев (медиана):")
+    for name in profiles[0]["warmup"]:
+        value = median_ms([profile["warmup"][name]["seconds"] for profile in profiles])
+        error = profiles[-1]["warmup"][name]["error"]
+        print(f"  {name:<28} {value:8.1f} мс" + (f" — {error}" if error else ""))
+    print(f"Готовность: {median_ms([profile['ready'] for profile in profiles]):.1f} мс")
+
+    if failures:
+        print("❌ Регрессия: " + "; ".join(failures))
+        return 1
+    print("✅ В пределах порогов")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""CPU на час почти тихого звука с детектором речи перед Vosk и без него.
+
+    python -m benchmarks.bench_vad --model models/ru/vosk-model-small-ru-0.22 --minutes 10
+"""
+import os
+import json
+import argparse
+from app.vad import VoiceActivityDetector
+from benchmarks.common import SAMPLE_RATE, cpu_seconds, synthetic_background, iter_chunks
+
+FRAMES_PER_BUFFER = 4096
+
+
+def run_ungated(model, chunks):
+    import vosk
+    recognizer = vosk.KaldiRecognizer(model, SAMPLE_RATE)
+    for data in chunks:
+        if recognizer.AcceptWaveform(data):
+            json.loads(recognizer.Result())
+        else:
+            json.loads(recognizer.PartialResult())
+    recognizer.FinalResult()
+
+
+def run_gated(model, chunks, vad):
+    recognizer = None
+    if model is not None:
+        import vosk
+        recognizer = vosk.KaldiRecognizer(model, SAMPLE_RATE)
+    for data in chunks:
+        for segment, ended in vad.process(data):
+            if recognizer is None:
+                continue
+            if segment and recognizer.AcceptWaveform(segment):
+                json.loads(recognizer.Result())
+            if ended:
+                recognizer.FinalResult()
+
+
+def per_hour(cpu, audio_seconds):
+    return cpu / audio_seconds * 3600
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=os.path.join("models", "ru", "vosk-model-small-ru-0.22"))
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--speech-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    seconds = args.minutes * 60
+    samples = synthetic_background(seconds, speech_ratio=args.speech_ratio)
+    chunks = list(iter_chunks(samples, FRAMES_PER_BUFFER))
+
+    vad = VoiceActivityDetector()
+    _, vad_cpu, _ = cpu_seconds(run_gated, None, chunks, vad)
+    passed = vad.frames_passed / max(1, vad.frames_total)
+    print(f"Аудио: {seconds:.0f} с, доля речи: {args.speech_ratio:.0%}")
+    print(f"VAD без распознавателя: {per_hour(vad_cpu, seconds):.2f} CPU-с/час, "
+          f"в распознаватель уходит {passed:.1%} кадров")
+
+    if not os.path.exists(args.model):
+        print(f"Модель {args.model} не найдена — сравнение с Vosk пропущено")
+        return
+
+    import vosk
+    vosk.SetLogLevel(-1)
+    model = vosk.Model(args.model)
+    _, ungated_cpu, _ = cpu_seconds(run_ungated, model, chunks)
+    _, gated_cpu, _ = cpu_seconds(run_gated, model, chunks, VoiceActivityDetector())
+    print(f"Vosk без VAD: {per_hour(ungated_cpu, seconds):.1f} CPU-с/час")
+    print(f"Vosk с VAD:   {per_hour(gated_cpu, seconds):.1f} CPU-с/час "
+          f"(в {ungated_cpu / max(gated_cpu, 1e-9):.1f} раза меньше)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""CPU и ложные срабатывания двухступенчатого распознавания со словом-триггером.
+
+    python -m benchmarks.bench_wakeword --minutes 30
+    python -m benchmarks.bench_wakeword --audio background/ --commands records/ --name компьютер
+
+Фоновые записи (--audio, WAV 16 кГц; без него — синтетический фон) считаются
+записями без команд: каждое срабатывание триггера на них ложное. Сравнивается
+процессорное время на час звука у полного распознавателя на всем звуке и у
+двух ступеней. С --commands (папка с manifest.jsonl, как у benchmarks.suite)
+считается доля команд, которые после триггера распознаны и разобраны.
+"""
+import os
+import sys
+import argparse
+from benchmarks.common import SAMPLE_RATE, cpu_seconds, synthetic_background, iter_chunks
+from benchmarks.suite import load_audio
+
+FRAMES_PER_BUFFER = 4096
+
+
+def file_chunks(path, pad_seconds=0.0):
+    """Блоки звука файла по FRAMES_PER_BUFFER отсчетов и pad_seconds тишины в конце"""
+    from app.transcribe import read_chunks
+    rate, _, chunks = read_chunks(path)
+    if rate != SAMPLE_RATE:
+        raise ValueError(f"{path}: нужен WAV 16 кГц")
+    data = b"".join(chunks) + bytes(int(pad_seconds * SAMPLE_RATE) * 2)
+    step = FRAMES_PER_BUFFER * 2
+    return [data[offset:offset + step] for offset in range(0, len(data), step)]
+
+
+def background_chunks(args):
+    if not args.audio:
+        samples = synthetic_background(args.minutes * 60, speech_ratio=args.speech_ratio)
+        return list(iter_chunks(samples, FRAMES_PER_BUFFER))
+
+    from app.transcribe import collect_files
+    chunks = []
+    for path in collect_files([args.audio]):
+        chunks += file_chunks(path)
+    return chunks
+
+
+def make_capture(model, args, wake):
+    from app.capture import AudioCapture
+    from app.speech import create_vad
+    from app.wakeword import WakeWordGate
+    gate = WakeWordGate(args.words.split(",") + args.name.split(), preroll_ms=args.preroll_ms) if wake else None
+    return AudioCapture(model, vad=None if args.no_vad else create_vad(), wake=gate)
+
+
+def run(capture, chunks):
+    recognizer = capture.create_recognizer()
+    for data in chunks:
+        capture.feed(recognizer, data)
+    capture._emit(recognizer.FinalResult())
+    return capture.utterances.qsize()
+
+
+def detection(model, args, items, wake):
+    """Доля команд, разобранных parse_command так же, как эталонный текст"""
+    from app.command import parse_command
+    found = 0
+    for item in items:
+        capture = make_capture(model, args, wake)
+        run(capture, file_chunks(item["file"], pad_seconds=2.0))
+        expected = parse_command(item["text"], item["now"])
+        while not capture.utterances.empty():
+            if parse_command(capture.utterances.get().text, item["now"]) == expected:
+                found += 1
+                break
+    return found / len(items) if items else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=os.path.join("models", "ru", "vosk-model-small-ru-0.22"))
+    parser.add_argument("--audio", help="WAV-файл или папка с фоновыми записями без команд")
+    parser.add_argument("--minutes", type=float, default=10, help="длительность синтетического фона")
+    parser.add_argument("--speech-ratio", type=float, default=0.3, help="доля «речи» в синтетическом фоне")
+    parser.add_argument("--commands", help="папка с записями команд и manifest.jsonl")
+    parser.add_argument("--words", default="создай,запиши", help="слова-триггеры через запятую")
+    parser.add_argument("--name", default="", help="имя бота, тоже включающее распознавание")
+    parser.add_argument("--preroll-ms", type=int, default=1000)
+    parser.add_argument("--no-vad", action="store_true", help="без детектора речи перед распознавателем")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"Модель {args.model} не найдена — бенчмарк пропущен")
+        return 1
+
+    import vosk
+    vosk.SetLogLevel(-1)
+    model = vosk.Model(args.model)
+    chunks = background_chunks(args)
+    hours = sum(len(chunk) for chunk in chunks) / (2 * SAMPLE_RATE) / 3600
+    print(f"Фон: {60 * hours:.1f} мин")
+
+    full = make_capture(model, args, wake=False)
+    junk, full_cpu, _ = cpu_seconds(run, full, chunks)
+    gated = make_capture(model, args, wake=True)
+    gated_junk, gated_cpu, _ = cpu_seconds(run, gated, chunks)
+    wake = gated.wake.stats()
+
+    print(f"Полный распознаватель: {full_cpu / hours:8.1f} CPU-с/час, фраз на фоне: {junk}")
+    print(f"Две ступени:           {gated_cpu / hours:8.1f} CPU-с/час "
+          f"(из них триггеры {wake['spot_seconds'] / hours:.1f}), фраз на фоне: {gated_junk}")
+    print(f"Ложных срабатываний: {wake['triggers']} ({wake['triggers'] / hours:.1f} в час); "
+          f"CPU в {full_cpu / max(gated_cpu, 1e-9):.1f} раза меньше")
+
+    if args.commands:
+        items = load_audio(args.commands)
+        print(f"Команды распознаны: без триггера {detection(model, args, items, False):.1%}, "
+              f"с триггером {detection(model, args, items, True):.1%} из {len(items)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
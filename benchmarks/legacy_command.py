@@ -0,0 +1,85 @@
+"""Исходный каскад регулярных выражений из app.command (до грамматики).
+
+Используется только для сравнения результатов и скорости в bench_command.
+"""
+import re
+
+def extract_task_and_date(command):
+    """Извлекает название задачи и дату из команды"""
+    command_lower = command.lower().strip()
+    
+    # Сначала ищем задачу в кавычках
+    quote_match = re.search(r"['\"]([^'\"]+)['\"]", command)
+    if quote_match:
+        task_name = quote_match.group(1)
+        date_part = re.sub(r"['\"][^'\"]*['\"]", "", command_lower).strip()
+        return task_name, clean_date_part(date_part)
+    
+    # Поддержка диапазонов дат "с ... по ..."
+    range_match = re.search(r"(?:создай|запиши)\s+(?:задачу|событие)\s+(.+?)\s+с\s+(.+?)\s+по\s+(.+)", command_lower)
+    if range_match:
+        task_name = clean_task_name(range_match.group(1))
+        start_date = range_match.group(2)
+        end_date = range_match.group(3)
+        return task_name, f"{start_date} - {end_date}"
+    
+    # Используем разделители "на", "к", "до"
+    date_separators = [r"\s+на\s+дату\s+", r"\s+на\s+", r"\s+к\s+", r"\s+до\s+"]
+    for separator in date_separators:
+        # Ищем паттерн: команда + задача + разделитель + дата
+        pattern = rf"(?:создай|запиши)\s+(?:задачу|событие|запись)\s+(.+?){separator}(.+)"
+        match = re.search(pattern, command_lower)
+        if match:
+            task_name = clean_task_name(match.group(1))
+            date_part = match.group(2)
+            return task_name, clean_date_part(date_part)
+    
+    # Поиск даты в конце команды без разделителя
+    date_pattern = r"(?:создай|запиши)\s+(?:задачу|событие|запись)\s+(.+?)\s+(\b(?:первое|второе|третье|четвертое|пятое|шестое|седьмое|восьмое|девятое|десятое|одиннадцатое|двенадцатое|тринадцатое|четырнадцатое|пятнадцатое|шестнадцатое|семнадцатое|восемнадцатое|девятнадцатое|двадцатое|двадцать первое|двадцать второе|двадцать третье|двадцать четвертое|двадцать пятое|двадцать шестое|двадцать седьмое|двадцать восьмое|двадцать девятое|тридцатое|тридцать первое|января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)\b.*)"
+    match = re.search(date_pattern, command_lower, re.IGNORECASE)
+    if match:
+        task_name = clean_task_name(match.group(1))
+        date_part = match.group(2)
+        return task_name, clean_date_part(date_part)
+    
+    # Извлечение только задачи без даты
+    task_only_patterns = [
+        r"(?:создай|запиши)\s+(?:задачу|событие|запись)\s+(.+)",
+        r"(?:задачу|событие|запись)\s+(.+?)(?:\s+(?:на|к|до)|$)"
+    ]
+    for pattern in task_only_patterns:
+        match = re.search(pattern, command_lower)
+        if match:
+            task_name = clean_task_name(match.group(1))
+            return task_name, None
+    
+    return None, None
+
+def clean_task_name(task_name):
+    """Очищает название задачи от лишних слов"""
+    if not task_name:
+        return None
+    
+    # Убираем служебные слова из начала
+    task_name = re.sub(r'^\s*(задачу|событие|запись)\s+', '', task_name).strip()
+    
+    # Убираем предлоги и служебные слова
+    task_name = re.sub(r'\s+(на|к|в|до|с|по|для|от|из|под|над|между|перед|после|через|за|при|без|против|среди|вокруг|около|вместо|кроме|сверх|внутри|снаружи|вдоль|поперек|напротив|позади|впереди|слева|справа|сверху|снизу|внизу|вверху|дату|время)\s+', ' ', task_name).strip()
+    
+    # Убираем лишние пробелы
+    task_name = re.sub(r'\s+', ' ', task_name).strip()
+    
+    return task_name if task_name else None
+
+def clean_date_part(date_part):
+    """Очищает строку с датой от лишних слов"""
+    if not date_part:
+        return None
+    
+    # Убираем команды создания и служебные слова
+    date_part = re.sub(r'\b(создай|задачу|событие|запись|дату|время)\b', '', date_part).strip()
+    
+    # Убираем лишние пробелы
+    date_part = re.sub(r'\s+', ' ', date_part).strip()
+    
+    return date_part if date_part else None
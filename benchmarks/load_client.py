@@ -0,0 +1,158 @@
+"""Нагрузочный клиент сервера распознавания: одновременные сессии воспроизводят WAV.
+
+    python run.py server &
+    python -m benchmarks.load_client records/*.wav --sessions 1,2,4,8,16
+    python -m benchmarks.load_client records/ --model models/ru/vosk-model-small-ru-0.22 --workers 4
+
+С --model сервер запускается в этом же процессе. Каждая сессия отправляет
+файл в темпе реального времени (--speed 2 — вдвое быстрее, 0 — без пауз) и
+ждет {"type": "end"}. Сервер успевает, если отставание отправки (сокет не
+принимает звук из-за backpressure) и задержка от конца звука до "end" не
+превышают --max-lag. Итог — сколько сессий на ядро выдерживает сервер.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import threading
+import numpy as np
+from benchmarks.common import summarize
+from app.transcribe import collect_files, read_chunks
+
+CHUNK_BYTES = 8000
+BYTES_PER_SECOND = 16000 * 2
+
+
+def load_audio(paths):
+    """Звук файлов целиком в памяти, чтобы чтение с диска не влияло на замер"""
+    audio = []
+    for path in collect_files(paths):
+        rate, _, chunks = read_chunks(path)
+        if rate != 16000:
+            raise ValueError(f"{path}: сервер принимает только 16 кГц")
+        audio.append(b"".join(chunks))
+    return audio
+
+
+def run_session(host, port, data, speed):
+    """Одна сессия: отправка в темпе speed и прием ответов до "end" """
+    result = {"partials": 0, "finals": 0, "commands": 0, "error": None, "send_lag": 0.0, "end_lag": None}
+    sock = socket.create_connection((host, port))
+    started = time.perf_counter()
+    sent_at = [None]
+
+    def send():
+        try:
+            for offset in range(0, len(data), CHUNK_BYTES):
+                if speed:
+                    due = started + offset / BYTES_PER_SECOND / speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        result["send_lag"] = max(result["send_lag"], -delay)
+                sock.sendall(data[offset:offset + CHUNK_BYTES])
+            sent_at[0] = time.perf_counter()
+            sock.shutdown(socket.SHUT_WR)
+        except OSError as e:
+            result["error"] = str(e)
+
+    sender = threading.Thread(target=send, daemon=True)
+    sender.start()
+    with sock, sock.makefile("rb") as stream:
+        for line in stream:
+            message = json.loads(line)
+            kind = message["type"]
+            if kind == "partial":
+                result["partials"] += 1
+            elif kind == "final":
+                result["finals"] += 1
+                result["commands"] += "command" in message
+            elif kind == "error":
+                result["error"] = message["error"]
+            elif kind == "end":
+                break
+        ended = time.perf_counter()
+    sender.join()
+    if sent_at[0] is not None:
+        result["end_lag"] = ended - sent_at[0]
+    return result
+
+
+def run_level(host, port, audio, sessions, speed):
+    results = [None] * sessions
+
+    def worker(index):
+        try:
+            results[index] = run_session(host, port, audio[index % len(audio)], speed)
+        except OSError as e:
+            results[index] = {"error": str(e), "send_lag": 0.0, "end_lag": None, "finals": 0, "commands": 0}
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def start_local_server(model_path, workers, max_sessions):
+    """Сервер в фоновом потоке этого процесса; возвращает (host, port, число потоков)"""
+    import vosk
+    from app.server import RecognitionServer
+    vosk.SetLogLevel(-1)
+    server = RecognitionServer(vosk.Model(model_path), workers, max_sessions)
+    loop = asyncio.new_event_loop()
+    address = loop.run_until_complete(server.start("127.0.0.1", 0))
+    threading.Thread(target=loop.run_until_complete, args=(server.serve_forever(),), daemon=True).start()
+    return address[0], address[1], server.workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="WAV-файлы 16 кГц или папки с ними")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2700)
+    parser.add_argument("--sessions", default="1,2,4,8", help="уровни одновременных сессий через запятую")
+    parser.add_argument("--speed", type=float, default=1.0, help="темп отправки относительно реального времени")
+    parser.add_argument("--max-lag", type=float, default=1.0, help="допустимое отставание, с")
+    parser.add_argument("--model", help="запустить сервер в этом процессе с этой моделью")
+    parser.add_argument("--workers", type=int, help="потоков декодирования локального сервера")
+    parser.add_argument("--cores", type=int, help="ядер у сервера (по умолчанию — у этой машины)")
+    args = parser.parse_args()
+
+    audio = load_audio(args.paths)
+    if not audio:
+        print("❌ Нет аудиофайлов")
+        return 1
+    host, port, cores = args.host, args.port, args.cores or os.cpu_count()
+    levels = [int(level) for level in args.sessions.split(",")]
+    if args.model:
+        host, port, workers = start_local_server(args.model, args.workers, max(levels))
+        cores = args.cores or workers
+
+    best = 0
+    for sessions in levels:
+        results = run_level(host, port, audio, sessions, args.speed)
+        errors = [result["error"] for result in results if result["error"]]
+        end_lags = [result["end_lag"] for result in results if result["end_lag"] is not None]
+        send_lags = [result["send_lag"] for result in results]
+        end = summarize(end_lags)
+        send_p95 = float(np.percentile(send_lags, 95)) if send_lags else 0.0
+        keeps_up = not errors and end["p95_ms"] <= 1000 * args.max_lag and send_p95 <= args.max_lag
+        if keeps_up:
+            best = max(best, sessions)
+        print(f"сессий {sessions:3}: конец→end p50={end['p50_ms']:7.1f} мс p95={end['p95_ms']:7.1f} мс  "
+              f"отставание отправки p95={1000 * send_p95:7.1f} мс  "
+              f"фраз {sum(result['finals'] for result in results)}, команд {sum(result['commands'] for result in results)}, "
+              f"ошибок {len(errors)}  {'✅' if keeps_up else '❌'}")
+
+    print(f"Выдерживает {best} сессий в реальном времени: {best / cores:.2f} на ядро ({cores} ядер)")
+    return 0 if best else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
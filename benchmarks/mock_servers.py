@@ -0,0 +1,324 @@
+"""Локальные заглушки Notion и Google Calendar API для бенчмарков.
+
+Серверы работают в фоновом потоке на 127.0.0.1, умеют добавлять задержку к
+каждому ответу, имитировать отказ (fail_status) и считают принятые запросы.
+"""
+import json
+import time
+import socket
+import uuid
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qs
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockServer:
+    """Базовый фоновый HTTP-сервер с настраиваемой задержкой"""
+
+    handler_class = None
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        # Код ответа на любой запрос во время имитации отказа (например, 503)
+        self.fail_status = None
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self.handler_class)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def count(self):
+        with self.lock:
+            self.requests += 1
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Без TCP_NODELAY заголовки и тело уходят разными сегментами и ждут delayed ACK
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def failing(self):
+        """Отвечает fail_status, если заглушка имитирует отказ"""
+        status = self.server.mock.fail_status
+        if status is None:
+            return False
+        self.send(status, {"object": "error", "status": status})
+        return True
+
+    def send(self, status, body, content_type="application/json", headers=None):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _CalendarHandler(_Handler):
+    def do_GET(self):
+        mock = self.server.mock
+        self.read_body()
+        time.sleep(mock.latency)
+        if self.failing():
+            return
+        url = urlsplit(self.path)
+        if not url.path.endswith("/events"):
+            self.send(404, {"error": {"code": 404}})
+            return
+        mock.count()
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        response = mock.list_events(params)
+        if response is None:
+            self.send(410, {"error": {"code": 410, "message": "Sync token is no longer valid, a full sync is required."}})
+            return
+        self.send(200, response)
+
+    def do_POST(self):
+        mock = self.server.mock
+        body = self.read_body()
+        time.sleep(mock.latency)
+        if self.failing():
+            return
+
+        if self.path.startswith("/batch/"):
+            self.send_batch(body)
+            return
+
+        mock.count()
+        event = mock.insert(json.loads(body or b"{}"))
+        if event is None:
+            self.send(409, {"error": {"code": 409, "message": "The requested identifier already exists."}})
+            return
+        self.send(200, event)
+
+    def send_batch(self, body):
+        mock = self.server.mock
+        message = BytesParser(policy=HTTP).parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + body
+        )
+        boundary = uuid.uuid4().hex
+        parts = []
+        for part in message.iter_parts():
+            content_id = part["Content-ID"].strip("<>")
+            request = part.get_payload(decode=True)
+            event = json.loads(request.replace(b"\r\n", b"\n").split(b"\n\n", 1)[1] or b"{}")
+            mock.count()
+            event = mock.insert(event)
+            status = "200 OK" if event is not None else "409 Conflict"
+            payload = json.dumps(event if event is not None else {"error": {"code": 409}})
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n\r\n{payload}\r\n"
+            )
+        data = ("".join(parts) + f"--{boundary}--\r\n").encode("utf-8")
+        self.send(200, data, content_type=f"multipart/mixed; boundary={boundary}")
+
+
+class MockCalendarServer(MockServer):
+    """Заглушка Calendar API: events.insert, пакетные запросы /batch/calendar/v3 и
+    events.list постранично (maxResults, pageToken) с nextSyncToken и syncToken.
+    Повторный id события — 409, устаревший syncToken (после expire_sync_tokens) — 410, как у Google"""
+
+    handler_class = _CalendarHandler
+
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self.events = []
+        # Номер последнего изменения; syncToken — номер, после которого нужны изменения
+        self.version = 0
+        self.changed = {}
+        self.oldest_token = 0
+
+    def _touch(self, event):
+        self.version += 1
+        self.changed[event["id"]] = self.version
+
+    def insert(self, event):
+        """Сохраняет событие; None, если событие с таким id уже есть"""
+        with self.lock:
+            if "id" in event and any(existing["id"] == event["id"] for existing in self.events):
+                return None
+            event = dict(event, htmlLink=f"http://calendar.local/{len(self.events)}", status="confirmed")
+            event.setdefault("id", uuid.uuid4().hex)
+            self.events.append(event)
+            self._touch(event)
+            return event
+
+    def update(self, event_id, **fields):
+        """Меняет поля события (например, start и end), как правка в интерфейсе календаря"""
+        with self.lock:
+            event = next(event for event in self.events if event["id"] == event_id)
+            event.update(fields)
+            self._touch(event)
+
+    def delete(self, event_id):
+        """Удаленное событие остается в инкрементальной выдаче со статусом cancelled"""
+        self.update(event_id, status="cancelled")
+
+    def expire_sync_tokens(self):
+        """Все выданные ранее syncToken становятся недействительными"""
+        with self.lock:
+            self.oldest_token = self.version
+
+    def list_events(self, params):
+        """Ответ events.list или None, если syncToken устарел"""
+        with self.lock:
+            if "syncToken" in params:
+                since = int(params["syncToken"])
+                if since < self.oldest_token:
+                    return None
+                events = [event for event in self.events if self.changed[event["id"]] > since]
+            else:
+                events = [event for event in self.events if event.get("status") != "cancelled"]
+                if "timeMin" in params:
+                    since = datetime.fromisoformat(params["timeMin"].replace("Z", "+00:00"))
+                    events = [event for event in events
+                              if datetime.fromisoformat(event["end"]["dateTime"]) >= since]
+            events.sort(key=lambda event: self.changed[event["id"]])
+            # pageToken хранит смещение и версию на момент первой страницы
+            offset, version = map(int, params.get("pageToken", f"0:{self.version}").split(":"))
+            size = int(params.get("maxResults", 250))
+            response = {"kind": "calendar#events", "items": [dict(event) for event in events[offset:offset + size]]}
+            if offset + size < len(events):
+                response["nextPageToken"] = f"{offset + size}:{version}"
+            else:
+                response["nextSyncToken"] = str(version)
+            return response
+
+
+class _NotionHandler(_Handler):
+    def do_GET(self):
+        self.read_body()
+        time.sleep(self.server.mock.latency)
+        if self.failing():
+            return
+        if self.path.endswith("/users/me"):
+            self.send(200, {"object": "user", "type": "bot"})
+            return
+        self.send(404, {"object": "error", "status": 404})
+
+    def do_POST(self):
+        mock = self.server.mock
+        body = self.read_body()
+        time.sleep(mock.latency)
+        if self.failing():
+            return
+
+        retry_after = mock.throttle()
+        if retry_after is not None:
+            self.send(429, {"object": "error", "code": "rate_limited"}, headers={"Retry-After": str(retry_after)})
+            return
+
+        mock.count()
+        if self.path.endswith("/query"):
+            self.send(200, mock.query(json.loads(body or b"{}")))
+            return
+        self.send(200, mock.create_page(json.loads(body or b"{}")))
+
+
+class MockNotionServer(MockServer):
+    """Заглушка Notion API: POST /pages, /databases/<id>/query (фильтр по названию и
+    created_time) и GET /users/me; при rate_limit отвечает 429 с Retry-After, если запросы приходят чаще"""
+
+    handler_class = _NotionHandler
+
+    def __init__(self, latency=0.0, rate_limit=None, retry_after=1):
+        super().__init__(latency)
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.pages = []
+        self.throttled = 0
+        self._window = []
+
+    def throttle(self):
+        """Скользящее окно в 1 секунду; возвращает Retry-After или None"""
+        if not self.rate_limit:
+            return None
+        with self.lock:
+            now = time.monotonic()
+            self._window = [moment for moment in self._window if now - moment < 1.0]
+            if len(self._window) >= self.rate_limit:
+                self.throttled += 1
+                return self.retry_after
+            self._window.append(now)
+            return None
+
+    def create_page(self, page):
+        with self.lock:
+            created = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+            page = dict(page, object="page", id=str(uuid.uuid4()), created_time=created.isoformat())
+            self.pages.append(page)
+            return page
+
+    @staticmethod
+    def title(page):
+        return page["properties"]["Name"]["title"][0]["text"]["content"]
+
+    def query(self, body):
+        """Поддерживает фильтр по Name.title.equals и created_time.on_or_after (один или в "and")
+        и постраничную выдачу (page_size, start_cursor)"""
+        query_filter = body.get("filter", {})
+        conditions = query_filter.get("and", [query_filter] if query_filter else [])
+        with self.lock:
+            pages = list(self.pages)
+        for condition in conditions:
+            if "title" in condition:
+                pages = [page for page in pages if self.title(page) == condition["title"]["equals"]]
+            elif "created_time" in condition:
+                since = datetime.fromisoformat(condition["created_time"]["on_or_after"])
+                pages = [page for page in pages if datetime.fromisoformat(page["created_time"]) >= since]
+        offset = int(body.get("start_cursor", 0))
+        size = body.get("page_size", 100)
+        response = {"object": "list", "results": pages[offset:offset + size], "has_more": offset + size < len(pages)}
+        response["next_cursor"] = str(offset + size) if response["has_more"] else None
+        return response
+
+
+def use_mock_sinks(notion, calendar):
+    """Направляет клиентов Notion и Calendar на заглушки.
+
+    Настройки читаются при импорте, поэтому функцию нужно вызвать до первого
+    импорта app.notion, app.google_calendar и config.settings.
+    """
+    import os
+    os.environ["NOTION_API_URL"] = notion.url
+    os.environ["NOTION_RATE_LIMIT"] = "0"
+    os.environ["GOOGLE_CALENDAR_API_ENDPOINT"] = calendar.url + "/"
+    os.environ.setdefault("NOTION_API_KEY", "bench")
+    os.environ.setdefault("DATABASE_ID", "bench")
+
+    from google.auth.credentials import AnonymousCredentials
+    from app import google_calendar
+    google_calendar._credentials = AnonymousCredentials()
+    google_calendar._service = google_calendar._build_service(google_calendar._credentials)
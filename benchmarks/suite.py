@@ -0,0 +1,221 @@
+"""Сквозной набор бенчмарков: корпус команд, этапы разбора и конвейер до заглушек
+Notion и Calendar со сравнением с базовой линией.
+
+    python -m benchmarks.suite                        # сравнить с benchmarks/baseline.json
+    python -m benchmarks.suite --save-baseline        # записать новую базовую линию
+    python -m benchmarks.suite --audio fixtures/ --model models/ru/vosk-model-small-ru-0.22
+
+С --audio конвейер начинается с распознавания WAV: в папке должен лежать
+manifest.jsonl со строками {"file": "имя.wav", "text": "ожидаемый текст", "now": "..."}.
+Без --audio в разбор идут тексты корпуса. Код возврата 1 — расхождение с корпусом
+или замедление этапа относительно базовой линии.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from benchmarks.common import summarize
+from benchmarks.mock_servers import MockNotionServer, MockCalendarServer, use_mock_sinks
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "corpus", "commands_v2.jsonl")
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Этап считается замедлившимся, если p50 или p95 выросли больше чем на TOLERANCE
+# и одновременно больше чем на SLACK_MS (защита от шума на микросекундных этапах)
+TOLERANCE = 0.5
+SLACK_MS = 0.05
+
+
+def load_corpus(path=CORPUS_PATH):
+    """Строки корпуса; now — момент отсчета, относительно которого записан ожидаемый due"""
+    with open(path, encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    for item in items:
+        item["now"] = datetime.fromisoformat(item["now"])
+    return items
+
+
+def encode_due(due):
+    if isinstance(due, tuple):
+        return [date.isoformat() for date in due]
+    return due.isoformat() if due is not None else None
+
+
+def check_corpus(corpus):
+    """Расхождения extract_task_and_date и parse_date с ожидаемыми значениями корпуса"""
+    from app.command import extract_task_and_date, parse_date
+    mismatches = []
+    for item in corpus:
+        task, date_part = extract_task_and_date(item["text"])
+        due = encode_due(parse_date(date_part, item["now"])) if date_part else None
+        for field, got in (("task", task), ("date_part", date_part), ("due", due)):
+            if got != item[field]:
+                mismatches.append((item["text"], field, item[field], got))
+    return mismatches
+
+
+def timed(fn, calls, rounds, before_each=None):
+    """Длительности вызовов fn(*args) для каждого набора аргументов из calls"""
+    samples = []
+    for _ in range(rounds):
+        for args in calls:
+            if before_each is not None:
+                before_each()
+            started = time.perf_counter()
+            fn(*args)
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def micro_stages(corpus, rounds):
+    """Микробенчмарки этапов разбора на строках корпуса"""
+    from app.command import extract_task_and_date, preprocess_date, parse_date, parse_command
+    from app.dates import clear_date_cache, warm_up_dateparser
+
+    # Загрузка словарей dateparser не входит в замер
+    warm_up_dateparser()
+    dated = [(item["date_part"], item["now"]) for item in corpus if item["date_part"]]
+    stages = {
+        "extract_task_and_date": timed(extract_task_and_date, [(item["text"],) for item in corpus], rounds),
+        "preprocess_date": timed(preprocess_date, dated, rounds),
+        "parse_date_cold": timed(parse_date, dated, rounds, before_each=clear_date_cache),
+    }
+    clear_date_cache()
+    stages["parse_date_warm"] = timed(parse_date, dated, rounds)
+    stages["parse_command"] = timed(parse_command, [(item["text"], item["now"]) for item in corpus], rounds)
+    return stages
+
+
+def load_audio(directory):
+    """Строки manifest.jsonl с полными путями к файлам"""
+    with open(os.path.join(directory, "manifest.jsonl"), encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    for item in items:
+        item["file"] = os.path.join(directory, item["file"])
+        item["now"] = datetime.fromisoformat(item["now"]) if item.get("now") else None
+    return items
+
+
+def pipeline(items, latency, model_path=None):
+    """Распознавание (если есть аудио) → parse_command → Dispatcher до заглушек; время каждого этапа"""
+    stages = {"recognition": [], "parse": [], "dispatch": [], "total": []}
+    outcome = {"commands": len(items), "recognized": 0, "parsed": 0, "delivered": 0}
+
+    with MockNotionServer(latency=latency) as notion, MockCalendarServer(latency=latency) as calendar:
+        use_mock_sinks(notion, calendar)
+        from app.command import parse_command
+        from app.dispatch import create_dispatcher
+
+        transcribe = None
+        if model_path is not None:
+            from app import transcribe
+            transcribe.init_worker(model_path)
+
+        dispatcher = create_dispatcher()
+        for item in items:
+            started = time.perf_counter()
+            text = item["text"]
+            if transcribe is not None:
+                result = transcribe.transcribe_file(item["file"])
+                outcome["recognized"] += result.get("text") == item["text"]
+                text = result.get("text", "")
+                stages["recognition"].append(time.perf_counter() - started)
+
+            parse_started = time.perf_counter()
+            parsed = parse_command(text, item["now"])
+            stages["parse"].append(time.perf_counter() - parse_started)
+
+            if parsed:
+                outcome["parsed"] += 1
+                due = parsed.get("due")
+                start = due[0] if isinstance(due, tuple) else due
+                dispatch_started = time.perf_counter()
+                results = dispatcher.dispatch({"task": parsed["task"], "due": due, "start": start}).result()
+                stages["dispatch"].append(time.perf_counter() - dispatch_started)
+                outcome["delivered"] += all(result["success"] for result in results.values())
+            stages["total"].append(time.perf_counter() - started)
+        dispatcher.shutdown()
+
+    return {name: samples for name, samples in stages.items() if samples}, outcome
+
+
+def compare(report, baseline, tolerance=TOLERANCE, slack_ms=SLACK_MS):
+    """Список замедлений и ухудшений точности относительно базовой линии"""
+    regressions = []
+    for name, base in baseline["stages"].items():
+        current = report["stages"].get(name)
+        if current is None:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            limit = base[key] * (1 + tolerance)
+            if current[key] > limit and current[key] - base[key] > slack_ms:
+                regressions.append(f"{name} {key}: {current[key]:.3f} мс (база {base[key]:.3f} мс)")
+    if report["mismatches"] > baseline["mismatches"]:
+        regressions.append(f"расхождений с корпусом: {report['mismatches']} (база {baseline['mismatches']})")
+    for key, value in baseline.get("pipeline", {}).items():
+        if report["pipeline"].get(key, value) < value:
+            regressions.append(f"конвейер {key}: {report['pipeline'][key]} (база {value})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--rounds", type=int, default=20, help="повторов корпуса в микробенчмарках")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа заглушек, с")
+    parser.add_argument("--audio", help="папка с WAV и manifest.jsonl для этапа распознавания")
+    parser.add_argument("--model", default=os.path.join("models", "ru", "vosk-model-small-ru-0.22"))
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="записать результат как базовую линию")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="допустимый рост p50/p95 (0.5 = 50%%)")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    mismatches = check_corpus(corpus)
+    for text, field, expected, got in mismatches:
+        print(f"❌ {text!r}: {field} ожидалось {expected!r}, получено {got!r}")
+
+    stages = micro_stages(corpus, args.rounds)
+    if args.audio:
+        pipeline_stages, outcome = pipeline(load_audio(args.audio), args.latency, args.model)
+    else:
+        pipeline_stages, outcome = pipeline(corpus, args.latency)
+    stages.update({f"pipeline_{name}": samples for name, samples in pipeline_stages.items()})
+
+    report = {
+        "corpus": os.path.basename(args.corpus),
+        "mismatches": len(mismatches),
+        "pipeline": outcome,
+        "stages": {name: summarize(samples) for name, samples in stages.items()},
+    }
+
+    print(f"Корпус {report['corpus']}: {len(corpus)} команд, расхождений {len(mismatches)}")
+    print(f"Конвейер: {outcome}")
+    for name, stats in report["stages"].items():
+        print(f"{name:28} p50={stats['p50_ms']:8.3f} мс  p95={stats['p95_ms']:8.3f} мс  p99={stats['p99_ms']:8.3f} мс")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"📝 Базовая линия записана в {args.baseline}")
+        return 1 if mismatches else 0
+
+    if not os.path.exists(args.baseline):
+        print("⚠️ Базовой линии нет, запустите с --save-baseline")
+        return 1 if mismatches else 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"❌ Регрессия: {regression}")
+    if not regressions:
+        print("✅ Без регрессий относительно базовой линии")
+    return 1 if regressions or mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,9 @@ load_dotenv()
 # Настройки Notion
 NOTION_API_KEY = os.getenv("NOTION_API_KEY")
 DATABASE_ID = os.getenv("DATABASE_ID")
+NOTION_API_URL = os.getenv("NOTION_API_URL", "https://api.notion.com/v1").rstrip("/")
+# Ограничение Notion API — в среднем 3 запроса в секунду
+NOTION_RATE_LIMIT = float(os.getenv("NOTION_RATE_LIMIT", "3"))
 
 # Настройки Google Calendar
 raw_credentials = os.getenv("GOOGLE_CALENDAR_CREDENTIALS", "").strip()
@@ -32,12 +35,105 @@ if raw_id.startswith("os.getenv"):
 else:
     GOOGLE_CALENDAR_ID = raw_id or "primary"
 
+# Адрес Calendar API (например, локальная заглушка для тестов); пусто — адрес Google
+GOOGLE_CALENDAR_API_ENDPOINT = os.getenv("GOOGLE_CALENDAR_API_ENDPOINT", "").strip() or None
+# За сколько секунд до истечения токена обновлять его заранее
+GOOGLE_TOKEN_REFRESH_MARGIN = int(os.getenv("GOOGLE_TOKEN_REFRESH_MARGIN", "300"))
+
 # Общие настройки
 TIME_ZONE = os.getenv("TIME_ZONE", "Europe/Moscow")
 DEFAULT_EVENT_DURATION_HOURS = int(os.getenv("DEFAULT_EVENT_DURATION_HOURS", "1"))
+# Сколько ждать ответа каждого получателя (Notion, Calendar), секунд
+SINK_TIMEOUT = float(os.getenv("SINK_TIMEOUT", "20"))
+
+# Локальная очередь команд (SQLite) перед отправкой в Notion и Calendar
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", "outbox.db")
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+# Предельная пауза между повторами, секунд
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "600"))
+# Доставку в работе дольше стольких секунд «outbox replay» считает брошенной (больше SINK_TIMEOUT)
+OUTBOX_LEASE = float(os.getenv("OUTBOX_LEASE", "300"))
+
+# Локальная копия календаря для проверки пересечений и поиска свободного времени
+CALENDAR_INDEX_ENABLED = os.getenv("CALENDAR_INDEX_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+CALENDAR_INDEX_PATH = os.getenv("CALENDAR_INDEX_PATH", "calendar_index.db")
+# Как часто запрашивать изменения календаря, секунд
+CALENDAR_SYNC_INTERVAL = float(os.getenv("CALENDAR_SYNC_INTERVAL", "60"))
+
+# Подавление повторов: та же задача на то же время в течение DEDUP_TTL секунд не создается заново
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+DEDUP_PATH = os.getenv("DEDUP_PATH", "dedup.db")
+DEDUP_TTL = float(os.getenv("DEDUP_TTL", "900"))
+# Порог сходства названий по трехграммам (1.0 — только точное совпадение)
+DEDUP_SIMILARITY = float(os.getenv("DEDUP_SIMILARITY", "0.8"))
+# Даты команд сравниваются с точностью до стольких минут
+DEDUP_BUCKET_MINUTES = int(os.getenv("DEDUP_BUCKET_MINUTES", "30"))
+
+# Логирование: файл, уровень и формат файла (json — по записи JSON в строке, text — как раньше)
+LOG_PATH = os.getenv("LOG_PATH", "bot.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").strip().lower()
+# Ротация файла лога по размеру (байт, 0 — без нее) и по времени (when TimedRotatingFileHandler)
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "7"))
+# Не больше LOG_RATE_LIMIT частых однотипных записей (extra=NOISY) за LOG_RATE_WINDOW секунд из одного места кода
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "20"))
+LOG_RATE_WINDOW = float(os.getenv("LOG_RATE_WINDOW", "10"))
+
+# Метрики: порт HTTP /metrics в формате Prometheus (0 — выключен) и файл трассировки JSONL
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_TRACE_PATH = os.getenv("METRICS_TRACE_PATH", "").strip() or None
+
+# Модель Vosk: small — быстрая, large — точнее, но требует больше памяти и CPU
+VOSK_MODEL = os.getenv("VOSK_MODEL", "small").strip().lower()
+VOSK_MODEL_SMALL_PATH = os.getenv("VOSK_MODEL_SMALL_PATH", os.path.join("models", "ru", "vosk-model-small-ru-0.22"))
+VOSK_MODEL_LARGE_PATH = os.getenv("VOSK_MODEL_LARGE_PATH", os.path.join("models", "ru", "vosk-model-ru-0.42"))
+# Распознавание по грамматике из слов команды и словаря названий задач (только малые модели)
+RECOGNITION_GRAMMAR = os.getenv("RECOGNITION_GRAMMAR", "false").strip().lower() in ("1", "true", "yes")
+TASK_LEXICON_PATH = os.getenv("TASK_LEXICON_PATH", "task_lexicon.txt")
+
+# Сервер потокового распознавания (python run.py server)
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "2700"))
+# Потоков декодирования; 0 — по числу ядер
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "0"))
+SERVER_MAX_SESSIONS = int(os.getenv("SERVER_MAX_SESSIONS", "64"))
+
+# Слово-триггер: полный распознаватель включается только после «создай», «запиши» или имени
+WAKE_WORD_ENABLED = os.getenv("WAKE_WORD_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+WAKE_WORDS = [word.strip().lower() for word in os.getenv("WAKE_WORDS", "создай,запиши").split(",") if word.strip()]
+# Имя бота, которое тоже включает распознавание (например, «компьютер»)
+WAKE_NAME = os.getenv("WAKE_NAME", "").strip().lower()
+# Сколько звука до триггера передается полному распознавателю
+WAKE_PREROLL_MS = int(os.getenv("WAKE_PREROLL_MS", "1000"))
+# Предельная длина фразы после триггера, секунд
+WAKE_ACTIVE_SECONDS = float(os.getenv("WAKE_ACTIVE_SECONDS", "15"))
+
+# Микрофон: номер устройства PyAudio или часть названия; пусто — лучшее по оценке и пробной записи
+AUDIO_DEVICE = os.getenv("AUDIO_DEVICE", "").strip()
+# Открывать устройство в родной частоте и со всеми каналами (до 8) и приводить звук к 16 кГц моно самим
+AUDIO_NATIVE_RATE = os.getenv("AUDIO_NATIVE_RATE", "true").strip().lower() in ("1", "true", "yes")
+# Сведение каналов: beam — выравнивание по задержке и веса по сигнал/шум, mix — среднее, число — один канал
+AUDIO_CHANNEL_MODE = os.getenv("AUDIO_CHANNEL_MODE", "beam").strip().lower()
+
+# Детектор речи (VAD) перед распознавателем Vosk
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+VAD_FRAME_MS = int(os.getenv("VAD_FRAME_MS", "20"))
+# Во сколько раз энергия кадра должна превышать шумовой порог
+VAD_THRESHOLD = float(os.getenv("VAD_THRESHOLD", "3.0"))
+VAD_PREROLL_MS = int(os.getenv("VAD_PREROLL_MS", "300"))
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "500"))
+
+# Досрочное завершение фразы: полная команда с датой и временем, не менявшаяся EARLY_INTENT_STABLE_MS мс звука
+EARLY_INTENT_ENABLED = os.getenv("EARLY_INTENT_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+EARLY_INTENT_STABLE_MS = int(os.getenv("EARLY_INTENT_STABLE_MS", "300"))
+# Прогрев получателей по глаголу команды не чаще раза в столько секунд
+PREWARM_INTERVAL = float(os.getenv("PREWARM_INTERVAL", "30"))
 
-# Проверка обязательных переменных
-if not NOTION_API_KEY:
-    raise ValueError("NOTION_API_KEY не установлен в переменных окружения")
-if not DATABASE_ID:
-    raise ValueError("DATABASE_ID не установлен в переменных окружения")
\ No newline at end of file
+def check_settings():
+    """Проверка обязательных переменных (вызывается при запуске бота, а не при импорте)"""
+    if not NOTION_API_KEY:
+        raise ValueError("NOTION_API_KEY не установлен в переменных окружения")
+    if not DATABASE_ID:
+        raise ValueError("DATABASE_ID не установлен в переменных окружения")
\ No newline at end of file
@@ -1,122 +1,234 @@
+import sys
+import uuid
+import queue
 import logging
-from app.speech import listen_command
-from app.command import parse_command
-from app.notion import create_notion_task
-from app.google_calendar import create_calendar_event
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("bot.log"),
-        logging.StreamHandler()
-    ]
-)
 
 logger = logging.getLogger("Main")
 
-def check_microphone():
-    """Проверяет доступность микрофона"""
-    try:
-        import pyaudio
-        p = pyaudio.PyAudio()
-        stream = p.open(format=pyaudio.paInt16, channels=1, rate=16000, input=True, frames_per_buffer=1024)
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-        return True
-    except Exception as e:
-        logger.error(f"Микрофон недоступен: {e}")
-        return False
+def configure_logging():
+    """Настройка логирования: файл и консоль пишет фоновый поток, главный цикл не ждет диска.
+
+    Вызывается из main() и подкоманд, а не при импорте: run.py импортирует только стандартную библиотеку.
+    """
+    from app.logs import setup_logging
+    setup_logging()
+
+def check_microphone(on_verb=None):
+    """Открывает постоянный захват звука; поток остается открытым на всё время работы"""
+    from app.speech import start_capture
+    capture = start_capture(on_verb=on_verb)
+    if capture is None:
+        logger.error("Микрофон недоступен")
+    return capture
+
+# Что печатать по каждому получателю: (успех, ошибка)
+SINK_MESSAGES = {
+    "notion": ("Задача создана в Notion", "Ошибка при создании задачи в Notion"),
+    "calendar": ("Событие создано в Google Calendar", "Ошибка при создании события в Google Calendar"),
+}
+
+# Голосовые команды переключения модели распознавания
+MODEL_COMMANDS = {"большая модель": "large", "малая модель": "small"}
+
+def report_status(command, results, retrying=()):
+    """Выводит итог отправки команды по каждому получателю"""
+    print(f"\n📨 '{command['task']}':")
+    for name, result in results.items():
+        done_text, error_text = SINK_MESSAGES.get(name, (f"Отправлено: {name}", f"Ошибка отправки: {name}"))
+        if result["success"]:
+            print(f"✅ {done_text}")
+        elif name in retrying:
+            print(f"⏳ {error_text}: {result['error'] or 'см. bot.log'} — повторю позже")
+        else:
+            print(f"❌ {error_text}: {result['error'] or 'см. bot.log'}")
+
+    # Итоговый статус
+    if all(result["success"] for result in results.values()):
+        print("✅ Операция успешно завершена!")
+    elif retrying:
+        print("⏳ Команда сохранена и будет отправлена повторно: python run.py outbox list")
+    else:
+        print("❌ Не удалось отправить команду: python run.py outbox replay")
+
+def check_conflicts(start_date, end_date=None):
+    """Предупреждает, если время занято событиями календаря (по локальной копии, без запроса к API)"""
+    from app.calendar_index import get_calendar_index
+    from app import metrics
+    index = get_calendar_index()
+    if index is None:
+        return
+    conflicts = index.overlaps(start_date, end_date)
+    if not conflicts:
+        return
+    metrics.inc("calendar_conflicts_total")
+    for event in conflicts:
+        print(f"⚠️ Пересекается с '{event['summary'] or 'без названия'}': "
+              f"{event['start'].strftime('%Y-%m-%d %H:%M')}–{event['end'].strftime('%H:%M')}")
+    duration = end_date - start_date if end_date else None
+    free = index.next_free_slot(start_date, duration)
+    if free is not None:
+        print(f"🕒 Ближайшее свободное время: {free.strftime('%Y-%m-%d %H:%M')}")
+
+def prepare_command(parsed):
+    """Печатает разобранную команду и возвращает ее в виде {"task", "due", "start"}"""
+    task_name = parsed["task"]
+    due_date = parsed.get("due")
+    
+    print(f"📝 Задача: '{task_name}'")
+    
+    # Обработка разных типов дат
+    start_date = None
+    end_date = None
+    
+    if due_date:
+        if isinstance(due_date, tuple):
+            start_date, end_date = due_date
+            if start_date and end_date:
+                print(f"📅 Период: с {start_date.strftime('%Y-%m-%d %H:%M')} по {end_date.strftime('%Y-%m-%d %H:%M')}")
+            else:
+                print("📅 Дата: не удалось распознать период")
+                due_date = None
+        else:
+            start_date = due_date
+            print(f"📅 Дата: {due_date.strftime('%Y-%m-%d %H:%M')}")
+    else:
+        print("📅 Дата: не указана")
+    
+    if not start_date:
+        print("⚠️ Дата не указана - событие в календаре не создано")
+    else:
+        check_conflicts(start_date, end_date)
+    return {"task": task_name, "due": due_date, "start": start_date}
 
 def main():
+    configure_logging()
     print("🎙️ Голосовой бот для Notion и Google Calendar")
+    print("Загрузка модели речи в фоне...")
+
+    # Модули приложения импортируются здесь, а тяжелые зависимости — в фоновом прогреве
+    from config.settings import check_settings
+    from app.logs import command_context
+    from app.warmup import start_warmup
+    from app import metrics
+    from app.dedup import open_dedup_index, close_dedup_index
+    check_settings()
+    metrics.configure_from_settings()
+    # Индекс повторов открывается до прогрева: прогрев заполняет его задачами из Notion
+    open_dedup_index()
+    warmup = start_warmup()
+
+    from app.speech import stop_capture, switch_model, LISTEN_TIMEOUT
+    from app.command import parse_commands
+    from app.dates import date_cache_stats
+    from app.dispatch import create_dispatcher
+    from app.outbox import Outbox, OutboxWorker
+    from app.calendar_index import start_calendar_sync, stop_calendar_sync
     
-    if not check_microphone():
+    # Диспетчер нужен до микрофона: глагол команды в частичном результате прогревает получателей
+    dispatcher = create_dispatcher()
+    capture = check_microphone(on_verb=dispatcher.prewarm)
+    if capture is None:
         print("❌ Микрофон не найден. Проверьте подключение и драйверы.")
+        dispatcher.shutdown(wait=False)
+        close_dedup_index()
         input("Нажмите Enter для выхода...")
         return
     
     print("✅ Микрофон доступен")
-    print("Загрузка модели речи... Это может занять 10-15 секунд")
+    # Звук уже копится в буфере, распознавание начнется, как только загрузится модель
+    capture.ready.wait()
+    if capture.error is not None:
+        print(f"❌ Не удалось загрузить модель распознавания речи: {capture.error}")
+        dispatcher.shutdown(wait=False)
+        close_dedup_index()
+        stop_capture()
+        return
+    print("✅ Модель речи загружена")
+    logger.info(f"Прогрев: {warmup.report()}")
+
+    outbox = Outbox()
+    worker = OutboxWorker(outbox, dispatcher, on_result=report_status).start()
+    # Локальная копия календаря: пересечения проверяются до отправки без запроса к API
+    start_calendar_sync()
 
     try:
         while True:
             print("\nГотов к команде. Скажите 'стоп' для выхода.")
             print("Ожидание команды...")
             
-            command = listen_command()
-            if not command:
+            try:
+                utterance = capture.utterances.get(timeout=LISTEN_TIMEOUT)
+            except queue.Empty:
                 continue
+            command = utterance.text
+            metrics.inc("commands_total")
             
             if "стоп" in command.lower():
                 print("👋 Программа завершена")
                 break
             
             print(f"Вы сказали: {command}")
+
+            size = next((size for phrase, size in MODEL_COMMANDS.items() if phrase in command.lower()), None)
+            if size is not None:
+                if switch_model(size):
+                    print(f"🔄 Переключаюсь на модель: {size}")
+                continue
             
-            parsed = parse_command(command)
-            if not parsed or "task" not in parsed:
+            # Идентификатор фразы попадает в записи лога о ее разборе и в ключи ее команд в outbox
+            command_id = uuid.uuid4().hex
+            with command_context(command_id):
+                commands = [prepare_command(parsed) for parsed in parse_commands(command) if "task" in parsed]
+            if not commands:
                 print("⚠️ Не могу распознать команду. Попробуйте: 'Создай задачу название задачи на дату'")
                 continue
             
-            task_name = parsed["task"]
-            due_date = parsed.get("due")
-            
-            print(f"📝 Задача: '{task_name}'")
-            
-            # Обработка разных типов дат
-            start_date = None
-            end_date = None
-            
-            if due_date:
-                if isinstance(due_date, tuple):
-                    start_date, end_date = due_date
-                    if start_date and end_date:
-                        print(f"📅 Период: с {start_date.strftime('%Y-%m-%d %H:%M')} по {end_date.strftime('%Y-%m-%d %H:%M')}")
-                    else:
-                        print("📅 Дата: не удалось распознать период")
-                        due_date = None
-                else:
-                    start_date = due_date
-                    print(f"📅 Дата: {due_date.strftime('%Y-%m-%d %H:%M')}")
-            else:
-                print("📅 Дата: не указана")
-            
-            # Создание задачи в Notion
-            print("Создание задачи в Notion...")
-            notion_success = create_notion_task(task_name, due_date)
-            if notion_success:
-                print("✅ Задача создана в Notion")
+            # Команды фразы сначала сохраняются на диск одной транзакцией, отправка в Notion
+            # и Google Calendar идет в фоне одним пакетом
+            outbox.enqueue_many(
+                [(command_data, dispatcher.applicable(command_data)) for command_data in commands],
+                keys=[command_id if index == 0 else f"{command_id}-{index}" for index in range(len(commands))]
+            )
+            if len(commands) > 1:
+                print(f"📥 Команд сохранено: {len(commands)}, отправляю в фоне одним пакетом")
             else:
-                print("❌ Ошибка при создании задачи в Notion")
-            
-            # Создание события в Google Calendar (если указана дата)
-            calendar_success = False
-            if start_date:
-                print("Создание события в Google Calendar...")
-                calendar_success = create_calendar_event(task_name, start_date)
-                if calendar_success:
-                    print("✅ Событие создано в Google Calendar")
-                else:
-                    print("❌ Ошибка при создании события в Google Calendar")
-            else:
-                print("⚠️ Дата не указана - событие в календаре не создано")
-            
-            # Итоговый статус
-            if notion_success and (calendar_success or not start_date):
-                print("✅ Операция успешно завершена!")
-            elif notion_success and start_date and not calendar_success:
-                print("⚠️ Задача создана в Notion, но не удалось создать событие в календаре")
-            elif not notion_success:
-                print("❌ Не удалось создать задачу в Notion")
+                print("📥 Команда сохранена, отправляю в фоне")
             
     except KeyboardInterrupt:
         print("\n👋 Программа остановлена пользователем")
     except Exception as e:
         logger.error(f"Критическая ошибка: {e}", exc_info=True)
         print(f"❌ Критическая ошибка: {e}")
+    finally:
+        print("Ожидание завершения отправки...")
+        # Недоставленные команды остаются в outbox и будут отправлены при следующем запуске
+        worker.stop()
+        dispatcher.shutdown(wait=True)
+        outbox.close()
+        stop_calendar_sync()
+        close_dedup_index()
+        metrics.shutdown()
+        logger.info(f"Статистика захвата: {capture.stats()}")
+        logger.info(f"Кэш дат: {date_cache_stats()}")
+        stop_capture()
 
 if __name__ == "__main__":
+    if "--profile-startup" in sys.argv:
+        from app.warmup import profile_startup
+        profile_startup(as_json="--json" in sys.argv)
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] in ("transcribe", "server", "import", "outbox"):
+        configure_logging()
+    if len(sys.argv) > 1 and sys.argv[1] == "transcribe":
+        from app.transcribe import main as transcribe_main
+        sys.exit(transcribe_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "server":
+        from app.server import main as server_main
+        sys.exit(server_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "import":
+        from app.importer import main as import_main
+        sys.exit(import_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "outbox":
+        from app.outbox import main as outbox_main
+        sys.exit(outbox_main(sys.argv[2:]))
     main()
\ No newline at end of file
@@ -0,0 +1,15 @@
+import os
+import json
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(ROOT, "benchmarks", "corpus")
+
+
+def load_corpus(name):
+    """Строки корпуса команд из benchmarks/corpus; now — момент отсчета для due"""
+    with open(os.path.join(CORPUS_DIR, name), encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    for item in items:
+        item["now"] = datetime.fromisoformat(item["now"]) if "now" in item else None
+    return items
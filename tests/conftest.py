@@ -0,0 +1,28 @@
+from datetime import datetime
+import pytest
+
+
+@pytest.fixture
+def now():
+    """Вторник, 15 января 2030, 10:00 по Москве (как в корпусе)"""
+    return datetime.fromisoformat("2030-01-15T10:00:00+03:00")
+
+
+@pytest.fixture
+def sinks(monkeypatch):
+    """Локальные заглушки Notion и Calendar API; клиенты app.notion и app.google_calendar направлены на них"""
+    from google.auth.credentials import AnonymousCredentials
+    from benchmarks.mock_servers import MockNotionServer, MockCalendarServer
+    from app import notion, google_calendar
+
+    with MockNotionServer() as notion_server, MockCalendarServer() as calendar_server:
+        # Повторы внутри клиента отключены: в тестах их делает outbox
+        client = notion.NotionClient(api_key="test", database_id="test", base_url=notion_server.url,
+                                     rate_limit=0, max_retries=0)
+        monkeypatch.setattr(notion, "_client", client)
+        monkeypatch.setattr(google_calendar, "GOOGLE_CALENDAR_API_ENDPOINT", calendar_server.url + "/")
+        credentials = AnonymousCredentials()
+        monkeypatch.setattr(google_calendar, "_credentials", credentials)
+        monkeypatch.setattr(google_calendar, "_service", google_calendar._build_service(credentials))
+        yield notion_server, calendar_server
+        client.close()
@@ -0,0 +1,115 @@
+import time
+import pickle
+import random
+import threading
+from datetime import timedelta
+import pytest
+from app import google_calendar
+from app.calendar_index import CalendarIndex, CalendarSync, busy_interval
+from benchmarks.bench_calendar_index import START, make_event, matches
+
+
+def event(event_id, start_hour, end_hour, **fields):
+    start = START + timedelta(hours=start_hour)
+    end = START + timedelta(hours=end_hour)
+    return {"id": event_id, "summary": event_id,
+            "start": {"dateTime": start.isoformat()}, "end": {"dateTime": end.isoformat()}, **fields}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = CalendarIndex(path=str(tmp_path / "calendar_index.db"))
+    yield index
+    index.close()
+
+
+def test_busy_interval_skips_free_and_cancelled():
+    assert busy_interval(event("a", 0, 1)) == (START.timestamp(), (START + timedelta(hours=1)).timestamp())
+    assert busy_interval(event("b", 0, 1, status="cancelled")) is None
+    assert busy_interval(event("c", 0, 1, transparency="transparent")) is None
+    all_day = busy_interval({"start": {"date": "2030-01-01", "timeZone": "UTC"},
+                             "end": {"date": "2030-01-02", "timeZone": "UTC"}})
+    assert all_day[1] - all_day[0] == 24 * 3600
+
+
+def test_overlaps(index):
+    # Длинное событие начинается задолго до запроса: находится благодаря max_length
+    index.apply([event("long", 0, 8), event("a", 9, 10), event("b", 10, 11), event("c", 12, 13)], full=True)
+    found = lambda start, end: [item["id"] for item in index.overlaps(START + timedelta(hours=start),
+                                                                       START + timedelta(hours=end))]
+    assert found(7, 9) == ["long"]
+    assert found(9.5, 10.5) == ["a", "b"]
+    assert found(11, 12) == []
+    assert found(12.5, 20) == ["c"]
+    assert index.overlaps(START + timedelta(hours=9))[0]["start"].tzinfo is START.tzinfo
+
+
+def test_next_free_slot(index):
+    index.apply([event("a", 0, 1), event("b", 1, 2), event("c", 2.5, 3)], full=True)
+    hour = timedelta(hours=1)
+    assert index.next_free_slot(START, hour) == START + 3 * hour
+    assert index.next_free_slot(START, timedelta(minutes=30)) == START + 2 * hour
+    assert index.next_free_slot(START + 5 * hour, hour) == START + 5 * hour
+    assert index.next_free_slot(START, hour, horizon=timedelta(hours=1)) is None
+
+
+def test_apply_removes_cancelled_and_persists(index):
+    index.apply([event("a", 0, 1), event("b", 2, 3)], sync_token="t1", full=True)
+    index.apply([event("a", 0, 1, status="cancelled")], sync_token="t2")
+    reopened = CalendarIndex(path=index.path)
+    assert [item["id"] for item in reopened.overlaps(START, START + timedelta(hours=4))] == ["b"]
+    assert reopened.sync_token == "t2"
+    reopened.close()
+
+
+def test_sync_full_incremental_and_expired_token(sinks, index):
+    _, server = sinks
+    rng = random.Random(0)
+    for _ in range(600):  # больше страницы events.list
+        server.insert(make_event(rng, 30))
+
+    sync = CalendarSync(index)
+    assert sync.sync_once() == 600
+    assert matches(index, server) and index.sync_token
+
+    ids = [item["id"] for item in server.events]
+    server.insert(make_event(rng, 30))
+    server.update(ids[0], **{key: value for key, value in make_event(rng, 30).items() if key != "summary"})
+    server.delete(ids[1])
+    assert sync.sync_once() == 3
+    assert matches(index, server)
+
+    server.expire_sync_tokens()
+    server.insert(make_event(rng, 30))
+    sync.sync_once()
+    assert matches(index, server)
+
+
+def test_background_sync_never_starts_authorization(monkeypatch, tmp_path, index):
+    # Сохраненный токен недействителен и не обновляется: нужна авторизация в браузере
+    from google.oauth2.credentials import Credentials
+    token = tmp_path / "token.pickle"
+    token.write_bytes(pickle.dumps(Credentials(token=None)))
+    monkeypatch.setattr(google_calendar, "GOOGLE_CALENDAR_TOKEN", str(token))
+    monkeypatch.setattr(google_calendar, "_service", None)
+    monkeypatch.setattr(google_calendar, "_credentials", None)
+
+    # Ошибки get_calendar_service глотает, поэтому вызовы авторизации считаются, а не падают
+    flows = []
+    monkeypatch.setattr(google_calendar.InstalledAppFlow, "from_client_secrets_file",
+                        lambda *args, **kwargs: flows.append(args))
+
+    assert google_calendar.warm_up_calendar_service() is None
+    assert CalendarSync(index).sync_once() is None
+    assert flows == [] and google_calendar._service is None
+
+
+def test_stop_does_not_wait_for_hung_request(index):
+    sync = CalendarSync(index, interval=60)
+    release = threading.Event()
+    sync.sync_once = lambda: release.wait(10)
+    sync.start()
+    started = time.perf_counter()
+    sync.stop(timeout=0.1)
+    assert time.perf_counter() - started < 1
+    release.set()
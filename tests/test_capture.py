@@ -0,0 +1,146 @@
+import json
+import numpy as np
+import pytest
+import vosk
+from app.capture import AudioCapture, RingBuffer, SAMPLE_WIDTH
+from app.grammar import GrammarRecognizer, UNK
+from app.vad import VoiceActivityDetector
+from app.wakeword import WakeWordGate
+from app.resample import AudioConverter
+from benchmarks.bench_capture import aliasing_db, blocks, convert
+from benchmarks.common import SAMPLE_RATE
+
+WAKE = "алиса"
+COMMAND = "создай задачу отчёт на завтра"
+
+
+class FakeKaldi:
+    """KaldiRecognizer без модели: сообщает WAKE (распознаватель триггеров) или текст фразы"""
+
+    results = {}
+
+    def __init__(self, model, sample_rate, grammar=None):
+        words = json.loads(grammar) if grammar else []
+        self.text = WAKE if WAKE in words and len(words) < 5 else self.results.get(bool(grammar), COMMAND)
+        self.heard = 0
+        self.audio = bytearray()
+
+    def AcceptWaveform(self, data):
+        # Как cffi-обертка Vosk: char * принимает bytes или cdata, но не memoryview и не bytearray
+        if not isinstance(data, (bytes, vosk._ffi.CData)):
+            raise TypeError(f"initializer for ctype 'char *' must be a bytes or cdata, not {type(data).__name__}")
+        self.heard += len(data)
+        self.audio += data if isinstance(data, bytes) else vosk._ffi.buffer(data)
+        return False
+
+    def PartialResult(self):
+        return json.dumps({"partial": self.text if self.heard else ""})
+
+    def Result(self):
+        return self.FinalResult()
+
+    def FinalResult(self):
+        text, self.heard = (self.text if self.heard else ""), 0
+        return json.dumps({"text": text}, ensure_ascii=False)
+
+
+@pytest.fixture
+def kaldi(monkeypatch):
+    monkeypatch.setattr(vosk, "KaldiRecognizer", FakeKaldi)
+    monkeypatch.setattr(FakeKaldi, "results", {})
+    return FakeKaldi
+
+
+def phrase_audio(seed=0):
+    """Тишина с шумом, секунда «речи» (тон 300 Гц) и снова тишина — int16 16 кГц"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    audio = np.concatenate((rng.normal(0, 30, SAMPLE_RATE // 2), 8000 * np.sin(2 * np.pi * 300 * t),
+                            rng.normal(0, 30, SAMPLE_RATE)))
+    return np.rint(audio).astype(np.int16).tobytes()
+
+
+def run_capture(capture, audio, frames=1024):
+    """Звук через RingBuffer.read_into в один переиспользуемый буфер, как в потоке распознавания"""
+    recognizer = capture.create_recognizer()
+    ring = RingBuffer(len(audio) + 1)
+    ring.write(audio)
+    chunk = memoryview(bytearray(frames * SAMPLE_WIDTH))
+    while (data := ring.read_into(chunk)) is not None:
+        capture.feed(recognizer, data)
+    return recognizer, [capture.utterances.get_nowait().text for _ in range(capture.utterances.qsize())]
+
+
+@pytest.mark.parametrize("vad", [True, False], ids=["vad", "no-vad"])
+def test_grammar_with_wake_word(kaldi, vad):
+    # Без VAD после триггера распознаватель получает memoryview на буфер блока
+    capture = AudioCapture(model=object(), grammar=["создай", "задачу", UNK],
+                           wake=WakeWordGate([WAKE]), vad=VoiceActivityDetector() if vad else None)
+    recognizer, texts = run_capture(capture, phrase_audio())
+    assert isinstance(recognizer, GrammarRecognizer)
+    assert capture.wake.triggers == 1
+    if vad:
+        assert texts == [COMMAND]
+    else:
+        assert json.loads(recognizer.FinalResult())["text"] == COMMAND
+
+
+def test_grammar_without_vad_gets_memoryview(kaldi):
+    capture = AudioCapture(model=object(), grammar=["создай", UNK])
+    recognizer, _ = run_capture(capture, phrase_audio())
+    # Звук фразы для повторного декодирования совпадает с тем, что получил Vosk
+    assert bytes(recognizer._audio) == bytes(recognizer._recognizer.audio)
+    assert len(recognizer._audio) == len(phrase_audio()) // 2048 * 2048
+
+
+def test_grammar_fallback_splices_unknown_words(kaldi):
+    kaldi.results = {True: f"создай задачу {UNK} на завтра", False: "создай задачу отчёт на завтра"}
+    recognizer = GrammarRecognizer(object(), SAMPLE_RATE, ["создай", UNK])
+    recognizer.AcceptWaveform(memoryview(phrase_audio()))
+    result = json.loads(recognizer.FinalResult())
+    assert result == {"text": COMMAND, "fallback": True}
+    assert recognizer.fallbacks == 1 and len(recognizer._audio) == 0
+
+
+def test_plain_recognizer_gets_bytes_or_cdata(kaldi):
+    capture = AudioCapture(model=object())
+    recognizer, _ = run_capture(capture, phrase_audio())
+    assert isinstance(recognizer, FakeKaldi) and recognizer.heard
+
+
+def test_ring_buffer_wraps_and_drops_on_overflow():
+    ring = RingBuffer(10)
+    buffer = memoryview(bytearray(4))
+    assert ring.write(b"abcdef") and ring.read_into(buffer).tobytes() == b"abcd"
+    assert ring.write(b"ghijkl")  # переход через конец буфера
+    assert ring.read_into(buffer).tobytes() == b"efgh"
+    assert not ring.write(b"0123456789")
+    assert ring.dropped_bytes == 10
+    assert ring.read(4) == b"ijkl" and ring.read_into(buffer) is None
+
+
+@pytest.mark.parametrize("rate, channels, mode", [(48000, 2, "beam"), (44100, 2, "mix"), (48000, 1, "mix")])
+def test_converter_output_length_and_quality(rate, channels, mode):
+    t = np.arange(rate * 2) / rate
+    tone = np.repeat((8000 * np.sin(2 * np.pi * 1000 * t))[:, None], channels, axis=1)
+    chunks = blocks(np.rint(tone).astype(np.int16), rate)
+    output = convert(AudioConverter(rate, channels, SAMPLE_RATE, mode), chunks)
+    # Потоковый фильтр задерживает выход на несколько отсчетов, но не теряет звук
+    assert abs(len(output) - 2 * SAMPLE_RATE) <= 64
+    # Тон сохраняет частоту и уровень (после переходного процесса в начале)
+    steady = output[len(output) // 4:].astype(np.float64)
+    spectrum = np.abs(np.fft.rfft(steady))
+    assert np.fft.rfftfreq(len(steady), 1 / SAMPLE_RATE)[spectrum.argmax()] == pytest.approx(1000, abs=2)
+    assert np.sqrt(np.mean(steady ** 2)) == pytest.approx(8000 / np.sqrt(2), rel=0.05)
+
+
+@pytest.mark.parametrize("rate, channels", [(48000, 1), (48000, 2), (44100, 2)])
+def test_converter_suppresses_aliasing(rate, channels):
+    assert aliasing_db(lambda: AudioConverter(rate, channels, SAMPLE_RATE, "mix"), rate, channels) > 60
+
+
+def test_converter_passthrough_at_16k():
+    audio = phrase_audio()
+    output = convert(AudioConverter(SAMPLE_RATE, 1, SAMPLE_RATE), blocks(np.frombuffer(audio, np.int16)[:, None],
+                                                                          SAMPLE_RATE))
+    assert output.tobytes() == audio
@@ -0,0 +1,78 @@
+from datetime import datetime
+import pytest
+from app.command import extract_task_and_date, parse_command, parse_commands
+from benchmarks import legacy_command
+from benchmarks.suite import encode_due
+from tests.common import load_corpus
+
+PARITY = load_corpus("commands_v1.jsonl")
+EXPECTED = load_corpus("commands_v2.jsonl")
+
+
+@pytest.mark.parametrize("item", PARITY, ids=[item["text"] for item in PARITY])
+def test_grammar_matches_corpus_and_regex_cascade(item):
+    expected = (item["task"], item["date_part"])
+    assert extract_task_and_date(item["text"]) == expected
+    assert legacy_command.extract_task_and_date(item["text"]) == expected
+
+
+@pytest.mark.parametrize("item", EXPECTED, ids=[item["text"] for item in EXPECTED])
+def test_parse_command_resolves_due(item):
+    parsed = parse_command(item["text"], item["now"])
+    if item["task"] is None:
+        assert parsed is None
+        return
+    assert parsed["task"] == item["task"]
+    assert encode_due(parsed["due"]) == item["due"]
+
+
+def test_not_a_command():
+    assert parse_command("включи музыку") is None
+    assert parse_command("") is None
+    assert parse_commands("включи музыку") == []
+
+
+def test_multi_command_carries_verb(now):
+    commands = parse_commands("создай задачу отчёт на завтра и задачу созвон в пятницу в 10", now)
+    assert [command["task"] for command in commands] == ["отчёт", "созвон"]
+    assert commands[0]["due"].date() == datetime(2030, 1, 16).date()
+    assert (commands[1]["due"].date(), commands[1]["due"].hour) == (datetime(2030, 1, 18).date(), 10)
+
+
+def test_phrase_continuing_after_early_finish(now):
+    # Фраза завершена досрочно на паузе перед «и»: остаток приходит отдельно
+    whole = parse_commands("создай задачу отчёт на завтра и задачу созвон в пятницу в 10", now)
+    rest = parse_commands("и задачу созвон в пятницу в 10", now)
+    assert rest == whole[1:]
+    assert parse_commands("а также событие встреча на завтра", now)[0]["task"] == "встреча"
+
+
+@pytest.mark.parametrize("text, hour", [
+    ("создай задачу отчёт на завтра в девятнадцать ноль ноль", 19),
+    ("создай задачу отчёт на завтра в девять ноль ноль", 9),
+    ("создай задачу отчёт на завтра в час дня", 13),
+    ("создай задачу отчёт на завтра в час ночи", 1),
+])
+def test_spoken_clock_time(now, text, hour):
+    due = parse_command(text, now)["due"]
+    assert (due.date(), due.hour, due.minute) == (datetime(2030, 1, 16).date(), hour, 0)
+
+
+def test_range_takes_month_from_end(now):
+    start, end = parse_command("создай задачу отчет с первого по третье марта", now)["due"]
+    assert (start.date(), end.date()) == (datetime(2030, 3, 1).date(), datetime(2030, 3, 3).date())
+
+
+def test_range_across_new_year(now):
+    start, end = parse_command("создай событие отпуск с 30 декабря по 2 января", now)["due"]
+    assert (start.date(), end.date()) == (datetime(2030, 12, 30).date(), datetime(2031, 1, 2).date())
+
+
+def test_range_ending_before_start_is_rejected(now):
+    assert parse_command("создай задачу отчет с пятого по третье марта", now)["due"] is None
+
+
+def test_weekday_range_ends_after_start(now):
+    # Вторник: понедельник — следующий, значит и пятница следующей недели
+    start, end = parse_command("создай задачу ремонт с понедельника по пятницу", now)["due"]
+    assert (start.date(), end.date()) == (datetime(2030, 1, 21).date(), datetime(2030, 1, 25).date())
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+import pytest
+from app import dates
+from app.dates import resolve_date, date_cache_stats, clear_date_cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    clear_date_cache()
+    yield
+    clear_date_cache()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("завтра", datetime(2030, 1, 16, 10, 0)),
+    ("послезавтра в 9", datetime(2030, 1, 17, 9, 0)),
+    ("пятницу", datetime(2030, 1, 18, 0, 0)),
+    ("во вторник", datetime(2030, 1, 22, 0, 0)),
+    ("20 марта 2030 в 15:30", datetime(2030, 3, 20, 15, 30)),
+    ("в 7 вечера", datetime(2030, 1, 15, 19, 0)),
+    ("в 9", datetime(2030, 1, 16, 9, 0)),
+    ("через 2 часа", datetime(2030, 1, 15, 12, 0)),
+    ("через неделю", datetime(2030, 1, 22, 10, 0)),
+])
+def test_fast_path(text, expected, now):
+    result = resolve_date(text, now)
+    assert result.replace(tzinfo=None) == expected
+    assert result.utcoffset() == timedelta(hours=3)
+    assert date_cache_stats()["fast"] == 1
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("в 12 ночи", datetime(2030, 1, 16, 0, 0)),
+    ("завтра в 12 ночи", datetime(2030, 1, 17, 0, 0)),
+    ("пятницу в 12:30 ночи", datetime(2030, 1, 19, 0, 30)),
+    ("завтра в 2 ночи", datetime(2030, 1, 16, 2, 0)),
+    ("завтра в 12 дня", datetime(2030, 1, 16, 12, 0)),
+])
+def test_day_periods(text, expected, now):
+    assert resolve_date(text, now).replace(tzinfo=None) == expected
+
+
+# Дни недели не сравниваются: dateparser выбирает прошедший день, быстрый путь — ближайший будущий
+@pytest.mark.parametrize("text", ["завтра в 10", "послезавтра", "15 февраля 2030", "через 3 дня", "через 2 недели"])
+def test_fast_path_agrees_with_dateparser(text, now):
+    local = now.replace(tzinfo=None)
+    assert resolve_date(text, now).replace(tzinfo=None) == dates._parse_with_dateparser(text, local).replace(tzinfo=None)
+
+
+def test_invalid_time_is_rejected(now):
+    assert dates._resolve_fast("завтра в 25", now.replace(tzinfo=None)) is None
+
+
+def test_cache_key_is_minute_precise(now):
+    first = resolve_date("Завтра", now)
+    again = resolve_date("  завтра ", now + timedelta(seconds=30))
+    later = resolve_date("завтра", now + timedelta(minutes=5))
+    assert first == again
+    assert later - first == timedelta(minutes=5)
+    stats = date_cache_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_fallback_and_failure(now):
+    assert resolve_date("15.02.2030", now).replace(tzinfo=None) == datetime(2030, 2, 15)
+    assert resolve_date("когда-нибудь потом", now) is None
+    assert resolve_date("", now) is None
+    stats = date_cache_stats()
+    assert (stats["fallback"], stats["failed"]) == (1, 1)
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+import pytest
+from app import dedup
+from app.dedup import DedupIndex
+
+DUE = datetime.fromisoformat("2030-01-16T10:00:00+03:00")
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = DedupIndex(path=str(tmp_path / "dedup.db"), ttl=900, similarity=0.8, bucket_minutes=30)
+    yield index
+    index.close()
+
+
+def created(index, sink, name, due=DUE):
+    assert index.claim(sink, name, due) is None
+    index.confirm(sink, name, due)
+
+
+def test_exact_and_similar_repeats(index):
+    created(index, "notion", "Отчёт для клиента")
+    assert index.claim("notion", "отчет для клиента", DUE) == {"name": "отчет для клиента", "similarity": 1.0,
+                                                                 "pending": False}
+    similar = index.claim("notion", "отчет для клиентов", DUE)
+    assert similar["name"] == "отчет для клиента" and not similar["pending"]
+    assert (index.hits, index.near_hits) == (2, 1)
+
+
+def test_different_words_with_common_start_do_not_match(index):
+    created(index, "notion", "купить молоко")
+    assert index.claim("notion", "купить молоток", DUE) is None
+    assert dedup.trigrams("молоко") != dedup.trigrams("молоток")
+
+
+def test_other_date_sink_or_bucket_is_new(index):
+    created(index, "notion", "созвон")
+    assert index.claim("notion", "созвон", DUE + timedelta(days=1)) is None
+    assert index.claim("calendar", "созвон", DUE) is None
+    # Та же корзина DEDUP_BUCKET_MINUTES — повтор
+    assert index.claim("notion", "созвон", DUE + timedelta(minutes=10)) is not None
+
+
+def test_entries_expire_after_ttl(index, monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr(dedup.time, "time", lambda: clock[0])
+    created(index, "notion", "созвон")
+    clock[0] += 899
+    assert index.claim("notion", "созвон", DUE) is not None
+    clock[0] += 2
+    assert index.claim("notion", "созвон", DUE) is None
+    assert len(index) == 1
+
+
+def test_pending_reservation_is_not_a_duplicate(index):
+    # Первая попытка прервана по таймауту: ответа еще нет, резерв не подтвержден
+    assert index.claim("notion", "отчет", DUE) is None
+    retry = index.claim("notion", "отчет", DUE)
+    assert retry["pending"] and index.hits == 0
+
+    # Запрос все же не удался: следующая попытка уходит в сеть
+    index.release("notion", "отчет", DUE)
+    assert index.claim("notion", "отчет", DUE) is None
+    # А если удался — следующая попытка становится повтором
+    index.confirm("notion", "отчет", DUE)
+    assert not index.claim("notion", "отчет", DUE)["pending"]
+
+
+def test_confirmed_entries_survive_restart(index):
+    created(index, "calendar", "созвон")
+    index.claim("calendar", "отчет", DUE)  # резерв на диск не пишется
+    reopened = DedupIndex(path=index.path, ttl=900)
+    assert len(reopened) == 1
+    assert not reopened.claim("calendar", "созвон", DUE)["pending"]
+    reopened.close()
+
+
+def test_warm_adds_only_unknown_tasks_without_date(index):
+    created(index, "notion", "отчет")
+    now = datetime.now().astimezone()
+    assert index.warm("notion", [("Отчёт", now), ("созвон", now), ("старое", now - timedelta(hours=1))]) == 1
+    # Задача из Notion не совпадает с той же задачей на конкретный день
+    assert index.claim("notion", "созвон", DUE) is None
+    assert index.claim("notion", "созвон", None) is not None
+
+
+def test_sink_reports_pending_for_retry(sinks, index, monkeypatch):
+    from app.notion import create_notion_task, create_notion_tasks
+    from app.google_calendar import create_calendar_event
+    notion_server, calendar_server = sinks
+    monkeypatch.setattr(dedup, "_index", index)
+    index.claim("notion", "отчет", DUE)
+    index.claim("calendar", "отчет", DUE)
+
+    assert create_notion_task("отчет", DUE) is False
+    assert create_notion_tasks(["отчет", "созвон"], due_dates=[DUE, DUE]) == [
+        {"success": False, "error": dedup.PENDING_ERROR}, {"success": True, "error": None}]
+    assert create_calendar_event("отчет", DUE) is False
+    assert [notion_server.title(page) for page in notion_server.pages] == ["созвон"]
+    assert calendar_server.events == []
+
+    index.confirm("notion", "отчет", DUE)
+    assert create_notion_task("отчет", DUE) is True
+    assert len(notion_server.pages) == 1
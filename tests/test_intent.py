@@ -0,0 +1,64 @@
+import pytest
+from app.intent import EarlyIntent
+
+COMMAND = "создай задачу отчёт на завтра в десять"
+
+
+def feed(intent, partials, position=0.0, step=0.1):
+    """Подает гипотезы по очереди; позиция звука растет на step. Возвращает (завершена ли, позиция)"""
+    for partial in partials:
+        position += step
+        if intent.update(partial, position):
+            return True, position
+    return False, position
+
+
+def test_complete_command_finishes_after_stable_ms():
+    intent = EarlyIntent(stable_ms=300)
+    done, _ = feed(intent, ["создай", "создай задачу отчёт", COMMAND, COMMAND, COMMAND])
+    assert not done
+    assert feed(intent, [COMMAND], position=1.0)[0]
+
+
+@pytest.mark.parametrize("partial", [
+    COMMAND + " и",
+    COMMAND + " а также",
+    COMMAND + " потом",
+    COMMAND + ",",
+    "создай задачу отчёт на завтра в",
+])
+def test_continuation_is_not_finished(partial):
+    intent = EarlyIntent(stable_ms=300)
+    assert not feed(intent, [partial] * 20)[0]
+
+
+@pytest.mark.parametrize("partial", [
+    "создай задачу отчёт",
+    "создай задачу отчёт на завтра",
+    "создай задачу созвон в пятницу",
+])
+def test_command_without_time_waits_for_vosk(partial):
+    # После паузы может прозвучать «в 10»: отдельной фразой оно бы потерялось
+    intent = EarlyIntent(stable_ms=300)
+    assert not feed(intent, [partial] * 20)[0]
+
+
+@pytest.mark.parametrize("partial", [
+    "создай задачу отчёт на завтра в 10:30",
+    "создай задачу отчёт на завтра в семь вечера",
+    "создай задачу созвон в пятницу в девять ноль ноль",
+    "создай задачу отчёт на завтра в час дня",
+])
+def test_command_with_time_finishes_early(partial):
+    intent = EarlyIntent(stable_ms=300)
+    assert feed(intent, [partial] * 5)[0]
+
+
+def test_on_verb_called_once_per_phrase():
+    calls = []
+    intent = EarlyIntent(stable_ms=300, on_verb=lambda: calls.append(1))
+    feed(intent, ["создай", "создай задачу", COMMAND])
+    assert calls == [1]
+    intent.reset()
+    feed(intent, ["запиши"])
+    assert calls == [1, 1]
@@ -0,0 +1,78 @@
+import json
+from datetime import datetime, timezone
+import pytest
+import requests
+from app import notion
+from app.notion import NotionClient
+
+
+def response(status, body=None, headers=None):
+    result = requests.Response()
+    result.status_code = status
+    result._content = json.dumps(body or {}).encode("utf-8")
+    result.headers.update(headers or {})
+    return result
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Клиент без пауз между повторами; ответы сессии задает client.replies"""
+    monkeypatch.setattr(notion, "BACKOFF_BASE", 0.0)
+    client = NotionClient(api_key="test", database_id="db", base_url="http://notion.test", rate_limit=0)
+    client.replies = []
+    client.calls = []
+
+    def request(method, url, **kwargs):
+        client.calls.append((method, url))
+        reply = client.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    monkeypatch.setattr(client.session, "request", request)
+    yield client
+    client.close()
+
+
+def test_create_is_not_retried_after_server_error(client):
+    client.replies = [response(503), response(200)]
+    assert client.create_page("Отчет") == (False, "503 - {}")
+    assert len(client.calls) == 1
+
+
+def test_create_is_not_retried_after_read_timeout(client):
+    client.replies = [requests.ReadTimeout("read timed out"), response(200)]
+    success, error = client.create_page("Отчет")
+    assert not success and "read timed out" in error
+    assert len(client.calls) == 1
+
+
+def test_create_is_retried_on_rate_limit(client):
+    client.replies = [response(429, headers={"Retry-After": "0"}), response(200)]
+    assert client.create_page("Отчет") == (True, None)
+    assert len(client.calls) == 2
+
+
+def test_create_is_retried_when_connection_failed(client):
+    client.replies = [requests.ConnectTimeout("connect timed out"), response(200)]
+    assert client.create_page("Отчет") == (True, None)
+    assert len(client.calls) == 2
+
+
+def test_query_is_retried_on_server_error(client):
+    client.replies = [response(502), response(200, {"results": [{"id": "page-1"}]})]
+    assert client.find_task("Отчет", datetime(2030, 1, 15, tzinfo=timezone.utc)) == "page-1"
+    assert len(client.calls) == 2
+
+
+def test_refused_connection_is_retried(monkeypatch):
+    # Порт 1 закрыт: запрос не уходит, поэтому даже POST /pages можно повторить
+    monkeypatch.setattr(notion, "BACKOFF_BASE", 0.0)
+    client = NotionClient(api_key="test", base_url="http://127.0.0.1:1", rate_limit=0, max_retries=2)
+    calls = []
+    original = client.session.request
+    monkeypatch.setattr(client.session, "request", lambda *args, **kwargs: calls.append(args) or original(*args, **kwargs))
+    success, error = client.create_page("Отчет")
+    assert not success and error
+    assert len(calls) == 3
+    client.close()
@@ -0,0 +1,42 @@
+import pytest
+from app.numerals import normalize_numerals, numeral_words
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("первое марта", "1 марта"),
+    ("двенадцатое", "12"),
+    ("двадцать первого мая в десять тридцать", "21 мая в 10:30"),
+    ("тридцать первое декабря две тысячи двадцать шестого года", "31 декабря 2026 года"),
+    ("пятнадцатого апреля в семь часов вечера", "15 апреля в 7 вечера"),
+    ("в пятницу в девять ноль пять", "в пятницу в 9:05"),
+    ("в девятнадцать ноль ноль", "в 19:00"),
+    ("в девять нуль нуль", "в 9:00"),
+    ("в час дня", "в 1 дня"),
+    ("в час ночи", "в 1 ночи"),
+    ("в час тридцать", "в 1:30"),
+    ("через час", "через час"),
+    ("в семь часов пятнадцать минут", "в 7:15"),
+    ("в половине третьего", "в 2:30"),
+    ("без четверти три", "2:45"),
+    ("в полдень", "в 12:00"),
+    ("в полночь", "в 0:00"),
+    ("в двенадцать ночи", "в 12 ночи"),
+    ("через два часа", "через 2 часа"),
+])
+def test_normalize(text, expected):
+    assert normalize_numerals(text) == expected
+
+
+def test_bare_numbers_are_not_time_without_preposition():
+    # «десять тридцать» — время только после «в»
+    assert normalize_numerals("десять тридцать") == "10 30"
+    assert normalize_numerals("купить три яблока") == "купить 3 яблока"
+
+
+def test_words_inside_other_words_are_kept():
+    assert normalize_numerals("тридцатилетие и пятерка") == "тридцатилетие и пятерка"
+
+
+def test_numeral_words_cover_time_vocabulary():
+    words = numeral_words()
+    assert {"двадцать", "первого", "половине", "часов", "полдень"} <= words
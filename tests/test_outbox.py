@@ -0,0 +1,144 @@
+import time
+from datetime import datetime, timedelta
+import pytest
+from benchmarks.mock_servers import MockNotionServer
+from app.dispatch import create_dispatcher
+from app.outbox import Outbox, OutboxWorker, PENDING, IN_PROGRESS, DONE, FAILED, main
+
+START = datetime(2030, 1, 15, 10, 0).astimezone()
+
+
+def command(name, hours=0):
+    moment = START + timedelta(hours=hours)
+    return {"task": name, "due": moment, "start": moment}
+
+
+def wait_until(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def assert_created_once(notion_server, calendar_server, names):
+    titles = sorted(MockNotionServer.title(page) for page in notion_server.pages)
+    assert titles == sorted(names)
+    event_ids = [event["id"] for event in calendar_server.events]
+    assert len(event_ids) == len(set(event_ids)) == len(names)
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    yield outbox
+    outbox.close()
+
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = create_dispatcher()
+    yield dispatcher
+    dispatcher.shutdown()
+
+
+def test_enqueue_many_and_claim(outbox, dispatcher):
+    keys = outbox.enqueue_many([(command("Отчет"), ["notion", "calendar"]), (command("Созвон"), ["notion"])],
+                               keys=["a", "b"])
+    assert keys == ["a", "b"]
+    assert outbox.counts() == {PENDING: 3}
+
+    groups = outbox.claim(10)
+    assert [(key, sorted(sink for _, sink, _ in rows)) for key, _, rows in groups] == \
+        [("a", ["calendar", "notion"]), ("b", ["notion"])]
+    claimed = groups[0][1]
+    assert claimed["task"] == "Отчет" and claimed["due"] == START and claimed["retry"] == set()
+    assert outbox.counts() == {IN_PROGRESS: 3}
+    assert outbox.claim(10) == []
+
+
+def test_delivery_survives_outage(outbox, dispatcher, sinks):
+    notion_server, calendar_server = sinks
+    notion_server.fail_status = calendar_server.fail_status = 503
+    names = [f"Задача {i}" for i in range(3)]
+    for i, name in enumerate(names):
+        outbox.enqueue(command(name, i), dispatcher.applicable(command(name, i)))
+
+    worker = OutboxWorker(outbox, dispatcher, backoff_base=0.05, backoff_max=0.2).start()
+    try:
+        assert wait_until(lambda: sum(item["attempts"] for item in outbox.items()) >= 6)
+        assert not outbox.counts().get(DONE)
+        notion_server.fail_status = calendar_server.fail_status = None
+        assert wait_until(lambda: outbox.counts() == {DONE: 6})
+    finally:
+        worker.stop()
+    assert_created_once(notion_server, calendar_server, names)
+
+
+def test_crash_after_send_does_not_duplicate(tmp_path, dispatcher, sinks):
+    notion_server, calendar_server = sinks
+    path = str(tmp_path / "outbox.db")
+    outbox = Outbox(path)
+    names = [f"После сбоя {i}" for i in range(3)]
+    for i, name in enumerate(names):
+        outbox.enqueue(command(name, i), dispatcher.applicable(command(name, i)))
+    # Доставка дошла до получателей, но процесс упал до отметки о ней
+    for key, claimed, rows in outbox.claim(10):
+        dispatcher.dispatch(claimed, only={sink for _, sink, _ in rows}).result()
+    outbox.close()
+
+    outbox = Outbox(path)
+    try:
+        assert outbox.counts() == {IN_PROGRESS: 6}
+        assert outbox.recover() == 6
+        groups = outbox.claim(10)
+        assert all(claimed["retry"] == {"notion", "calendar"} for _, claimed, _ in groups)
+        outbox.recover()
+        OutboxWorker(outbox, dispatcher).drain(timeout=10)
+        assert outbox.counts() == {DONE: 6}
+    finally:
+        outbox.close()
+    assert_created_once(notion_server, calendar_server, names)
+
+
+def test_failed_delivery_can_be_replayed(outbox, dispatcher, sinks, capsys):
+    notion_server, calendar_server = sinks
+    notion_server.fail_status = 503
+    key = outbox.enqueue(command("Без даты") | {"due": None, "start": None}, ["notion"])
+    worker = OutboxWorker(outbox, dispatcher, max_attempts=2, backoff_base=0.01)
+    assert wait_until(lambda: worker.drain(timeout=1) or outbox.counts() == {FAILED: 1})
+    assert outbox.items()[0]["attempts"] == 2
+
+    assert main(["--db", outbox.path, "list"]) == 0
+    assert key[:8] in capsys.readouterr().out
+
+    notion_server.fail_status = None
+    assert outbox.replay(key[:8]) == 1
+    worker.drain(timeout=10)
+    assert outbox.counts() == {DONE: 1}
+    assert [MockNotionServer.title(page) for page in notion_server.pages] == ["Без даты"]
+
+
+def test_replay_cli_leaves_deliveries_of_running_worker(outbox, sinks, monkeypatch, capsys):
+    import config.settings
+    notion_server, _ = sinks
+    monkeypatch.setattr(config.settings, "NOTION_API_KEY", "test")
+    monkeypatch.setattr(config.settings, "DATABASE_ID", "test")
+    undated = {"due": None, "start": None}
+
+    # Работающий бот только что взял доставку и ждет ответа Notion
+    outbox.enqueue(command("В работе") | undated, ["notion"])
+    outbox.claim(10)
+    # Доставка, взятая давно: процесс, который ее отправлял, упал
+    outbox.enqueue(command("Брошенная") | undated, ["notion"])
+    outbox.claim(10)
+    with outbox._conn:
+        outbox._conn.execute("UPDATE outbox SET updated_at = ? WHERE payload LIKE '%Брошенная%'",
+                             (time.time() - 3600,))
+    outbox.enqueue(command("Ждет") | undated, ["notion"])
+
+    assert main(["--db", outbox.path, "replay"]) == 0
+    assert "другим процессом (не тронуты): 1" in capsys.readouterr().out
+    assert sorted(MockNotionServer.title(page) for page in notion_server.pages) == ["Брошенная", "Ждет"]
+    assert outbox.counts() == {DONE: 2, IN_PROGRESS: 1}
@@ -0,0 +1,46 @@
+import os
+import sys
+import json
+import statistics
+import subprocess
+import pytest
+from benchmarks.bench_startup import THRESHOLDS, profile_once
+
+RUNS = 3
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def profiles():
+    return [profile_once() for _ in range(RUNS)]
+
+
+@pytest.fixture(scope="module")
+def thresholds():
+    with open(THRESHOLDS, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def median_ms(values):
+    return 1000 * statistics.median(values)
+
+
+def test_no_heavy_imports_before_warmup(profiles, thresholds):
+    heavy = {name for profile in profiles for name in profile["heavy_loaded"]}
+    assert heavy <= set(thresholds["heavy_loaded"])
+
+
+def test_imports_within_thresholds(profiles, thresholds):
+    assert median_ms([profile["imports_total"] for profile in profiles]) <= thresholds["imports_total_ms"]
+    for name, limit in thresholds["imports_ms"].items():
+        assert median_ms([profile["imports"][name] for profile in profiles]) <= limit, name
+
+
+
+def test_run_imports_only_stdlib():
+    # Модули приложения и зависимости загружаются в main() и подкомандах, не при импорте run.py
+    code = ("import sys; before = set(sys.modules); import run; "
+            "print('\\n'.join(sorted(set(sys.modules) - before)))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    loaded = {name.split(".")[0] for name in output.stdout.split()} - {"run"}
+    assert loaded <= sys.stdlib_module_names, loaded - sys.stdlib_module_names